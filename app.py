@@ -6,43 +6,65 @@ Main Streamlit application that orchestrates all modules.
 This app provides visualization and analysis of auto insurance claims data.
 """
 
+import os
 import sys
+import tempfile
+import time
 from pathlib import Path
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
+import pandas as pd
 import streamlit as st
 
 # Import our modules
-from data_loader import load_data
-from kpis import (
-    calculate_total_claims,
-    calculate_total_claimed_losses,
-    calculate_total_payments,
-    calculate_average_claim,
-    calculate_injury_rate,
-    calculate_lawsuit_rate,
-    calculate_payment_ratio,
-    format_currency,
-    format_number
-)
-from charts import (
-    create_claims_by_insurer,
-    create_claims_by_incident_type,
-    create_monthly_claims_trend,
-    create_claims_by_state,
-    create_payment_analysis,
-    create_injury_analysis
-)
+from data_loader import get_memory_report
+from kpis import format_currency, format_number, format_percent
+from charts import claims_trend_figure, severity_distribution_figure
 from filters import (
     create_date_filter,
     create_insurer_filter,
     create_state_filter,
     create_incident_filter,
     create_injury_filter,
-    apply_filters
+    create_text_search_filter,
+    FilterSpec
+)
+from approximate import (
+    approximate_mode_default,
+    approximate_view,
+    build_sample,
+    get_shared_refiner,
+    should_approximate
+)
+from dataset import compute_distribution, compute_view
+from explorer import (
+    DEFAULT_EXPLORER_COLUMNS,
+    DEFAULT_PAGE_SIZE,
+    PAGE_SIZES,
+    page_count,
+    page_frame,
+    sort_order,
+    sorted_selection
 )
+from heavy_hitters import PROVIDER_KEY, flag_repeat_claimants, is_estimate, top_keys
+from figures import build_figures_cached, dashboard_figure_jobs, filter_fingerprint
+from export import EXPORT_FORMATS, EXPORT_MIME_TYPES, get_download_max_rows, write_export
+from incremental import DropFolderWatcher
+from result_cache import get_shared_cache
+from instrumentation import (
+    METRICS,
+    current_run_spans,
+    finish_run,
+    record_cache_stats,
+    span,
+    start_run
+)
+from registry import get_shared_registry
+from warmup import dataset_default_spec
+from sketches import METRIC_LABELS, SKETCH_METRICS
+from timeseries import DEFAULT_ROLLING_WINDOWS, GRANULARITIES, add_rolling, add_year_over_year
 from styles import get_custom_css, create_kpi_card
 
 
@@ -58,32 +80,404 @@ st.set_page_config(
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
 
+def get_registry():
+    """Datasets with their indexes and cubes, loaded once and shared by every session."""
+    return get_shared_registry()
+
+
+@st.cache_resource
+def start_drop_folder_watcher(_registry):
+    """Append CSVs dropped into DASHBOARD_DROP_DIR to the first dataset, if configured."""
+    folder = os.environ.get('DASHBOARD_DROP_DIR')
+    if not folder:
+        return None
+    # The watcher's lease is never released, so its dataset is never evicted
+    lease = _registry.acquire(_registry.names()[0])
+    return DropFolderWatcher(lease.dataset, folder).start()
+
+
+def get_view_cache():
+    """Filtered views shared by every session in this process."""
+    return get_shared_cache()
+
+
+def build_figure(chart_id, builder, data, fingerprint):
+    """One chart, reused from the figure cache while its inputs are unchanged."""
+    figures = build_figures_cached({chart_id: (builder, data)}, get_view_cache(), fingerprint)
+    return figures[chart_id]
+
+
+def kpi_card(view, name, label, fmt):
+    """KPI card for one metric; estimates are marked ≈ and show their 95% interval."""
+    value = fmt(getattr(view.kpis, name))
+    if view.approximate and view.intervals[name]:
+        value, label = f"≈ {value}", f"{label} ± {fmt(view.intervals[name])}"
+    return create_kpi_card(value, label)
+
+
+def wait_for_refinement(refinement, status, message):
+    """Keep the estimates on screen until the exact view is ready, then rerun to show it."""
+    start = time.perf_counter()
+    shown = None
+    while not refinement.done():
+        text = f"{message} ({time.perf_counter() - start:.0f} s)"
+        # Updating the page also lets Streamlit stop this run on the next interaction
+        if text != shown:
+            status.info(text)
+            shown = text
+        time.sleep(0.2)
+    refinement.result()
+    st.rerun()
+
+
+def show_performance_panel(cache_stats):
+    """Sidebar breakdown of this rerun's stages, with metric exports."""
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        spans = current_run_spans()
+        st.dataframe(
+            [
+                {
+                    'Stage': record['stage'],
+                    'ms': round(record['seconds'] * 1000, 1),
+                    'Rows': record['rows'],
+                    'Peak MB': round(record['peak_bytes'] / 1e6, 2) if 'peak_bytes' in record else None,
+                }
+                for record in spans
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(
+            f"Stages total: {sum(record['seconds'] for record in spans) * 1000:.0f} ms · "
+            f"view cache hit rate: {cache_stats['hit_rate']:.0%}"
+        )
+        st.download_button("Prometheus metrics", METRICS.to_prometheus(),
+                           file_name="dashboard_metrics.prom", mime="text/plain")
+        st.download_button("JSON lines metrics", METRICS.to_json_lines(),
+                           file_name="dashboard_metrics.jsonl", mime="application/json")
+
+
+def show_trend_chart(name, dataset, view, view_cache, figures):
+    """Claims trend at a chosen granularity, with optional overlays."""
+    if not dataset.in_memory:
+        # Streaming mode only has the cube's monthly cells
+        st.plotly_chart(figures['by_month'], use_container_width=True)
+        return
+    
+    granularity = st.radio(
+        "Trend granularity", [name.capitalize() for name in GRANULARITIES],
+        index=GRANULARITIES.index('month'), horizontal=True, key="trend_granularity"
+    ).lower()
+    option_col1, option_col2 = st.columns(2)
+    window = DEFAULT_ROLLING_WINDOWS[granularity]
+    rolling = option_col1.checkbox(f"{window}-{granularity} rolling average", key="trend_rolling")
+    yoy = option_col2.checkbox("Compare with previous year", key="trend_yoy")
+    
+    if granularity == 'month' and not rolling and not yoy:
+        st.plotly_chart(figures['by_month'], use_container_width=True)
+        return
+    
+    def compute_trend():
+        positions = None if len(view.positions) == len(dataset.frame) else view.positions
+        data = dataset.timeseries.series(granularity, positions)
+        if rolling:
+            data = add_rolling(data, window)
+        if yoy:
+            data = add_year_over_year(data, granularity)
+        return data
+    
+    with span('timeseries') as stage:
+        data = view_cache.get_or_compute(
+            (name, dataset.identity, view.spec, 'trend', granularity, rolling, yoy), compute_trend
+        )
+        stage['rows'] = len(view.positions)
+    st.plotly_chart(
+        build_figure(f'trend_{granularity}_{rolling}_{yoy}', lambda d: claims_trend_figure(d, granularity),
+                     data, filter_fingerprint(name, dataset, view)),
+        use_container_width=True
+    )
+
+
+def show_percentiles(view):
+    """Table of severity percentiles for the current selection."""
+    table = view.percentiles
+    formats = {'claimed': format_currency, 'paid': format_currency,
+               'loss_ratio': lambda value: format_percent(value * 100)}
+    columns = [column for column in table.columns if column.startswith('p')]
+    shown = pd.DataFrame({
+        column.upper(): [formats[metric](table.at[metric, column]) if pd.notna(table.at[metric, column])
+                         else "–" for metric in table.index]
+        for column in columns
+    }, index=[METRIC_LABELS[metric] for metric in table.index])
+    st.markdown("**Severity Percentiles**" + (" (≈ from the sample)" if view.approximate else ""))
+    st.dataframe(shown, use_container_width=True)
+    st.caption("Per claim; loss ratio is paid ÷ claimed. Within 1% of the exact values.")
+
+
+def show_severity_distribution(name, dataset, view, view_cache):
+    """Histogram of a severity metric per insurer, state or incident type."""
+    option_col1, option_col2 = st.columns(2)
+    metrics = {METRIC_LABELS[metric]: metric for metric in SKETCH_METRICS}
+    metric = metrics[option_col1.selectbox("Metric", list(metrics), key="severity_metric")]
+    groupings = {"Insurer": 'insurer_name', "State": 'insuredstate', "Incident type": 'natureOfincident'}
+    by = groupings[option_col2.selectbox("By", list(groupings), key="severity_by")]
+    with span('distribution') as stage:
+        data = view_cache.get_or_compute(
+            (name, dataset.identity, view.spec, 'distribution', metric, by),
+            lambda: compute_distribution(dataset, view, metric, by)
+        )
+        stage['rows'] = len(data)
+    st.plotly_chart(
+        build_figure(f'severity_{metric}_{by}',
+                     lambda d: severity_distribution_figure(d, METRIC_LABELS[metric], by,
+                                                            currency=metric != 'loss_ratio'),
+                     data, filter_fingerprint(name, dataset, view)),
+        use_container_width=True
+    )
+
+
+def show_top_keys(name, dataset, view, view_cache, n=20):
+    """Top cities, postal codes, insureds or providers of the current selection."""
+    with st.expander("🔝 Top cities, insureds and providers"):
+        if not dataset.heavy_hitters:
+            st.caption("No heavy-hitter trackers for this dataset")
+            return
+        option_col1, option_col2 = st.columns(2)
+        keys = {"City": 'insuredCity', "Postal code": 'insuredpostalCode',
+                "Insured": 'insuredname', "Provider": PROVIDER_KEY}
+        keys = {label: key for label, key in keys.items() if key in dataset.heavy_hitters}
+        label = option_col1.selectbox("Top", list(keys), key="top_keys_column")
+        key = keys[label]
+        by = option_col2.radio("Ranked by", ["Claims", "Payment"], horizontal=True,
+                               key="top_keys_by").lower()
+        
+        every_claim = is_estimate(view.spec, dataset_default_spec(dataset))
+        if view.positions is None and not every_claim:
+            # The trackers cover every claim; without rows they cannot be filtered
+            st.info("Streaming mode keeps no claim rows, so top keys cannot follow the filters. "
+                    "Clear the filters to see estimates over every claim.")
+            return
+        
+        with span('heavy_hitters') as stage:
+            top = view_cache.get_or_compute(
+                (name, dataset.identity, view.spec, 'heavy_hitters', key, by),
+                lambda: top_keys(dataset.heavy_hitters, dataset.frame, dataset.providers, key,
+                                 None if every_claim else view.positions, n, by)
+            )
+            stage['rows'] = len(top)
+        if every_claim:
+            st.caption("Estimated over every claim from the load-time sketches: counts may be "
+                       "slightly high. Apply a filter for exact counts.")
+        
+        columns = {'key': "Tax ID" if key == PROVIDER_KEY else label, 'name': 'Provider',
+                   'claims': 'Claims', 'payment': 'Paid'}
+        if key == 'insuredname':
+            top = flag_repeat_claimants(top)
+            columns['repeat'] = 'Repeat claimant'
+        st.dataframe(
+            top.rename(columns=columns).style.format({'Claims': '{:,.0f}', 'Paid': format_currency}),
+            hide_index=True,
+            use_container_width=True
+        )
+
+
+def show_claim_explorer(name, dataset, view, view_cache):
+    """Browse the claims of the current selection, one sorted page at a time."""
+    with st.expander("🗂️ Claim explorer"):
+        if view.positions is None:
+            st.caption("Streaming mode keeps no claim rows to browse")
+            return
+        frame = dataset.frame
+        all_columns = list(frame.columns)
+        columns = st.multiselect(
+            "Columns", all_columns,
+            default=[column for column in DEFAULT_EXPLORER_COLUMNS if column in frame],
+            key="explorer_columns"
+        )
+        option_col1, option_col2, option_col3 = st.columns(3)
+        sort_column = option_col1.selectbox("Sort by", ["(row order)"] + all_columns,
+                                            key="explorer_sort")
+        ascending = option_col2.radio("Direction", ["Ascending", "Descending"],
+                                      horizontal=True, key="explorer_direction") == "Ascending"
+        page_size = option_col3.selectbox("Rows per page", PAGE_SIZES,
+                                          index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+                                          key="explorer_page_size")
+        
+        # Only positions are kept per selection; rows are gathered per page
+        positions = view.positions
+        if sort_column in frame:
+            with span('explorer_sort') as stage:
+                order = view_cache.get_or_compute(
+                    (name, dataset.identity, 'sort', sort_column, ascending),
+                    lambda: sort_order(frame, sort_column, ascending)
+                )
+                positions = view_cache.get_or_compute(
+                    (name, dataset.identity, view.spec, 'explorer', sort_column, ascending),
+                    lambda: sorted_selection(order, view.positions, len(frame))
+                )
+                stage['rows'] = len(positions)
+        
+        pages = page_count(len(positions), page_size)
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages,
+                               value=1, step=1, key="explorer_page")
+        with span('explorer_page') as stage:
+            rows = page_frame(frame, positions, int(page), page_size, columns or all_columns)
+            stage['rows'] = len(rows)
+        st.caption(f"{len(positions):,} claims in the current selection")
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
+
+def show_export(dataset, view):
+    """Download the claims of the current selection as CSV or Parquet."""
+    with st.expander("📥 Export selected claims"):
+        if view.positions is None:
+            st.caption("Streaming mode keeps no claim rows to export")
+            return
+        columns = st.multiselect("Columns", list(dataset.frame.columns),
+                                 default=list(dataset.frame.columns), key="export_columns")
+        fmt = st.radio("Format", [name.capitalize() for name in EXPORT_FORMATS],
+                       horizontal=True, key="export_format").lower()
+        st.caption(f"{len(view.positions):,} claims in the current selection")
+        max_rows = get_download_max_rows()
+        if max_rows is not None and len(view.positions) > max_rows:
+            # Streamlit serves downloads from memory, so large files go to disk instead
+            st.info(f"Downloads are limited to {max_rows:,} claims. Narrow the filters, or export "
+                    f"this selection with `python reports/export_claims.py`, which streams to a file.")
+            return
+        if not columns or not st.button("Prepare download", key="export_prepare"):
+            return
+        
+        # Streamed to disk chunk by chunk; Streamlit then serves the finished file
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, f"claims.{fmt}")
+            with span('export') as stage:
+                write_export(path, dataset.frame, view.positions, fmt, columns)
+                stage['rows'] = len(view.positions)
+            with open(path, 'rb') as f:
+                st.download_button(f"Download {fmt.upper()}", f, file_name=f"claims.{fmt}",
+                                   mime=EXPORT_MIME_TYPES[fmt], key="export_download")
+
+
+def show_provider_lookup(dataset):
+    """Drill-down from a provider tax id to every claim it was paid on."""
+    tax_id = st.text_input("🔎 Provider tax ID lookup", placeholder="e.g. 46-0611042")
+    if not tax_id:
+        return
+    
+    with span('provider_lookup') as stage:
+        provider_id = dataset.tax_ids.provider_id(tax_id)
+        claims = dataset.tax_ids.claims(tax_id, dataset.frame)
+        stage['rows'] = len(claims)
+    if provider_id is None:
+        st.info(f"No provider with tax ID {tax_id.strip()}")
+        return
+    
+    name = dataset.providers.providers['name'].iloc[provider_id]
+    st.markdown(
+        f"**{name}** · {len(claims):,} claims · "
+        f"{claims['insurer_name'].nunique()} insurers · "
+        f"{format_currency(claims['payment'].sum())} paid"
+    )
+    st.dataframe(
+        claims.rename(columns={
+            'claimNumber': 'Claim', 'dateOfloss': 'Date of Loss', 'insurer_name': 'Insurer',
+            'insuredstate': 'State', 'specialty': 'Specialty', 'payment': 'Paid',
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+
 def main():
     """Main application function."""
+    start_run()
+    try:
+        registry = get_registry()
+        start_drop_folder_watcher(registry)
+        
+        st.sidebar.markdown("# 🛡️ Insurance Dashboard")
+        names = registry.names()
+        name = st.sidebar.selectbox("Dataset", names, key="dataset") if len(names) > 1 else names[0]
+        st.sidebar.markdown("---")
+        
+        # Hold the dataset for this rerun so it cannot be evicted meanwhile
+        with span('load'):
+            lease = registry.acquire(name)
+        with lease as shared_dataset:
+            render_dashboard(name, shared_dataset, registry.source(name))
+    finally:
+        finish_run()
+
+
+def render_dashboard(name, shared_dataset, data_path):
+    """Render the sidebar filters, KPI cards and charts for one dataset."""
     
-    # Load data
-    df = load_data()
-    
-    # Sidebar
-    st.sidebar.markdown("# 🛡️ Insurance Dashboard")
-    st.sidebar.markdown("---")
+    # Work from a snapshot so a concurrent append cannot change data mid-run
+    dataset = shared_dataset.snapshot()
+    cube = dataset.cube
+    # Filter options come from the claim rows, or the cube cells when streaming
+    options = dataset.frame if dataset.in_memory else cube.cells
     
     # Create filters
-    date_range = create_date_filter(df)
-    insurers = create_insurer_filter(df)
-    states = create_state_filter(df)
-    incidents = create_incident_filter(df)
-    injury = create_injury_filter(df)
+    date_range = create_date_filter(options, bounds=(cube.min_date, cube.max_date))
+    insurers = create_insurer_filter(options)
+    states = create_state_filter(options)
+    incidents = create_incident_filter(options)
+    injury = create_injury_filter(options)
+    text = create_text_search_filter()
+    approximate = st.sidebar.checkbox(
+        "Approximate first", value=approximate_mode_default(), key="approximate",
+        help="Show sampled estimates for slow selections while the exact figures are computed"
+    )
     
-    # Apply filters
-    filtered_df = apply_filters(df, date_range, insurers, states, incidents, injury)
+    # Apply filters (views are shared across sessions with the same selection)
+    spec = FilterSpec.from_selection(date_range, insurers, states, incidents, injury, text)
+    view_cache = get_view_cache()
+    key = (name, dataset.identity, spec)
+    refinement = None
+    with span('view'):
+        view = view_cache.get(key)
+        if view is None and approximate and should_approximate(dataset, spec):
+            # Exact view in the background; a sampled estimate until it is ready
+            refinement = get_shared_refiner(view_cache).submit(key, lambda: compute_view(dataset, spec))
+            with span('approximate') as stage:
+                sample = view_cache.get_or_compute(
+                    (name, dataset.identity, 'sample'), lambda: build_sample(dataset.frame)
+                )
+                view = approximate_view(dataset, spec, sample)
+                stage['rows'] = len(sample)
+        elif view is None:
+            view = compute_view(dataset, spec)
+            view_cache.put(key, view)
+    kpis = view.kpis
     
     # Show filter status
     st.sidebar.markdown("---")
-    st.sidebar.markdown(f"**Showing:** {len(filtered_df):,} of {len(df):,} claims")
+    st.sidebar.markdown(f"**Showing:** {kpis.total_claims:,} of {dataset.total_claims:,} claims")
+    if not dataset.in_memory and dataset.sql is None and not cube.can_answer(date_range):
+        st.sidebar.caption("Streaming mode: date range rounded to whole months")
+    if not dataset.in_memory and spec.text:
+        st.sidebar.caption("Streaming mode: description search is not available")
+    cache_stats = view_cache.stats()
+    record_cache_stats(cache_stats)
+    st.sidebar.caption(
+        f"View cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses"
+    )
+    memory = get_memory_report(data_path) if dataset.in_memory else None
+    if memory:
+        st.sidebar.caption(
+            f"Data in memory: {memory['after'] / 1e6:.1f} MB "
+            f"(untyped: {memory['before'] / 1e6:.1f} MB)"
+        )
+    show_performance = st.sidebar.checkbox("Show performance", value=False)
     
     # Main content
     st.markdown('<h1 class="main-header">Insurance Claims Analytics</h1>', unsafe_allow_html=True)
+    refine_status = st.empty()
+    if view.approximate:
+        refine_message = (f"≈ Estimated from a sample of {len(sample):,} claims (95% intervals); "
+                          f"exact figures are being computed")
+        refine_status.info(refine_message)
     
     # KPI Row
     st.markdown("### 📊 Key Metrics")
@@ -92,61 +486,65 @@ def main():
     
     with kpi_col1:
         st.markdown(
-            create_kpi_card(format_number(calculate_total_claims(filtered_df)), "Total Claims"),
+            kpi_card(view, 'total_claims', "Total Claims", format_number),
             unsafe_allow_html=True
         )
     
     with kpi_col2:
         st.markdown(
-            create_kpi_card(format_currency(calculate_total_claimed_losses(filtered_df)), "Total Claimed"),
+            kpi_card(view, 'total_claimed', "Total Claimed", format_currency),
             unsafe_allow_html=True
         )
     
     with kpi_col3:
         st.markdown(
-            create_kpi_card(format_currency(calculate_total_payments(filtered_df)), "Total Paid"),
+            kpi_card(view, 'total_paid', "Total Paid", format_currency),
             unsafe_allow_html=True
         )
     
     with kpi_col4:
         st.markdown(
-            create_kpi_card(format_currency(calculate_average_claim(filtered_df)), "Avg. Claim"),
+            kpi_card(view, 'average_claim', "Avg. Claim", format_currency),
             unsafe_allow_html=True
         )
     
     with kpi_col5:
         st.markdown(
-            create_kpi_card(f"{calculate_injury_rate(filtered_df):.1f}%", "Injury Rate"),
+            kpi_card(view, 'injury_rate', "Injury Rate", format_percent),
             unsafe_allow_html=True
         )
     
     with kpi_col6:
         st.markdown(
-            create_kpi_card(f"{calculate_payment_ratio(filtered_df):.1f}%", "Payment Ratio"),
+            kpi_card(view, 'payment_ratio', "Payment Ratio", format_percent),
             unsafe_allow_html=True
         )
     
     st.markdown("---")
     
+    # Every chart of the view at once; unchanged selections reuse the cached figures
+    figures = build_figures_cached(dashboard_figure_jobs(view), view_cache,
+                                   filter_fingerprint(name, dataset, view))
+    
     # Charts Row 1
     st.markdown("### 📈 Claims Analysis")
     
     chart_col1, chart_col2 = st.columns(2)
     
     with chart_col1:
-        st.plotly_chart(create_claims_by_insurer(filtered_df), use_container_width=True)
+        st.plotly_chart(figures['by_insurer'], use_container_width=True)
     
     with chart_col2:
-        st.plotly_chart(create_claims_by_incident_type(filtered_df), use_container_width=True)
+        st.plotly_chart(figures['by_incident'], use_container_width=True)
     
     # Charts Row 2
     chart_col3, chart_col4 = st.columns(2)
     
     with chart_col3:
-        st.plotly_chart(create_monthly_claims_trend(filtered_df), use_container_width=True)
+        show_trend_chart(name, dataset, view, view_cache, figures)
     
     with chart_col4:
-        st.plotly_chart(create_claims_by_state(filtered_df), use_container_width=True)
+        st.plotly_chart(figures['by_state'], use_container_width=True)
     
     # Charts Row 3
     st.markdown("### 💰 Payment Analysis")
@@ -154,10 +552,53 @@ def main():
     chart_col5, chart_col6 = st.columns(2)
     
     with chart_col5:
-        st.plotly_chart(create_payment_analysis(filtered_df), use_container_width=True)
+        st.plotly_chart(figures['payments'], use_container_width=True)
     
     with chart_col6:
-        st.plotly_chart(create_injury_analysis(filtered_df), use_container_width=True)
+        st.plotly_chart(figures['by_injury'], use_container_width=True)
+    
+    # Severity percentiles and distributions (merged from the cube's sketches)
+    st.markdown("### 📐 Claim Severity")
+    if view.percentiles is None:
+        st.caption("Percentiles need whole-month date ranges in streaming mode")
+    else:
+        severity_col1, severity_col2 = st.columns(2)
+        
+        with severity_col1:
+            show_percentiles(view)
+        
+        with severity_col2:
+            show_severity_distribution(name, dataset, view, view_cache)
+    
+    # Medical providers (needs claim rows, so not shown in streaming mode)
+    provider_data = view.provider_data
+    if provider_data is not None:
+        st.markdown("### 🩺 Medical Providers")
+        
+        chart_col7, chart_col8 = st.columns(2)
+        
+        with chart_col7:
+            st.plotly_chart(figures['by_specialty'], use_container_width=True)
+        
+        with chart_col8:
+            st.markdown("**Top Providers by Payment**")
+            top = provider_data['top_providers']
+            st.dataframe(
+                top[['name', 'tax_id', 'specialty', 'claims', 'payment']].rename(columns={
+                    'name': 'Provider', 'tax_id': 'Tax ID', 'specialty': 'Specialty',
+                    'claims': 'Claims', 'payment': 'Paid',
+                }).style.format({'Paid': format_currency}),
+                hide_index=True,
+                use_container_width=True
+            )
+        
+        show_provider_lookup(dataset)
+    elif view.approximate:
+        st.caption("🩺 Provider breakdown follows with the exact figures")
+    
+    show_top_keys(name, dataset, view, view_cache)
+    show_claim_explorer(name, dataset, view, view_cache)
+    show_export(dataset, view)
     
     # Footer
     st.markdown("---")
@@ -169,6 +610,12 @@ def main():
         """,
         unsafe_allow_html=True
     )
+    
+    if show_performance:
+        show_performance_panel(cache_stats)
+    
+    if refinement is not None:
+        wait_for_refinement(refinement, refine_status, refine_message)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+"""
+=============================================================================
+SCALING BENCHMARKS FOR INSURANCE DASHBOARD
+=============================================================================
+
+OVERVIEW
+--------
+Times and memory-profiles each stage of the dashboard pipeline on seeded
+synthetic data (see src/synthetic.py) at several scales, from 10k rows up to
+tens of millions.
+
+Stages measured at each scale:
+    parse_csv        Parse the CSV and apply the schema (cold start, no cache)
+    read_cache       Read the columnar cache (warm start)
+    build_dataset    Build the filter index and cube
+    filter_scan      apply_filters without an index
+    filter_index     FilterIndex.select for the same selection
+    kpis_separate    The seven calculate_* KPI functions, one after another
+    kpis_single      compute_kpis on the filtered rows
+    chart_data_rows  Chart aggregates from the filtered rows
+    cube_view        KPIs and chart aggregates from the cube
+    figures          Building the six Plotly figures from aggregates
+
+HOW TO RUN
+----------
+From the project root directory:
+
+    python benchmarks/run_benchmarks.py                          # 10k, 100k, 1M rows
+    python benchmarks/run_benchmarks.py --scales 10000 5000000
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+Results are written as JSON lines (one record per scale and stage). With
+--baseline, the run exits with status 1 if any stage got slower than the
+baseline by more than --tolerance.
+
+Memory is the peak traced by tracemalloc while the stage runs (NumPy and
+Python allocations; Arrow's own memory pool is not included).
+
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+# Add source directory to Python path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import kpis
+from charts import (
+    chart_data_from_rows,
+    claims_by_insurer_figure,
+    claims_by_incident_type_figure,
+    monthly_claims_trend_figure,
+    claims_by_state_figure,
+    payment_analysis_figure,
+    injury_analysis_figure
+)
+from data_loader import parse_claims_csv, read_claims
+from dataset import build_dataset
+from filters import apply_filters
+from synthetic import write_synthetic_csv
+
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+DEFAULT_RESULTS = Path(__file__).parent / "results" / "latest.jsonl"
+
+# Typical sidebar selection: one year, most insurers, a few states
+SELECTION = (
+    (date(2022, 1, 1), date(2022, 12, 31)),
+    ['StateFarm', 'Geico', 'Progressive', 'Allstate', 'USAA'],
+    ['CA', 'TX', 'FL', 'NY', 'IL', 'PA', 'OH', 'GA'],
+    [],
+    "All",
+)
+
+# Stages faster than this are too noisy to flag as regressions
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def measure(function, repeat):
+    """
+    Best wall time of `repeat` runs, then one traced run for peak memory.
+
+    Returns (result, seconds, peak_bytes).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def ensure_csv(workdir, n_rows, seed):
+    """Path to a synthetic CSV of n_rows rows, generated on first use."""
+    path = Path(workdir) / f"synthetic_{n_rows}_{seed}.csv"
+    if not path.exists():
+        write_synthetic_csv(path, n_rows, seed=seed)
+    return path
+
+
+def benchmark_scale(csv_path, n_rows, repeat):
+    """Run every stage on one dataset, yielding result records."""
+    stages = []
+
+    def stage(name, function, times=repeat):
+        result, seconds, peak = measure(function, times)
+        stages.append({
+            'scale': n_rows,
+            'stage': name,
+            'seconds': round(seconds, 6),
+            'peak_mb': round(peak / 1e6, 3),
+        })
+        return result
+
+    # Parsing is slow at large scales, so it is timed once
+    stage('parse_csv', lambda: parse_claims_csv(csv_path), times=1)
+    read_claims(csv_path)
+    df = stage('read_cache', lambda: read_claims(csv_path))
+    dataset = stage('build_dataset', lambda: build_dataset(df), times=1)
+
+    stage('filter_scan', lambda: apply_filters(df, *SELECTION))
+    positions = stage('filter_index', lambda: dataset.filter_index.select(*SELECTION))
+    rows = df.take(positions)
+
+    stage('kpis_separate', lambda: [
+        kpis.calculate_total_claims(rows),
+        kpis.calculate_total_claimed_losses(rows),
+        kpis.calculate_total_payments(rows),
+        kpis.calculate_average_claim(rows),
+        kpis.calculate_injury_rate(rows),
+        kpis.calculate_lawsuit_rate(rows),
+        kpis.calculate_payment_ratio(rows),
+    ])
+    stage('kpis_single', lambda: kpis.compute_kpis(rows))
+    chart_data = stage('chart_data_rows', lambda: chart_data_from_rows(rows))
+
+    def cube_view():
+        cells = dataset.cube.slice(*SELECTION)
+        return dataset.cube.kpis(cells), dataset.cube.chart_data(cells)
+    stage('cube_view', cube_view)
+
+    stage('figures', lambda: [
+        claims_by_insurer_figure(chart_data['by_insurer']),
+        claims_by_incident_type_figure(chart_data['by_incident']),
+        monthly_claims_trend_figure(chart_data['by_month']),
+        claims_by_state_figure(chart_data['by_state']),
+        payment_analysis_figure(chart_data['payments']),
+        injury_analysis_figure(chart_data['by_injury']),
+    ])
+    return stages
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Stages slower than their baseline by more than `tolerance` (a fraction).
+
+    Both arguments are lists of result records. Returns a list of
+    (record, baseline_seconds) pairs.
+    """
+    expected = {(r['scale'], r['stage']): r['seconds'] for r in baseline}
+    regressions = []
+    for record in results:
+        key = (record['scale'], record['stage'])
+        if key not in expected:
+            continue
+        limit = expected[key] * (1 + tolerance)
+        if record['seconds'] > limit and record['seconds'] - expected[key] > MIN_REGRESSION_SECONDS:
+            regressions.append((record, expected[key]))
+    return regressions
+
+
+def read_results(path):
+    """Load result records from a JSON lines file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_results(path, results):
+    """Write result records as JSON lines."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        for record in results:
+            f.write(json.dumps(record) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard scaling benchmarks")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help="row counts to benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="synthetic data seed")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument('--workdir', default=None,
+                        help="where generated CSVs are kept between runs (default: temp dir)")
+    parser.add_argument('--output', default=str(DEFAULT_RESULTS), help="results file (JSON lines)")
+    parser.add_argument('--baseline', default=None, help="baseline results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown versus baseline, as a fraction")
+    parser.add_argument('--save-baseline', default=None, help="also write results here as the new baseline")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(args.workdir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = []
+        for n_rows in args.scales:
+            csv_path = ensure_csv(workdir, n_rows, args.seed)
+            for record in benchmark_scale(csv_path, n_rows, args.repeat):
+                print(f"{record['scale']:>12,} {record['stage']:<16} "
+                      f"{record['seconds'] * 1000:>10.1f} ms {record['peak_mb']:>10.1f} MB")
+                results.append(record)
+
+    write_results(args.output, results)
+    if args.save_baseline:
+        write_results(args.save_baseline, results)
+
+    if args.baseline:
+        regressions = find_regressions(results, read_results(args.baseline), args.tolerance)
+        for record, expected in regressions:
+            print(f"REGRESSION {record['scale']:,} {record['stage']}: "
+                  f"{record['seconds'] * 1000:.1f} ms vs baseline {expected * 1000:.1f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+=============================================================================
+BATCH REPORTS FOR INSURANCE DASHBOARD
+=============================================================================
+
+OVERVIEW
+--------
+Builds the dashboard's KPIs and charts for many filter selections without
+Streamlit, e.g. the nightly pack with one report per insurer and per state.
+Reports are spread over a process pool (see src/batch_reports.py).
+
+Each report gets its own folder under the output directory:
+
+    <output>/<report name>/kpis.json         KPIs and the filters used
+    <output>/<report name>/<chart>.json      Plotly figure JSON
+    <output>/<report name>/<chart>.html      Standalone interactive chart
+    <output>/index.json                      Every report's KPIs
+
+PNG and SVG images are available with --formats png svg when the optional
+kaleido package is installed.
+
+HOW TO RUN
+----------
+From the project root directory:
+
+    python reports/build_reports.py --by insurer state
+    python reports/build_reports.py --specs nightly.json --workers 8
+    python reports/build_reports.py --by state --formats json --data data/big.csv
+
+A specs file is a JSON list of objects with a "name" and any of
+"date_range" (two ISO dates), "insurers", "states", "incidents", "injury"
+and "text", e.g.
+
+    [{"name": "geico-2023", "insurers": ["Geico"],
+      "date_range": ["2023-01-01", "2023-12-31"]}]
+
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add source directory to Python path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from batch_reports import (
+    DEFAULT_FORMATS,
+    FIGURE_FORMATS,
+    load_report_dataset,
+    report_spec_from_dict,
+    reports_by,
+    run_reports
+)
+from data_loader import DATA_PATH
+
+
+DEFAULT_OUTPUT = Path(__file__).parent / "output"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build dashboard reports without Streamlit")
+    parser.add_argument('--data', default=str(DATA_PATH), help="claims CSV")
+    parser.add_argument('--by', nargs='+', choices=['insurer', 'state'], default=[],
+                        help="one report per insurer and/or state")
+    parser.add_argument('--specs', default=None, help="JSON file with a list of report specs")
+    parser.add_argument('--formats', nargs='+', choices=FIGURE_FORMATS, default=DEFAULT_FORMATS,
+                        help="figure export formats")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help="output directory")
+    args = parser.parse_args(argv)
+
+    if not args.by and not args.specs:
+        parser.error("nothing to report: pass --by and/or --specs")
+
+    dataset = load_report_dataset(args.data)
+    reports = []
+    for dimension in args.by:
+        reports.extend(reports_by(dataset, dimension))
+    if args.specs:
+        with open(args.specs) as f:
+            reports.extend(report_spec_from_dict(data) for data in json.load(f))
+
+    start = time.perf_counter()
+    summaries = run_reports(args.data, reports, args.output, formats=args.formats,
+                            workers=args.workers, dataset=dataset)
+    print(f"Built {len(summaries)} reports in {time.perf_counter() - start:.1f} s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+=============================================================================
+CLAIMS EXPORT FOR INSURANCE DASHBOARD
+=============================================================================
+
+OVERVIEW
+--------
+Writes the claims behind a filter selection to a CSV or Parquet file,
+without Streamlit. The file is streamed out in chunks (see src/export.py),
+so memory stays flat however many claims are exported. Use it for
+selections larger than the dashboard's download limit
+(DASHBOARD_EXPORT_MAX_ROWS).
+
+HOW TO RUN
+----------
+From the project root directory:
+
+    python reports/export_claims.py --output geico.csv --filters '{"insurers": ["Geico"]}'
+    python reports/export_claims.py --output all.parquet --columns claimNumber dateOfloss total_insurance_payment
+
+--filters takes the same keys as a report spec (see build_reports.py):
+"date_range" (two ISO dates), "insurers", "states", "incidents", "injury"
+and "text". The format defaults to the output file's extension.
+
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add source directory to Python path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from batch_reports import load_report_dataset, report_spec_from_dict
+from data_loader import DATA_PATH
+from dataset import select_positions
+from export import DEFAULT_EXPORT_ROWS, EXPORT_FORMATS, write_export
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the claims of a filter selection")
+    parser.add_argument('--data', default=str(DATA_PATH), help="claims CSV")
+    parser.add_argument('--output', required=True, help="file to write")
+    parser.add_argument('--filters', default='{}', help="JSON object with the selection")
+    parser.add_argument('--columns', nargs='+', default=None, help="columns to export (default: all)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=None,
+                        help="output format (default: from the output extension)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_EXPORT_ROWS, help="claims per chunk")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or Path(args.output).suffix.lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        parser.error(f"cannot tell the format from {args.output!r}; pass --format")
+
+    dataset = load_report_dataset(args.data)
+    report = report_spec_from_dict({'name': 'export', **json.loads(args.filters)})
+    positions = select_positions(dataset, report.spec)
+
+    start = time.perf_counter()
+    written = write_export(args.output, dataset.frame, positions, fmt, args.columns, args.chunk_rows)
+    print(f"Exported {len(positions):,} claims ({written / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f} s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+Approximate Module
+==================
+Instant estimates for slow selections, refined to exact values in the background.
+
+Views the cube cannot answer (day-level date ranges, keyword queries) are
+aggregated from every matching claim row, which takes seconds on the
+largest datasets. In approximate mode the dashboard first shows the view
+estimated from a stratified sample of the claims, with 95% confidence
+intervals, while the exact view is computed on a background thread and
+swapped in when it is ready.
+
+The sample is stratified by insurer x state: every stratum contributes a
+fixed fraction of its claims (at least MIN_STRATUM_SAMPLE), so small
+insurers and states are not lost, and strata sampled in full add no
+error. Totals use the stratified estimator with a finite population
+correction; ratios (average claim, rates, loss ratio) use the ratio
+estimator's linearized variance.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from charts import CHART_DATA_KEYS
+from dataset import DashboardView, select_positions
+from kpis import KPIResult
+from schema import flag_mask, flag_values
+from sketches import percentile_table, sketch_rows
+from timeseries import MISSING_PERIOD, period_keys, period_labels
+
+
+STRATA_COLUMNS = ['insurer_name', 'insuredstate']
+
+# Share of each stratum's claims that is sampled
+SAMPLE_FRACTION = 0.01
+
+# Strata smaller than this are sampled in full
+MIN_STRATUM_SAMPLE = 30
+
+# Datasets smaller than this are always aggregated exactly
+APPROXIMATE_MIN_CLAIMS = 200_000
+
+# Normal quantile for 95% confidence intervals
+CONFIDENCE_Z = 1.96
+
+# Sample columns: what the KPI and chart estimates read
+SAMPLE_COLUMNS = [
+    'dateOfloss', 'insurer_name', 'insuredstate', 'natureOfincident',
+    'injuryinvolved', 'lawsuit_filed', 'total_claimed_losses', 'total_insurance_payment',
+]
+
+# Process-wide refiner, see get_shared_refiner()
+_shared_refiner = None
+_shared_lock = threading.Lock()
+
+
+def approximate_mode_default():
+    """Whether approximate mode starts switched on (DASHBOARD_APPROXIMATE)."""
+    return os.environ.get('DASHBOARD_APPROXIMATE', '').lower() in ('1', 'true', 'yes')
+
+
+def should_approximate(dataset, spec, min_claims=APPROXIMATE_MIN_CLAIMS):
+    """True when a view would be aggregated from claim rows of a large dataset."""
+    if not dataset.in_memory or dataset.total_claims < min_claims:
+        return False
+    return bool(spec.text) or not dataset.cube.can_answer(spec.date_range)
+
+
+# =============================================================================
+# STRATIFIED SAMPLE
+# =============================================================================
+
+@dataclass
+class StratifiedSample:
+    """Sampled claim rows with the stratum sizes needed to weight them."""
+
+    positions: np.ndarray    # sampled row positions, ascending
+    strata: np.ndarray       # stratum of each sampled row
+    population: np.ndarray   # claims per stratum (N_h)
+    sizes: np.ndarray        # sampled claims per stratum (n_h)
+    rows: pd.DataFrame       # SAMPLE_COLUMNS of the sampled claims
+
+    def __len__(self):
+        return len(self.positions)
+
+
+def build_sample(frame, fraction=SAMPLE_FRACTION, min_per_stratum=MIN_STRATUM_SAMPLE, seed=None):
+    """Draw a stratified random sample of the claims (insurer x state strata)."""
+    strata = frame.groupby(STRATA_COLUMNS, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    population = np.bincount(strata)
+    sizes = np.minimum(population, np.maximum(np.ceil(population * fraction), min_per_stratum)).astype(np.int64)
+
+    # Shuffle within strata, then keep each stratum's first n_h rows
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(frame)), strata))
+    starts = np.concatenate([[0], np.cumsum(population)[:-1]])
+    rank = np.arange(len(frame)) - np.repeat(starts, population)
+    positions = np.sort(order[rank < np.repeat(sizes, population)])
+
+    columns = [column for column in SAMPLE_COLUMNS if column in frame]
+    rows = frame.iloc[positions, [frame.columns.get_loc(column) for column in columns]]
+    return StratifiedSample(
+        positions=positions, strata=strata[positions], population=population, sizes=sizes,
+        rows=rows.reset_index(drop=True),
+    )
+
+
+def _estimate_totals(sample, values, groups=None, n_groups=1):
+    """
+    Estimated totals of `values` (one per sampled row) per group, and their variances.
+
+    Rows outside the selection carry a value of 0; `groups` holds each
+    row's group code (all in group 0 by default).
+    """
+    groups = np.zeros(len(sample), dtype=np.int64) if groups is None else groups
+    n_strata = len(sample.population)
+    cells = sample.strata * n_groups + groups
+    sums = np.bincount(cells, values, n_strata * n_groups).reshape(n_strata, n_groups)
+    squares = np.bincount(cells, values ** 2, n_strata * n_groups).reshape(n_strata, n_groups)
+
+    N = sample.population[:, None].astype('float64')
+    n = sample.sizes[:, None].astype('float64')
+    totals = (N / n * sums).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = np.where(n > 1, (squares - sums ** 2 / n) / (n - 1), 0.0)
+    variances = (N ** 2 * (1 - n / N) * np.maximum(spread, 0) / n).sum(axis=0)
+    return totals, variances
+
+
+# =============================================================================
+# ESTIMATED VIEW
+# =============================================================================
+
+def approximate_view(dataset, spec, sample):
+    """
+    The view of a FilterSpec estimated from a stratified sample.
+
+    Matching positions are exact (the filter index is fast); KPIs and chart
+    aggregates are estimates, with 95% half-widths in view.intervals and in
+    '<column>_error' chart columns; percentiles come from the sampled claims,
+    weighted. Provider aggregates are left to the exact view.
+    """
+    positions = select_positions(dataset, spec)
+    # Sampled rows that are in the selection (both position arrays ascending)
+    found = np.searchsorted(positions, sample.positions)
+    found[found == len(positions)] = 0
+    selected = (positions[found] == sample.positions) if len(positions) else np.zeros(len(sample), bool)
+
+    rows = sample.rows
+    kpis, intervals = _estimate_kpis(sample, rows, selected, len(positions))
+    chart_data = _estimate_chart_data(sample, rows, selected)
+    weights = (sample.population / sample.sizes)[sample.strata]
+    percentiles = percentile_table(sketch_rows(rows[selected], weights[selected]))
+    return DashboardView(spec=spec, positions=positions, kpis=kpis, chart_data=chart_data,
+                         intervals=intervals, percentiles=percentiles)
+
+
+def _estimate_kpis(sample, rows, selected, n_selected):
+    """
+    KPIResult of estimated totals, and half-widths for the displayed metrics.
+
+    The number of selected claims is known exactly, so each total is
+    estimated as n_selected times its ratio estimate per claim.
+    """
+    inside = selected.astype('float64')
+    values = {
+        'total_claims': inside,
+        'total_claimed': rows['total_claimed_losses'].to_numpy(dtype='float64') * inside,
+        'total_paid': rows['total_insurance_payment'].to_numpy(dtype='float64') * inside,
+        'injury_count': flag_mask(rows['injuryinvolved']) * inside,
+        'lawsuit_count': flag_mask(rows['lawsuit_filed']) * inside,
+    }
+    totals = {name: _estimate_totals(sample, column)[0][0] for name, column in values.items()}
+
+    def ratio_interval(numerator, denominator):
+        """Ratio of two estimated totals and its 95% half-width (linearized variance)."""
+        if totals[denominator] == 0:
+            return 0.0, 0.0
+        ratio = totals[numerator] / totals[denominator]
+        residuals = values[numerator] - ratio * values[denominator]
+        variance = _estimate_totals(sample, residuals)[1][0] / totals[denominator] ** 2
+        return ratio, CONFIDENCE_Z * np.sqrt(variance)
+
+    sums, intervals = {'total_claims': n_selected}, {'total_claims': 0.0}
+    per_claim = {}
+    for name in ('total_claimed', 'total_paid', 'injury_count', 'lawsuit_count'):
+        per_claim[name] = ratio_interval(name, 'total_claims')
+        sums[name] = n_selected * per_claim[name][0]
+    for name in ('injury_count', 'lawsuit_count'):
+        sums[name] = round(sums[name])
+
+    intervals['total_claimed'] = n_selected * per_claim['total_claimed'][1]
+    intervals['total_paid'] = n_selected * per_claim['total_paid'][1]
+    intervals['average_claim'] = per_claim['total_claimed'][1]
+    intervals['injury_rate'] = per_claim['injury_count'][1] * 100
+    intervals['lawsuit_rate'] = per_claim['lawsuit_count'][1] * 100
+    intervals['payment_ratio'] = ratio_interval('total_paid', 'total_claimed')[1] * 100
+    return KPIResult.from_sums(sums), {name: float(value) for name, value in intervals.items()}
+
+
+def _estimate_counts(sample, labels, selected, weights=None, label=None):
+    """Estimated [label, count] per value of `labels` (sampled rows), with errors."""
+    codes, uniques = pd.factorize(labels, sort=True)
+    keep = selected & (codes >= 0)
+    columns = {'count': np.ones(len(codes))} if weights is None else weights
+    frame = {label or labels.name: uniques}
+    groups = np.where(keep, codes, 0)
+    for name, values in columns.items():
+        totals, variances = _estimate_totals(sample, values * keep, groups, len(uniques))
+        frame[name] = totals
+        frame[f'{name}_error'] = CONFIDENCE_Z * np.sqrt(variances)
+    present = np.bincount(codes[keep], minlength=len(uniques)) > 0
+    return pd.DataFrame(frame)[present].reset_index(drop=True)
+
+
+def _estimate_chart_data(sample, rows, selected):
+    """Chart aggregates as in charts.chart_data_from_rows, estimated."""
+    keys = period_keys(rows['dateOfloss'], 'month')
+    dated = keys != MISSING_PERIOD
+    first = int(keys[dated].min()) if dated.any() else 0
+    months = pd.Series(np.where(dated, keys - first, -1))
+    by_month = _estimate_counts(sample, months.where(dated), selected, label='month')
+    by_month['month'] = period_labels(by_month['month'].to_numpy(dtype='int64') + first, 'month')
+
+    chart_data = {
+        'by_insurer': _estimate_counts(sample, rows['insurer_name'], selected),
+        'by_incident': _estimate_counts(sample, rows['natureOfincident'], selected),
+        'by_month': by_month,
+        'by_state': _estimate_counts(sample, rows['insuredstate'], selected),
+        'payments': _estimate_counts(sample, rows['insurer_name'], selected, weights={
+            'total_claimed_losses': rows['total_claimed_losses'].to_numpy(dtype='float64'),
+            'total_insurance_payment': rows['total_insurance_payment'].to_numpy(dtype='float64'),
+        }),
+        'by_injury': _estimate_counts(sample, pd.Series(flag_values(rows['injuryinvolved']),
+                                                        name='injuryinvolved'), selected),
+    }
+    return {key: chart_data[key] for key in CHART_DATA_KEYS}
+
+
+# =============================================================================
+# BACKGROUND REFINEMENT
+# =============================================================================
+
+def get_shared_refiner(cache):
+    """The process-wide Refiner, writing to `cache`, created on first use."""
+    global _shared_refiner
+    with _shared_lock:
+        if _shared_refiner is None:
+            _shared_refiner = Refiner(cache)
+        return _shared_refiner
+
+
+class Refiner:
+    """Computes exact views on a background thread and stores them in a cache."""
+
+    def __init__(self, cache, max_workers=1):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refine')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, compute):
+        """
+        Future of compute(), stored under `key` in the cache once done.
+
+        Sessions asking for a key that is already being computed share
+        the same future.
+        """
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._run, key, compute)
+                self._pending[key] = future
+            return future
+
+    def _run(self, key, compute):
+        try:
+            value = compute()
+            self.cache.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def pending(self):
+        """Number of views queued or being computed."""
+        with self._lock:
+            return len(self._pending)
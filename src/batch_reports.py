@@ -0,0 +1,199 @@
+"""
+Batch Reports Module
+====================
+Headless dashboard reports for many filter selections at once.
+
+run_reports() computes the dashboard (KPIs and figures) for a list of named
+FilterSpecs without Streamlit and writes one folder per report: kpis.json
+plus each figure as Plotly JSON, standalone HTML or, when the optional
+kaleido package is installed, PNG/SVG images.
+
+Reports are fanned out across a process pool. The dataset is loaded once in
+the parent; on platforms that fork, workers inherit it copy-on-write, so the
+claim columns and indexes are shared rather than pickled into every task.
+Elsewhere each worker loads it once at start-up from the memory-mapped
+columnar cache, whose pages the OS also shares between processes.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+from charts import build_figures, provider_spend_figure
+from data_loader import read_claims
+from dataset import build_dataset, compute_view
+from filters import FilterSpec
+from text_index import load_text_index
+
+
+FIGURE_FORMATS = ['json', 'html', 'png', 'svg']
+DEFAULT_FORMATS = ['json', 'html']
+
+# Image formats need kaleido, which is optional
+_IMAGE_FORMATS = {'png', 'svg'}
+
+# Dataset used by report workers (inherited when the pool forks)
+_worker_dataset = None
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """A named filter selection to report on."""
+
+    name: str
+    spec: FilterSpec
+
+
+def load_report_dataset(data_path):
+    """Dataset for reporting, read through the columnar and text caches."""
+    df = read_claims(data_path)
+    return build_dataset(df, text_index=load_text_index(data_path, df))
+
+
+def reports_by(dataset, dimension):
+    """One ReportSpec per insurer or per state (dimension 'insurer'/'state')."""
+    columns = {'insurer': ('insurer_name', 'insurers'), 'state': ('insuredstate', 'states')}
+    if dimension not in columns:
+        raise ValueError(f"Unknown report dimension {dimension!r}; use one of {sorted(columns)}")
+    column, field = columns[dimension]
+    values = dataset.frame[column].dropna().unique()
+    return [
+        ReportSpec(f"{dimension}-{value}", FilterSpec(**{field: (str(value),)}))
+        for value in sorted(map(str, values))
+    ]
+
+
+def report_spec_from_dict(data):
+    """
+    ReportSpec from a JSON-style dict.
+
+    Keys: name, and optionally date_range ([start, end] ISO dates), insurers,
+    states, incidents, injury and text.
+    """
+    date_range = [date.fromisoformat(value) for value in data.get('date_range', [])]
+    spec = FilterSpec.from_selection(
+        date_range,
+        data.get('insurers', []),
+        data.get('states', []),
+        data.get('incidents', []),
+        data.get('injury', "All"),
+        data.get('text', ""),
+    )
+    return ReportSpec(data['name'], spec)
+
+
+def _slug(name):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('_') or 'report'
+
+
+def build_report(dataset, report, output_dir, formats=DEFAULT_FORMATS):
+    """
+    Compute one report and write it under output_dir/<name>/.
+
+    Returns a summary dict with the report's name, folder and KPIs.
+    """
+    view = compute_view(dataset, report.spec)
+    folder = Path(output_dir) / _slug(report.name)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    kpis = view.kpis.as_dict()
+    with open(folder / 'kpis.json', 'w') as f:
+        json.dump({'name': report.name, 'filters': _spec_dict(report.spec), 'kpis': kpis}, f, indent=2)
+
+    figures = build_figures(view.chart_data)
+    if view.provider_data is not None:
+        figures['by_specialty'] = provider_spend_figure(view.provider_data['by_specialty'])
+    for key, figure in figures.items():
+        for fmt in formats:
+            path = folder / f"{key}.{fmt}"
+            if fmt == 'json':
+                path.write_text(figure.to_json())
+            elif fmt == 'html':
+                figure.write_html(path, include_plotlyjs='cdn', full_html=True)
+            else:
+                figure.write_image(path)
+
+    return {'name': report.name, 'folder': str(folder), 'kpis': kpis}
+
+
+def _spec_dict(spec):
+    return {
+        'date_range': [value.isoformat() for value in spec.date_range],
+        'insurers': list(spec.insurers),
+        'states': list(spec.states),
+        'incidents': list(spec.incidents),
+        'injury': spec.injury,
+        'text': spec.text,
+    }
+
+
+def _check_formats(formats):
+    unknown = set(formats) - set(FIGURE_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown figure formats: {sorted(unknown)}")
+    if _IMAGE_FORMATS & set(formats):
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            raise ValueError("PNG/SVG export needs the kaleido package; use json or html") from None
+
+
+def _init_worker(data_path):
+    """Load the dataset in a worker that did not inherit it."""
+    global _worker_dataset
+    if _worker_dataset is None:
+        _worker_dataset = load_report_dataset(data_path)
+
+
+def _run_in_worker(report, output_dir, formats):
+    return build_report(_worker_dataset, report, output_dir, formats)
+
+
+def run_reports(data_path, reports, output_dir, formats=DEFAULT_FORMATS, workers=None, dataset=None):
+    """
+    Build every report, in parallel across `workers` processes.
+
+    Writes output_dir/index.json listing each report's KPIs and returns
+    the same list of summaries, in the order of `reports`. With workers=1
+    the reports are built in this process.
+    """
+    global _worker_dataset
+    formats = list(formats)
+    _check_formats(formats)
+    reports = list(reports)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    in_process = workers == 1 or len(reports) <= 1
+    if dataset is None and (in_process or _can_fork()):
+        dataset = load_report_dataset(data_path)
+
+    if in_process:
+        summaries = [build_report(dataset, report, output_dir, formats) for report in reports]
+    else:
+        context = multiprocessing.get_context('fork') if _can_fork() else None
+        # Forked workers inherit the dataset; spawned ones load their own
+        _worker_dataset = dataset if context is not None else None
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(reports)), mp_context=context,
+                                     initializer=_init_worker, initargs=(str(data_path),)) as pool:
+                chunksize = max(1, len(reports) // (workers * 4))
+                summaries = list(pool.map(_run_in_worker, reports,
+                                          [output_dir] * len(reports), [formats] * len(reports),
+                                          chunksize=chunksize))
+        finally:
+            _worker_dataset = None
+
+    with open(output_dir / 'index.json', 'w') as f:
+        json.dump(summaries, f, indent=2)
+    return summaries
+
+
+def _can_fork():
+    return 'fork' in multiprocessing.get_all_start_methods()
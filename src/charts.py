@@ -2,9 +2,17 @@
 Charts Module - Plotly Visualizations with Dark Theme
 """
 
+import numpy as np
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from downsampling import (
+    DEFAULT_MAX_CATEGORIES, DEFAULT_MAX_POINTS, OTHER_LABEL, downsample_series, top_n_with_other
+)
+from schema import flag_label
+from timeseries import MISSING_PERIOD, period_keys, period_labels
+
 # Color palette for dark theme
 COLORS = {
     'primary': '#00d4ff',
@@ -32,12 +40,134 @@ def get_chart_layout():
     )
 
 
+# =============================================================================
+# CHART DATA
+# =============================================================================
+# Each chart is drawn from a small aggregate frame. The aggregates can come
+# from raw claim rows (below) or from the pre-aggregated cube (cube.py); both
+# produce the same frames, keyed by CHART_DATA_KEYS.
+
+CHART_DATA_KEYS = ['by_insurer', 'by_incident', 'by_month', 'by_state', 'payments', 'by_injury']
+
+
+def count_claims(df, column):
+    """Claim counts per value of a column, as a [column, 'count'] frame."""
+    return df.groupby(column, observed=True).size().reset_index(name='count')
+
+
+def count_claims_by_month(df):
+    """Claim counts per 'YYYY-MM' month label, in month order."""
+    keys = period_keys(df['dateOfloss'], 'month')
+    keys = keys[keys != MISSING_PERIOD]
+    if not len(keys):
+        return pd.DataFrame({'month': pd.Series([], dtype=object), 'count': pd.Series([], dtype='int64')})
+    first = int(keys.min())
+    counts = np.bincount(keys - first)
+    months = np.flatnonzero(counts)
+    return pd.DataFrame({'month': period_labels(months + first, 'month'), 'count': counts[months]})
+
+
+def sum_payments_by_insurer(df):
+    """Claimed and paid totals per insurer."""
+    return df.groupby('insurer_name', observed=True).agg({
+        'total_claimed_losses': 'sum',
+        'total_insurance_payment': 'sum'
+    }).reset_index()
+
+
+def chart_data_from_rows(df):
+    """All dashboard chart aggregates computed from claim rows."""
+    return {
+        'by_insurer': count_claims(df, 'insurer_name'),
+        'by_incident': count_claims(df, 'natureOfincident'),
+        'by_month': count_claims_by_month(df),
+        'by_state': count_claims(df, 'insuredstate'),
+        'payments': sum_payments_by_insurer(df),
+        'by_injury': count_claims(df, 'injuryinvolved'),
+    }
+
+
+# =============================================================================
+# CHARTS FROM CLAIM ROWS
+# =============================================================================
+
 def create_claims_by_insurer(df):
     """Bar chart: Claims by insurer."""
-    data = df.groupby('insurer_name').size().reset_index(name='count')
+    return claims_by_insurer_figure(count_claims(df, 'insurer_name'))
+
+
+def create_claims_by_incident_type(df):
+    """Pie chart: Incident type distribution."""
+    return claims_by_incident_type_figure(count_claims(df, 'natureOfincident'))
+
+
+def create_monthly_claims_trend(df):
+    """Line chart: Monthly claims trend."""
+    return monthly_claims_trend_figure(count_claims_by_month(df))
+
+
+def create_claims_by_state(df):
+    """Bar chart: Top 10 states by claims."""
+    return claims_by_state_figure(count_claims(df, 'insuredstate'))
+
+
+def create_payment_analysis(df):
+    """Bar chart: Claims vs payments by insurer."""
+    return payment_analysis_figure(sum_payments_by_insurer(df))
+
+
+def create_injury_analysis(df):
+    """Pie chart: Injury involvement."""
+    return injury_analysis_figure(count_claims(df, 'injuryinvolved'))
+
+
+# =============================================================================
+# FIGURES FROM AGGREGATES
+# =============================================================================
+# Builders take a point or category budget (see downsampling.py) so figure
+# payloads stay bounded: series are reduced with LTTB, and categories past
+# the budget are summed into an "Other" bar or slice.
+
+def _plain_labels(data):
+    """
+    Aggregate frame with categorical label columns turned into plain values.
+
+    Plotly Express groups by every category, including ones the filters
+    removed, and fails on those empty groups.
+    """
+    categorical = [c for c in data.columns if isinstance(data[c].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return data
+    return data.astype({column: object for column in categorical})
+
+
+def _error_column(data, column):
+    """
+    Name of the error-bar column for `column`, or None.
+
+    Estimated aggregates (see approximate.py) carry 95% half-widths in
+    '<column>_error' columns.
+    """
+    name = f'{column}_error'
+    return name if name in data else None
+
+
+def _with_errors(data, values):
+    """
+    `values` plus the error columns present for them, for top_n_with_other.
+
+    Errors summed into "Other" add up to an upper bound of its error.
+    """
+    values = [values] if isinstance(values, str) else list(values)
+    return values + [f'{column}_error' for column in values if _error_column(data, column)]
+
+
+def claims_by_insurer_figure(data, max_categories=DEFAULT_MAX_CATEGORIES):
+    """Bar chart of [insurer_name, count]; smaller insurers beyond the budget become "Other"."""
+    data = top_n_with_other(_plain_labels(data), 'insurer_name', _with_errors(data, 'count'), max_categories)
     data = data.sort_values('count', ascending=True)
     
-    fig = px.bar(data, x='count', y='insurer_name', orientation='h',
+    fig = px.bar(data, x='count', y='insurer_name', orientation='h', error_x=_error_column(data, 'count'),
                  color='insurer_name', color_discrete_sequence=CHART_COLORS,
                  title='Claims by Insurer')
     
@@ -47,10 +177,9 @@ def create_claims_by_insurer(df):
     return fig
 
 
-def create_claims_by_incident_type(df):
-    """Pie chart: Incident type distribution."""
-    data = df.groupby('natureOfincident').size().reset_index(name='count')
-    
+def claims_by_incident_type_figure(data, max_categories=DEFAULT_MAX_CATEGORIES):
+    """Pie chart of [natureOfincident, count]; the long tail becomes "Other"."""
+    data = top_n_with_other(_plain_labels(data), 'natureOfincident', 'count', max_categories)
     fig = px.pie(data, values='count', names='natureOfincident',
                  title='Incident Type Distribution',
                  color_discrete_sequence=CHART_COLORS, hole=0.4)
@@ -61,14 +190,11 @@ def create_claims_by_incident_type(df):
     return fig
 
 
-def create_monthly_claims_trend(df):
-    """Line chart: Monthly claims trend."""
-    df_copy = df.copy()
-    df_copy['month'] = df_copy['dateOfloss'].dt.to_period('M').astype(str)
-    data = df_copy.groupby('month').size().reset_index(name='count')
-    data = data.sort_values('month')
-    
-    fig = px.line(data, x='month', y='count', title='Monthly Claims Trend', markers=True)
+def monthly_claims_trend_figure(data, max_points=DEFAULT_MAX_POINTS):
+    """Line chart of [month, count], downsampled to at most max_points."""
+    data = downsample_series(data, 'count', max_points)
+    fig = px.line(data, x='month', y='count', title='Monthly Claims Trend', markers=True,
+                  error_y=_error_column(data, 'count'))
     
     fig.update_traces(line_color=COLORS['primary'], line_width=3,
                       marker=dict(size=8, color=COLORS['primary']))
@@ -78,12 +204,36 @@ def create_monthly_claims_trend(df):
     return fig
 
 
-def create_claims_by_state(df):
-    """Bar chart: Top 10 states by claims."""
-    data = df.groupby('insuredstate').size().reset_index(name='count')
-    data = data.sort_values('count', ascending=False).head(10)
+def claims_trend_figure(data, granularity, max_points=DEFAULT_MAX_POINTS):
+    """
+    Line chart of a time series from timeseries.TimeSeriesIndex.series().
+
+    Draws 'count', plus 'count_rolling' and 'count_previous_year' when present,
+    downsampled on 'count' to at most max_points.
+    """
+    data = downsample_series(data, 'count', max_points, x='period')
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=data['label'], y=data['count'], name='Claims', mode='lines+markers',
+                             line=dict(color=COLORS['primary'], width=3), marker=dict(size=6)))
+    if 'count_rolling' in data:
+        fig.add_trace(go.Scatter(x=data['label'], y=data['count_rolling'], name='Rolling average',
+                                 mode='lines', line=dict(color=COLORS['warning'], width=2)))
+    if 'count_previous_year' in data:
+        fig.add_trace(go.Scatter(x=data['label'], y=data['count_previous_year'], name='Previous year',
+                                 mode='lines', line=dict(color=COLORS['secondary'], width=2, dash='dash')))
     
-    fig = px.bar(data, x='insuredstate', y='count',
+    fig.update_layout(**get_chart_layout(), title=f'{granularity.capitalize()}ly Claims Trend'
+                      if granularity != 'day' else 'Daily Claims Trend', height=300)
+    fig.update_xaxes(gridcolor='rgba(255,255,255,0.1)', tickangle=45, title='')
+    fig.update_yaxes(gridcolor='rgba(255,255,255,0.1)', title='')
+    return fig
+
+
+def claims_by_state_figure(data):
+    """Bar chart of the top 10 rows of [insuredstate, count]."""
+    data = _plain_labels(data).sort_values('count', ascending=False).head(10)
+    
+    fig = px.bar(data, x='insuredstate', y='count', error_y=_error_column(data, 'count'),
                  color='count', color_continuous_scale='Teal',
                  title='Top 10 States by Claims')
     
@@ -93,18 +243,17 @@ def create_claims_by_state(df):
     return fig
 
 
-def create_payment_analysis(df):
-    """Bar chart: Claims vs payments by insurer."""
-    data = df.groupby('insurer_name').agg({
-        'total_claimed_losses': 'sum',
-        'total_insurance_payment': 'sum'
-    }).reset_index()
-    
+def payment_analysis_figure(data, max_categories=DEFAULT_MAX_CATEGORIES):
+    """Grouped bars of [insurer_name, total_claimed_losses, total_insurance_payment]."""
+    data = top_n_with_other(_plain_labels(data), 'insurer_name',
+                            _with_errors(data, ['total_claimed_losses', 'total_insurance_payment']),
+                            max_categories)
     fig = go.Figure()
-    fig.add_trace(go.Bar(name='Claimed', x=data['insurer_name'],
-                         y=data['total_claimed_losses'], marker_color=COLORS['warning']))
-    fig.add_trace(go.Bar(name='Paid', x=data['insurer_name'],
-                         y=data['total_insurance_payment'], marker_color=COLORS['success']))
+    for name, column, color in [('Claimed', 'total_claimed_losses', COLORS['warning']),
+                                ('Paid', 'total_insurance_payment', COLORS['success'])]:
+        error = _error_column(data, column)
+        fig.add_trace(go.Bar(name=name, x=data['insurer_name'], y=data[column], marker_color=color,
+                             error_y=dict(array=data[error]) if error else None))
     
     fig.update_layout(**get_chart_layout(), title='Claims vs Payments by Insurer',
                       barmode='group', height=300)
@@ -113,9 +262,9 @@ def create_payment_analysis(df):
     return fig
 
 
-def create_injury_analysis(df):
-    """Pie chart: Injury involvement."""
-    data = df.groupby('injuryinvolved').size().reset_index(name='count')
+def injury_analysis_figure(data):
+    """Pie chart of [injuryinvolved, count]."""
+    data = data.assign(injuryinvolved=data['injuryinvolved'].map(flag_label))
     
     fig = px.pie(data, values='count', names='injuryinvolved',
                  title='Injury Involvement',
@@ -124,3 +273,64 @@ def create_injury_analysis(df):
     fig.update_layout(**get_chart_layout(), height=300)
     fig.update_traces(textfont=dict(color='white'))
     return fig
+
+
+def provider_spend_figure(data, max_categories=DEFAULT_MAX_CATEGORIES):
+    """Bar chart of provider payments per specialty, from [specialty, payment, ...]."""
+    data = top_n_with_other(_plain_labels(data), 'specialty', 'payment', max_categories)
+    data = data.sort_values('payment', ascending=True)
+    
+    fig = px.bar(data, x='payment', y='specialty', orientation='h',
+                 color='specialty', color_discrete_sequence=CHART_COLORS,
+                 title='Provider Payments by Specialty')
+    
+    fig.update_layout(**get_chart_layout(), showlegend=False, height=300)
+    fig.update_xaxes(gridcolor='rgba(255,255,255,0.1)', title='')
+    fig.update_yaxes(gridcolor='rgba(255,255,255,0.1)', title='')
+    return fig
+
+
+def severity_distribution_figure(data, metric_label, by, currency=True, max_categories=8):
+    """
+    Lines of the share of each group's claims per severity bin.
+
+    Takes [by, low, high, count] from sketches.distribution(); groups past
+    the budget are combined into "Other". Bins are labelled by their lower
+    edge.
+    """
+    data = _plain_labels(data)
+    totals = data.groupby(by)['count'].sum()
+    if len(totals) > max_categories:
+        keep = totals.nlargest(max_categories - 1).index
+        data = data.assign(**{by: data[by].where(data[by].isin(keep), OTHER_LABEL)})
+        data = data.groupby([by, 'low', 'high'], as_index=False)['count'].sum()
+    data = data.sort_values(['low', by])
+    share = data['count'] / data.groupby(by)['count'].transform('sum') * 100
+    edges = data['low'].map((lambda value: f"${value:,.0f}") if currency else (lambda value: f"{value:.2f}"))
+    data = data.assign(share=share, bin=edges)
+    
+    fig = px.line(data, x='bin', y='share', color=by, markers=True,
+                  color_discrete_sequence=CHART_COLORS,
+                  title=f'{metric_label} Distribution',
+                  labels={'share': '% of claims', 'bin': metric_label, by: ''})
+    
+    fig.update_layout(**get_chart_layout(), height=300)
+    fig.update_xaxes(gridcolor='rgba(255,255,255,0.1)', tickangle=45, type='category')
+    fig.update_yaxes(gridcolor='rgba(255,255,255,0.1)')
+    return fig
+
+
+# Figure builder for each chart data key
+CHART_FIGURES = {
+    'by_insurer': claims_by_insurer_figure,
+    'by_incident': claims_by_incident_type_figure,
+    'by_month': monthly_claims_trend_figure,
+    'by_state': claims_by_state_figure,
+    'payments': payment_analysis_figure,
+    'by_injury': injury_analysis_figure,
+}
+
+
+def build_figures(chart_data):
+    """Every dashboard figure for a dict of chart aggregates, by key."""
+    return {key: CHART_FIGURES[key](chart_data[key]) for key in CHART_DATA_KEYS}
@@ -0,0 +1,75 @@
+"""
+Claim IDs Module
+================
+Compact index of the claim numbers loaded, for deduplicating appends.
+
+A Python set of claim number strings costs around 100 bytes per claim and
+had to be copied on every append. ClaimIds keeps 64-bit hashes of the
+claim numbers instead (8 bytes per claim) in a few sorted runs: an append
+adds the delta's hashes as a new run, and runs of similar size are merged
+pairwise, so each hash is re-merged O(log n) times over the dataset's
+life instead of on every append. Lookups binary-search each run.
+
+Two distinct claim numbers share a hash with probability about
+n^2 / 2^65 (under 1e-5 for 10M claims); such a claim would be taken for
+a duplicate.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def hash_claim_ids(ids):
+    """64-bit hashes of the present values of a claim number column."""
+    ids = ids.dropna()
+    return pd.util.hash_array(ids.to_numpy(dtype=object))
+
+
+class ClaimIds:
+    """Hashes of the loaded claim numbers, as sorted runs that grow by appends."""
+
+    def __init__(self, runs=()):
+        # Sorted, disjoint runs, largest first
+        self.runs = list(runs)
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Index of the claim numbers in a column (missing values skipped)."""
+        return cls().extend(ids)
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self.runs)
+
+    def contains(self, ids):
+        """Boolean mask of the values of `ids` that are already loaded."""
+        found = np.zeros(len(ids), dtype=bool)
+        present = ids.notna().to_numpy()
+        found[present] = self._contains_hashes(hash_claim_ids(ids))
+        return found
+
+    def extend(self, ids):
+        """
+        New index with the claim numbers of `ids` added; this one is unchanged.
+
+        Values already loaded are not added twice.
+        """
+        hashes = np.unique(hash_claim_ids(ids))
+        hashes = hashes[~self._contains_hashes(hashes)]
+        runs = list(self.runs)
+        while runs and len(runs[-1]) <= len(hashes):
+            # Disjoint sorted runs: a stable (radix) sort merges them in linear time
+            hashes = np.sort(np.concatenate([runs.pop(), hashes]), kind='stable')
+        if len(hashes):
+            runs.append(hashes)
+        return ClaimIds(runs)
+
+    def _contains_hashes(self, hashes):
+        matched = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            slots = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            matched |= run[slots] == hashes
+        return matched
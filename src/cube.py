@@ -0,0 +1,257 @@
+"""
+Cube Module
+===========
+Pre-aggregated claim totals for the dashboard.
+
+The cube holds one row ("cell") per insurer x state x incident type x injury
+flag x month that actually occurs in the data, with the additive KPI totals
+for that cell. Sidebar filters and charts are then answered by slicing and
+summing cells, so their cost depends on the number of cells rather than the
+number of claims.
+
+Cells are monthly, so the cube can only answer date ranges that start and end
+on month boundaries (or reach past the ends of the data). The default full
+range always qualifies; anything else falls back to the claim rows.
+
+Each cell also keeps quantile sketches of claim severity (see sketches.py),
+which merge into the percentiles and distributions of any slice.
+"""
+
+import calendar
+
+import numpy as np
+import pandas as pd
+
+from kpis import KPI_SUMS, KPIResult
+from schema import concat_claims, flag_mask, flag_values
+from sketches import build_cell_sketches, merge_cell_sketches
+
+
+# Cell dimensions in the order they are grouped
+CUBE_DIMENSIONS = ['insurer_name', 'insuredstate', 'natureOfincident', 'injuryinvolved', 'month']
+
+# Dimensions stored as categoricals
+LABEL_DIMENSIONS = ['insurer_name', 'insuredstate', 'natureOfincident']
+
+# Month key for claims without a date of loss
+NO_MONTH = -1
+
+
+def month_keys(dates):
+    """Integer month keys (year * 12 + month - 1); NO_MONTH where missing."""
+    dates = pd.DatetimeIndex(dates)
+    keys = dates.year.to_numpy(dtype='float64') * 12 + dates.month.to_numpy(dtype='float64') - 1
+    return np.where(np.isnan(keys), NO_MONTH, keys).astype('int32')
+
+
+def month_label(key):
+    """'YYYY-MM' label for a month key."""
+    return f"{key // 12:04d}-{key % 12 + 1:02d}"
+
+
+class ClaimsCube:
+    """Claim totals per insurer, state, incident, injury flag and month."""
+
+    def __init__(self, cells, min_date, max_date, sketches=None):
+        self.cells = cells
+        self.min_date = min_date
+        self.max_date = max_date
+        # CellSketches keyed by position in `cells`
+        self.sketches = sketches
+        # Cell position by dimension values, built on the first extend_cube()
+        self._positions = None
+
+    def cell_positions(self):
+        """
+        {dimension values: cell position}, shared with the cubes extended from this one.
+
+        Extended cubes add their new cells to the same dict, so a dict with
+        more entries than this cube has cells belongs to a later cube, and
+        this one builds its own.
+        """
+        if self._positions is None or len(self._positions) != len(self.cells):
+            self._positions = dict(zip(_cell_keys(self.cells), range(len(self.cells))))
+        return self._positions
+
+    def can_answer(self, date_range):
+        """True if the date range lines up with the cube's monthly cells."""
+        if len(date_range) != 2:
+            return True
+        if pd.isna(self.min_date):
+            return False
+
+        start_date, end_date = date_range
+        starts_on_month = start_date.day == 1 or start_date <= self.min_date.date()
+        last_day = calendar.monthrange(end_date.year, end_date.month)[1]
+        ends_on_month = end_date.day == last_day or end_date >= self.max_date.date()
+        return starts_on_month and ends_on_month
+
+    def slice(self, date_range, insurers, states, incidents, injury):
+        """
+        Cells matching the sidebar selections.
+
+        Takes the same arguments as filters.apply_filters. Check can_answer()
+        first: a range that splits a month would include the whole month.
+        """
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+
+        if len(date_range) == 2:
+            start_date, end_date = date_range
+            start = start_date.year * 12 + start_date.month - 1
+            end = end_date.year * 12 + end_date.month - 1
+            months = cells['month'].to_numpy()
+            mask &= (months >= start) & (months <= end)
+
+        selections = {
+            'insurer_name': insurers,
+            'insuredstate': states,
+            'natureOfincident': incidents,
+        }
+        for column, selected in selections.items():
+            if selected:
+                mask &= cells[column].isin(selected).to_numpy()
+
+        if injury != "All":
+            mask &= flag_mask(cells['injuryinvolved'], injury)
+
+        return cells[mask]
+
+    def kpis(self, cells=None):
+        """KPIResult for a slice of cells (default: the whole cube)."""
+        if cells is None:
+            cells = self.cells
+        return KPIResult.from_sums(cells[KPI_SUMS].sum())
+
+    def percentiles(self, cells=None):
+        """Severity percentile table for a slice of cells (see sketches.percentile_table)."""
+        if self.sketches is None:
+            return None
+        return self.sketches.percentiles(cells)
+
+    def distribution(self, cells, metric, by):
+        """Histogram of a sketched metric per value of cell column `by`."""
+        if cells is None:
+            cells = self.cells
+        return self.sketches.distribution(cells, metric, by)
+
+    def chart_data(self, cells=None):
+        """All dashboard chart aggregates for a slice of cells."""
+        if cells is None:
+            cells = self.cells
+
+        def counts(column):
+            return (cells.groupby(column, observed=True)['total_claims'].sum()
+                    .reset_index(name='count'))
+
+        dated = cells[cells['month'] != NO_MONTH]
+        by_month = dated.groupby('month')['total_claims'].sum()
+        by_month = pd.DataFrame({
+            'month': [month_label(key) for key in by_month.index],
+            'count': by_month.to_numpy(),
+        })
+
+        payments = cells.groupby('insurer_name', observed=True)[['total_claimed', 'total_paid']].sum()
+        payments = payments.reset_index().rename(columns={
+            'total_claimed': 'total_claimed_losses',
+            'total_paid': 'total_insurance_payment',
+        })
+
+        return {
+            'by_insurer': counts('insurer_name'),
+            'by_incident': counts('natureOfincident'),
+            'by_month': by_month,
+            'by_state': counts('insuredstate'),
+            'payments': payments,
+            'by_injury': counts('injuryinvolved'),
+        }
+
+
+def build_cube(df):
+    """Aggregate claim rows into a ClaimsCube."""
+    values = pd.DataFrame({
+        'insurer_name': df['insurer_name'].array,
+        'insuredstate': df['insuredstate'].array,
+        'natureOfincident': df['natureOfincident'].array,
+        'injuryinvolved': flag_values(df['injuryinvolved']),
+        'month': month_keys(df['dateOfloss']),
+        'total_claims': np.ones(len(df), dtype='int64'),
+        'total_claimed': df['total_claimed_losses'].to_numpy(dtype='float64'),
+        'total_paid': df['total_insurance_payment'].to_numpy(dtype='float64'),
+        'injury_count': flag_mask(df['injuryinvolved']).astype('int64'),
+        'lawsuit_count': flag_mask(df['lawsuit_filed']).astype('int64'),
+    })
+    grouped = values.groupby(CUBE_DIMENSIONS, observed=True, sort=False, dropna=False)
+    cells = grouped.sum().reset_index()
+    sketches = build_cell_sketches(df, grouped.ngroup().to_numpy())
+    return ClaimsCube(cells, df['dateOfloss'].min(), df['dateOfloss'].max(), sketches)
+
+
+def extend_cube(cube, delta):
+    """
+    The cube of `cube`'s claims plus the claim rows of `delta` (for appends).
+
+    Unlike merge_cubes, nothing is regrouped: the delta's cells are looked
+    up by their dimensions, their sums added to the cells that exist and
+    the rest appended as new cells, and their sketches appended (see
+    CellSketches.extend). `cube` itself is unchanged.
+    """
+    delta_cube = build_cube(delta)
+    positions = cube.cell_positions()
+    n_cells = len(cube.cells)
+    cell_map = np.array([positions.get(key, n_cells) for key in _cell_keys(delta_cube.cells)], dtype=np.int64)
+    new = cell_map >= n_cells
+    cell_map[new] = n_cells + np.arange(int(new.sum()))
+    for key, position in zip(_cell_keys(delta_cube.cells[new]), cell_map[new].tolist()):
+        positions[key] = position
+
+    sums = {}
+    for column in KPI_SUMS:
+        values = cube.cells[column].to_numpy().copy()
+        values[cell_map[~new]] += delta_cube.cells[column].to_numpy()[~new]
+        sums[column] = values
+    cells = concat_claims([cube.cells.assign(**sums), delta_cube.cells[new]])
+
+    sketches = None
+    if cube.sketches is not None and delta_cube.sketches is not None:
+        sketches = cube.sketches.extend(delta_cube.sketches, cell_map)
+    min_dates = pd.Series([cube.min_date, delta_cube.min_date], dtype='datetime64[ns]')
+    max_dates = pd.Series([cube.max_date, delta_cube.max_date], dtype='datetime64[ns]')
+    extended = ClaimsCube(cells, min_dates.min(), max_dates.max(), sketches)
+    extended._positions = positions
+    return extended
+
+
+def _cell_keys(cells):
+    """Hashable dimension values of each cell, with missing labels as None."""
+    columns = [cells[column].astype(object).where(cells[column].notna(), None).tolist()
+               for column in CUBE_DIMENSIONS]
+    return list(zip(*columns))
+
+
+def merge_cubes(cubes):
+    """
+    Combine cubes built from disjoint sets of claims into one.
+
+    Cells for the same dimensions are summed, and their sketches merged, so
+    merging the cubes of each chunk of a file gives the cube of the whole file.
+    """
+    cubes = list(cubes)
+    cells = pd.concat([cube.cells for cube in cubes], ignore_index=True)
+    # Chunks may carry different category sets; regroup on plain labels
+    cells = cells.astype({column: object for column in LABEL_DIMENSIONS})
+    grouped = cells.groupby(CUBE_DIMENSIONS, observed=True, sort=False, dropna=False)
+    merged_ids = grouped.ngroup().to_numpy()
+    cells = grouped[KPI_SUMS].sum().reset_index()
+    cells = cells.astype({column: 'category' for column in LABEL_DIMENSIONS})
+
+    sketches = None
+    if all(cube.sketches is not None for cube in cubes):
+        # Where each input cube's cells ended up in the merged cells
+        offsets = np.cumsum([0] + [len(cube.cells) for cube in cubes])
+        cell_maps = [merged_ids[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        sketches = merge_cell_sketches([cube.sketches for cube in cubes], cell_maps)
+
+    min_dates = pd.Series([cube.min_date for cube in cubes], dtype='datetime64[ns]')
+    max_dates = pd.Series([cube.max_date for cube in cubes], dtype='datetime64[ns]')
+    return ClaimsCube(cells, min_dates.min(), max_dates.max(), sketches)
@@ -2,32 +2,254 @@
 Data Loader Module
 ==================
 This module handles loading and caching the insurance data.
+
+Parsing a large CSV is by far the slowest part of a cold start, so the parsed
+frame is also written to a columnar Arrow (Feather V2) cache next to the CSV.
+The cache is keyed on the CSV's size, modification time and content hash and
+is only rebuilt when the source actually changes; otherwise it is read back
+memory-mapped, which costs roughly the same no matter how big the CSV is.
+
+The frame is typed with the declared schema in schema.py before it is cached,
+and the memory footprint before and after typing is recorded alongside it.
 """
 
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
 import pandas as pd
 import streamlit as st
-from pathlib import Path
+
+from schema import STRING_READ_COLUMNS, apply_schema, memory_footprint, text_dtype
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = Path(__file__).parent.parent / "data" / "auto_insurance_data.csv"
+
+# Columnar caches live in a hidden folder next to the source CSV
+CACHE_DIR_NAME = ".cache"
+
+# Bump this whenever the parsed frame changes shape so old caches are ignored
+CACHE_VERSION = 4
 
 
 @st.cache_data
 def load_data():
     """
     Load the insurance CSV data with caching.
-    
+
     Streamlit's @cache_data decorator means this function only runs once,
     then the result is cached for subsequent calls - much faster!
+    A fresh process reads the columnar cache instead of re-parsing the CSV.
+    """
+    return read_claims(DATA_PATH)
+
+
+def read_claims(data_path, use_cache=True):
+    """
+    Read a claims CSV, going through the columnar cache when possible.
+
+    Returns the same frame as parsing the CSV directly. Set use_cache=False
+    to always parse the CSV (the cache is then neither read nor written).
     """
-    # Get the path relative to this file's location
-    data_path = Path(__file__).parent.parent / "data" / "auto_insurance_data.csv"
-    
-    df = pd.read_csv(data_path)
-    
+    data_path = Path(data_path)
+    if not use_cache:
+        return parse_claims_csv(data_path)
+
+    cache_path, meta_path = get_cache_paths(data_path)
+    stat = data_path.stat()
+    meta = _read_cache_meta(meta_path)
+
+    digest = None
+    if meta is not None and cache_path.exists():
+        if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+            return _read_columnar(cache_path)
+
+        # The file was touched or copied: only a content change forces a rebuild
+        if meta['size'] == stat.st_size:
+            digest = file_digest(data_path)
+            if digest == meta['sha256']:
+                meta.update(_fingerprint(stat, digest))
+                _write_cache_meta(meta_path, meta)
+                return _read_columnar(cache_path)
+
+    df, memory = parse_claims_csv(data_path, with_memory_report=True)
+    # Reuse the digest of a mismatch check rather than hashing the file twice
+    meta = _fingerprint(stat, digest if digest is not None else file_digest(data_path))
+    meta['memory'] = memory
+    _write_cache(df, cache_path, meta_path, meta)
+    return df
+
+
+def parse_claims_csv(data_path, with_memory_report=False):
+    """
+    Parse the claims CSV into a typed DataFrame (no caching).
+
+    With with_memory_report=True, also returns a dict with the frame's
+    memory footprint in bytes before and after the schema was applied.
+    """
+    df = pd.read_csv(data_path, dtype=STRING_READ_COLUMNS)
+
     # Convert date column to datetime
     df['dateOfloss'] = pd.to_datetime(df['dateOfloss'], errors='coerce')
-    
+
+    before = memory_footprint(df)
+    df = apply_schema(df)
+    memory = {'before': before, 'after': memory_footprint(df)}
+    logger.info(
+        "Loaded %s: %d rows, %.1f MB raw -> %.1f MB typed",
+        Path(data_path).name, len(df),
+        memory['before'] / 1e6, memory['after'] / 1e6
+    )
+
+    if with_memory_report:
+        return df, memory
     return df
 
 
+def get_memory_report(data_path=DATA_PATH):
+    """
+    Memory footprint recorded when a CSV was last parsed into the cache.
+
+    Returns a dict with 'before' and 'after' byte counts, or None if the CSV
+    has not been cached yet.
+    """
+    _, meta_path = get_cache_paths(data_path)
+    meta = _read_cache_meta(meta_path)
+    if meta is None:
+        return None
+    return meta.get('memory')
+
+
+def get_cache_paths(data_path):
+    """Return the (columnar file, metadata file) paths used to cache a CSV."""
+    data_path = Path(data_path)
+    cache_dir = data_path.parent / CACHE_DIR_NAME
+    return (
+        cache_dir / f"{data_path.stem}.arrow",
+        cache_dir / f"{data_path.stem}.json",
+    )
+
+
+def get_derived_cache_path(data_path, suffix):
+    """Path for another structure derived from a CSV, kept with its cache."""
+    data_path = Path(data_path)
+    return data_path.parent / CACHE_DIR_NAME / f"{data_path.stem}.{suffix}"
+
+
+def get_cache_key(data_path):
+    """
+    Content hash of a CSV as recorded in its cache metadata.
+
+    Derived structures saved under this key are valid for as long as the
+    columnar cache is. None if the CSV has not been cached.
+    """
+    _, meta_path = get_cache_paths(data_path)
+    meta = _read_cache_meta(meta_path)
+    if meta is None:
+        return None
+    return meta['sha256']
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(stat, digest):
+    """Identity of a source file as stored in the cache metadata."""
+    return {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+    }
+
+
+def _read_cache_meta(meta_path):
+    """Load cache metadata, or None if it is missing, unreadable or stale."""
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    return meta
+
+
+def _write_cache_meta(meta_path, meta):
+    """Atomically replace the cache metadata file."""
+    try:
+        tmp_path = meta_path.with_name(meta_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+    except OSError:
+        pass
+
+
+def _write_cache(df, cache_path, meta_path, meta):
+    """Write the columnar cache, then its metadata. Failures are not fatal."""
+    from pyarrow import feather
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Drop the old metadata first so a half-written cache is never trusted
+        meta_path.unlink(missing_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        # Uncompressed and in one record batch, so that columns can be
+        # memory-mapped on read without being copied
+        feather.write_feather(df, tmp_path, compression='uncompressed', chunksize=max(len(df), 1))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Read-only deployments simply keep parsing the CSV
+        return
+    _write_cache_meta(meta_path, meta)
+
+
+def _read_columnar(cache_path):
+    """
+    Read a columnar cache file memory-mapped.
+
+    Numeric and date columns without missing values are read-only views of
+    the mapped file rather than copies: their pages live in the OS page
+    cache, shared by every process that reads the same cache.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    # Arrow strings and booleans come back as python objects unless mapped explicitly
+    types = {pa.string(): text_dtype(), pa.large_string(): text_dtype(), pa.bool_(): pd.BooleanDtype()}
+    table = feather.read_table(cache_path, memory_map=True)
+    mapped = {
+        name: column.chunk(0).to_numpy(zero_copy_only=True)
+        for name, column in zip(table.column_names, table.columns)
+        if _can_map(column)
+    }
+    converted = table.drop_columns(list(mapped)).to_pandas(types_mapper=types.get)
+    # copy=False keeps one block per mapped column instead of consolidating
+    columns = {name: mapped[name] if name in mapped else converted[name] for name in table.column_names}
+    return pd.DataFrame(columns, copy=False)
+
+
+def _can_map(column):
+    """True if an Arrow column converts to numpy without a copy."""
+    import pyarrow as pa
+
+    kind = column.type
+    fixed_width = pa.types.is_integer(kind) or pa.types.is_floating(kind) or (
+        pa.types.is_timestamp(kind) and kind.unit == 'ns' and kind.tz is None
+    )
+    return fixed_width and column.num_chunks == 1 and column.null_count == 0
+
+
 def get_column_options(df, column):
     """Get unique values from a column for filter dropdowns."""
     return sorted(df[column].dropna().unique().tolist())
@@ -0,0 +1,293 @@
+"""
+Dataset Module
+==============
+Everything the dashboard derives from one loaded claims frame.
+
+Indexes and aggregates are built once per dataset, when it is loaded, and
+shared by every rerun and session instead of being recomputed per request.
+
+A dataset ingested in chunked mode (see ingest.py) has only its cube: no
+claim rows are kept, and every view is answered from the cube.
+
+Either kind can also have its claims registered in an embedded SQL engine
+(see sql_backend.py), which then answers the views the cube cannot,
+instead of aggregating claim rows in pandas.
+"""
+
+import itertools
+import threading
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from charts import chart_data_from_rows
+from claim_ids import ClaimIds
+from cube import ClaimsCube, build_cube
+from filters import FilterIndex
+from frame_buffer import FrameBuffer
+from heavy_hitters import build_heavy_hitters
+from ingest import DEFAULT_CHUNK_ROWS, ingest_csv
+from instrumentation import span
+from providers import ProviderTable, TaxIdIndex
+from schema import CLAIM_ID_COLUMN
+from sketches import DEFAULT_BINS, percentile_table, rows_distribution, sketch_rows
+from sql_backend import SQLBackend
+from text_index import TextIndex
+from timeseries import TimeSeriesIndex
+from kpis import KPIResult, compute_kpis
+
+
+# Numbers each Dataset built in this process, see Dataset.identity
+_load_ids = itertools.count()
+
+
+@dataclass
+class Dataset:
+    """A claims frame together with its prebuilt indexes and aggregates."""
+
+    frame: pd.DataFrame
+    filter_index: FilterIndex
+    cube: ClaimsCube
+    # Bumped on every append; cached views are keyed on it (see identity)
+    version: int = 0
+    providers: ProviderTable = None
+    tax_ids: TaxIdIndex = None
+    text_index: TextIndex = None
+    timeseries: TimeSeriesIndex = None
+    # Embedded SQL engine holding the claims; None for the pandas backend
+    sql: SQLBackend = None
+    # Top-key trackers per high-cardinality column, see heavy_hitters.py
+    heavy_hitters: dict = None
+    # Hashes of the loaded claim numbers, for deduplicating appends
+    claim_ids: ClaimIds = field(default_factory=ClaimIds, repr=False)
+    # Storage the frame is appended into, created by the first append
+    frame_buffer: FrameBuffer = field(default=None, repr=False)
+    # Unique per load: a dataset loaded again starts over at version 0
+    load_id: int = field(default_factory=lambda: next(_load_ids), compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def snapshot(self):
+        """
+        Consistent copy of the current contents.
+
+        Appends swap in new frames and indexes while other threads may be
+        reading, so readers should work from a snapshot.
+        """
+        with self._lock:
+            return replace(self)
+
+    def update(self, **changes):
+        """Atomically replace some contents and bump the version."""
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self.version += 1
+
+    @property
+    def identity(self):
+        """
+        (load, version) of these contents, for keying cached results.
+
+        The version alone is reused when an evicted dataset is loaded again,
+        possibly from a changed CSV, so it is not enough on its own.
+        """
+        return (self.load_id, self.version)
+
+    @property
+    def in_memory(self):
+        """True if claim rows are loaded (False for chunked ingestion)."""
+        return self.frame is not None
+
+    @property
+    def total_claims(self):
+        """Number of claims in the dataset."""
+        if self.in_memory:
+            return len(self.frame)
+        return self.cube.kpis().total_claims
+
+
+def build_dataset(df, text_index=None, sql=False):
+    """
+    Build the indexes and aggregates for a claims frame.
+
+    Pass a text_index already loaded for the frame (see
+    text_index.load_text_index) to skip building it. With sql=True the
+    claims are also registered in the embedded SQL engine.
+    """
+    claim_ids = ClaimIds.from_ids(df[CLAIM_ID_COLUMN]) if CLAIM_ID_COLUMN in df else ClaimIds()
+    providers = ProviderTable(df)
+    return Dataset(
+        frame=df,
+        filter_index=FilterIndex(df),
+        cube=build_cube(df),
+        providers=providers,
+        tax_ids=TaxIdIndex(providers),
+        text_index=text_index if text_index is not None else TextIndex.build(df),
+        timeseries=TimeSeriesIndex(df),
+        sql=SQLBackend.from_frame(df) if sql else None,
+        heavy_hitters=build_heavy_hitters(df, providers),
+        claim_ids=claim_ids,
+    )
+
+
+def build_streamed_dataset(data_path, chunk_rows=DEFAULT_CHUNK_ROWS, partition_dir=None, sql=False):
+    """
+    Build a cube-only dataset by streaming a CSV in chunks.
+
+    With sql=True the Parquet partitions written to partition_dir are
+    registered in the embedded SQL engine, so selections finer than whole
+    months are still answered exactly, without loading the claim rows.
+    """
+    if sql and partition_dir is None:
+        raise ValueError("The SQL backend needs a partition_dir in chunked mode")
+    result = ingest_csv(data_path, chunk_rows=chunk_rows, partition_dir=partition_dir)
+    backend = None
+    if sql:
+        backend = SQLBackend.from_partitions(result.partitions,
+                                             database=str(Path(partition_dir) / 'claims.sqlite'))
+    return Dataset(frame=None, filter_index=None, cube=result.cube, sql=backend,
+                   heavy_hitters=result.heavy_hitters, claim_ids=result.claim_ids)
+
+
+@dataclass
+class DashboardView:
+    """Everything the dashboard shows for one filter selection."""
+
+    spec: object
+    positions: np.ndarray  # None for cube-only datasets
+    kpis: KPIResult
+    chart_data: dict
+    # Provider spend aggregates; None for cube-only datasets
+    provider_data: dict = None
+    # 95% confidence half-widths of estimated KPIs; None when exact
+    intervals: dict = None
+    # Severity percentiles (see sketches.percentile_table); None when unavailable
+    percentiles: pd.DataFrame = None
+
+    @property
+    def approximate(self):
+        """True for views estimated from a sample (see approximate.py)."""
+        return self.intervals is not None
+
+
+def compute_view(dataset, spec):
+    """
+    Compute the dashboard view for a FilterSpec.
+
+    Matching row positions always come from the filter index. Whole-month
+    selections take their KPIs and chart aggregates from the cube; anything
+    finer is pushed down to the SQL backend when there is one, and otherwise
+    (or when narrowed by a keyword query) aggregated from the matching claim
+    rows. Cube-only datasets answer everything from the cube, at whole-month
+    resolution unless they have a SQL backend, and have no provider
+    aggregates or text search. Severity percentiles merge the cube's cell
+    sketches or bucket the matching rows; views pushed down to SQL on
+    cube-only datasets have none.
+    """
+    dataset = dataset.snapshot()
+    args = spec.as_args()
+    if not dataset.in_memory and dataset.sql is not None and not dataset.cube.can_answer(spec.date_range):
+        return DashboardView(spec=spec, positions=None, **_aggregate_sql(dataset.sql, spec, dataset.version))
+    if not dataset.in_memory:
+        with span('cube_slice') as stage:
+            cells = dataset.cube.slice(*args)
+            stage['rows'] = len(dataset.cube.cells)
+        return DashboardView(spec=spec, positions=None, **_aggregate(dataset.cube, cells, None))
+
+    positions = select_positions(dataset, spec)
+
+    if dataset.cube.can_answer(spec.date_range) and not spec.text:
+        with span('cube_slice') as stage:
+            cells = dataset.cube.slice(*args)
+            stage['rows'] = len(dataset.cube.cells)
+        results = _aggregate(dataset.cube, cells, None)
+    elif dataset.sql is not None and not spec.text:
+        results = _aggregate_sql(dataset.sql, spec, dataset.version)
+        with span('percentiles') as stage:
+            columns = [dataset.frame.columns.get_loc(column)
+                       for column in ['total_claimed_losses', 'total_insurance_payment']]
+            results['percentiles'] = percentile_table(sketch_rows(dataset.frame.iloc[positions, columns]))
+            stage['rows'] = len(positions)
+    else:
+        results = _aggregate(None, None, dataset.frame.take(positions))
+
+    if dataset.providers is not None:
+        with span('providers') as stage:
+            full = len(positions) == len(dataset.frame)
+            selected = None if full else positions
+            results['provider_data'] = {
+                'by_specialty': dataset.providers.spend_by_specialty(selected),
+                'top_providers': dataset.providers.top_providers(10, selected),
+            }
+            stage['rows'] = len(dataset.providers)
+
+    return DashboardView(spec=spec, positions=positions, **results)
+
+
+def select_positions(dataset, spec):
+    """Row positions (ascending) of the claims matching a FilterSpec, keyword query included."""
+    with span('filter') as stage:
+        positions = dataset.filter_index.select(*spec.as_args())
+        if len(dataset.frame) <= np.iinfo(np.int32).max:
+            positions = positions.astype(np.int32)
+        stage['rows'] = len(dataset.frame)
+
+    if spec.text and dataset.text_index is not None:
+        with span('text_search') as stage:
+            matches = dataset.text_index.search(spec.text)
+            positions = np.intersect1d(positions, matches, assume_unique=True).astype(positions.dtype)
+            stage['rows'] = len(matches)
+    return positions
+
+
+def compute_distribution(dataset, view, metric, by, bins=DEFAULT_BINS):
+    """
+    Histogram of a severity metric per value of `by` for a view.
+
+    Merged from the cube's cell sketches when the cube answers the view,
+    and otherwise bucketed from the matching claim rows (no sorting).
+    """
+    dataset = dataset.snapshot()
+    spec = view.spec
+    if view.positions is None or (dataset.cube.can_answer(spec.date_range) and not spec.text):
+        return dataset.cube.distribution(dataset.cube.slice(*spec.as_args()), metric, by)
+    frame = dataset.frame
+    columns = [frame.columns.get_loc(column)
+               for column in ['total_claimed_losses', 'total_insurance_payment', by]]
+    return rows_distribution(frame.iloc[view.positions, columns], metric, by, bins)
+
+
+def _aggregate(cube, cells, rows):
+    """KPIs, chart aggregates and percentiles from cube cells, or else from claim rows."""
+    with span('kpis') as stage:
+        if rows is None:
+            kpis = cube.kpis(cells)
+        else:
+            kpis = compute_kpis(rows)
+        stage['rows'] = len(cells if rows is None else rows)
+    with span('chart_data') as stage:
+        if rows is None:
+            chart_data = cube.chart_data(cells)
+        else:
+            chart_data = chart_data_from_rows(rows)
+        stage['rows'] = len(cells if rows is None else rows)
+    with span('percentiles') as stage:
+        if rows is None:
+            percentiles = cube.percentiles(cells)
+        else:
+            percentiles = percentile_table(sketch_rows(rows))
+        stage['rows'] = len(cells if rows is None else rows)
+    return {'kpis': kpis, 'chart_data': chart_data, 'percentiles': percentiles}
+
+
+def _aggregate_sql(sql, spec, version):
+    """KPIs and chart aggregates pushed down to the SQL backend, as of a dataset version."""
+    with span('kpis') as stage:
+        kpis = sql.kpis(spec, version)
+        stage['rows'] = kpis.total_claims
+    with span('chart_data') as stage:
+        chart_data = sql.chart_data(spec, version)
+        stage['rows'] = kpis.total_claims
+    return {'kpis': kpis, 'chart_data': chart_data}
@@ -0,0 +1,93 @@
+"""
+Downsampling Module
+===================
+Keep chart payloads bounded however large the data gets.
+
+Figures carry every point and category to the browser, so long daily series
+and long-tail categories (thousands of cities, dozens of insurers) make the
+figure JSON large and slow to render. Two reductions work on the small
+aggregate frames the charts are drawn from:
+
+    lttb()            Largest-Triangle-Three-Buckets: picks a fixed number of
+                      points that preserve the visual shape of a series
+    top_n_with_other  keeps the largest categories and sums the rest into a
+                      single "Other" row
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Default budgets used by the chart builders
+DEFAULT_MAX_POINTS = 500
+DEFAULT_MAX_CATEGORIES = 15
+
+OTHER_LABEL = 'Other'
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of at most `threshold` points that preserve a series' shape.
+
+    The first and last points are always kept. The points in between are
+    split into threshold - 2 buckets, and from each bucket the point forming
+    the largest triangle with the previously kept point and the average of
+    the next bucket is kept.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1], dtype=np.int64)[:max(threshold, 0)]
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        # Twice the triangle area for every candidate in the bucket
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample_series(data, y, max_points=DEFAULT_MAX_POINTS, x=None):
+    """
+    Rows of a series frame reduced to at most max_points with LTTB.
+
+    Points are chosen on column `y` (against column `x`, or the row order)
+    and every other column is kept for the chosen rows.
+    """
+    if max_points is None or len(data) <= max_points:
+        return data
+    x_values = np.arange(len(data)) if x is None else data[x].to_numpy()
+    values = np.nan_to_num(data[y].to_numpy(dtype='float64'))
+    return data.iloc[lttb(x_values, values, max_points)]
+
+
+def top_n_with_other(data, label, values, n=DEFAULT_MAX_CATEGORIES, by=None):
+    """
+    Keep the n - 1 largest rows of an aggregate and sum the rest as "Other".
+
+    `values` are the additive columns to sum, ranked by `by` (default: the
+    first of them). Frames with n rows or fewer are returned unchanged.
+    """
+    values = [values] if isinstance(values, str) else list(values)
+    if n is None or len(data) <= n:
+        return data
+    by = by or values[0]
+    ranked = data.sort_values(by, ascending=False, kind='stable')
+    head, tail = ranked.iloc[:n - 1], ranked.iloc[n - 1:]
+    head = head.astype({label: object}) if isinstance(head[label].dtype, pd.CategoricalDtype) else head
+    other = pd.DataFrame({label: [OTHER_LABEL], **{column: [tail[column].sum()] for column in values}})
+    return pd.concat([head[[label] + values], other], ignore_index=True)
@@ -0,0 +1,148 @@
+"""
+Export Module
+=============
+Stream the claims behind a dashboard view out as CSV or Parquet.
+
+The export reads the row positions the filter step already computed
+(DashboardView.positions) and serializes them a chunk at a time: each
+chunk is gathered from only the requested columns, encoded and handed
+on before the next one is built. Neither the filtered frame nor the
+whole output is ever held in memory, so peak memory depends on the chunk
+size and not on how many claims are exported.
+
+Both formats are encoded by Arrow's streaming writers. CSV output uses
+the source file's conventions ('Yes'/'No' flags, ISO dates), so an
+export can be appended back with incremental.append_csv. Parquet output
+keeps the typed columns and writes one row group per chunk.
+
+The dashboard's download button is the exception: Streamlit holds the
+whole file in memory to serve it, so the dashboard only offers downloads
+of up to DASHBOARD_EXPORT_MAX_ROWS claims. Larger selections are exported
+with reports/export_claims.py, which streams straight to a file.
+"""
+
+import io
+import os
+
+import numpy as np
+
+from schema import FLAG_COLUMNS, FLAG_FALSE, FLAG_TRUE, flag_mask
+
+
+EXPORT_FORMATS = ['csv', 'parquet']
+
+EXPORT_MIME_TYPES = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+# Claims serialized per chunk
+DEFAULT_EXPORT_ROWS = 50_000
+
+# Largest selection the dashboard offers as a download
+DEFAULT_DOWNLOAD_MAX_ROWS = 250_000
+
+
+def get_download_max_rows():
+    """Largest selection to offer as a download (DASHBOARD_EXPORT_MAX_ROWS), or None for no limit."""
+    value = int(os.environ.get('DASHBOARD_EXPORT_MAX_ROWS', DEFAULT_DOWNLOAD_MAX_ROWS))
+    return value if value > 0 else None
+
+
+def iter_export(frame, positions, fmt='csv', columns=None, chunk_rows=DEFAULT_EXPORT_ROWS):
+    """
+    Encoded export of the claims at `positions`, as a generator of bytes.
+
+    Concatenating the chunks gives the complete file. `columns` selects and
+    orders the exported columns (default: all of them).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {EXPORT_FORMATS}")
+    columns = list(frame.columns) if columns is None else list(columns)
+    missing = [column for column in columns if column not in frame]
+    if missing:
+        raise KeyError(f"Cannot export unknown columns: {missing}")
+    positions = np.arange(len(frame)) if positions is None else np.asarray(positions)
+
+    chunks = _iter_chunks(frame, positions, columns, chunk_rows)
+    return _iter_encoded(frame, columns, chunks, fmt)
+
+
+def write_export(path, frame, positions, fmt='csv', columns=None, chunk_rows=DEFAULT_EXPORT_ROWS):
+    """Stream an export to a file. Returns the number of bytes written."""
+    written = 0
+    with open(path, 'wb') as f:
+        for block in iter_export(frame, positions, fmt, columns, chunk_rows):
+            f.write(block)
+            written += len(block)
+    return written
+
+
+def _iter_chunks(frame, positions, columns, chunk_rows):
+    """Frames of at most chunk_rows selected claims, projected to `columns`."""
+    indices = [frame.columns.get_loc(column) for column in columns]
+    for start in range(0, max(len(positions), 1), chunk_rows):
+        # iloc with both axes gathers only these rows of these columns
+        yield frame.iloc[positions[start:start + chunk_rows], indices]
+
+
+def _export_schema(frame, columns, fmt):
+    """Arrow schema of the output: as typed, or as the source CSV writes it."""
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(frame.iloc[:0][columns], preserve_index=False)
+    if fmt == 'csv':
+        for index, field in enumerate(schema):
+            if field.name in FLAG_COLUMNS:
+                schema = schema.set(index, pa.field(field.name, pa.string()))
+            elif pa.types.is_timestamp(field.type):
+                schema = schema.set(index, pa.field(field.name, pa.date32()))
+    return schema
+
+
+def _csv_chunk(chunk):
+    """Flags as 'Yes'/'No', as in the source CSV; missing flags stay empty."""
+    flags = {
+        column: np.where(flag_mask(chunk[column]), FLAG_TRUE,
+                         np.where(flag_mask(chunk[column], FLAG_FALSE), FLAG_FALSE, None))
+        for column in FLAG_COLUMNS if column in chunk and chunk[column].dtype in (bool, 'boolean')
+    }
+    return chunk.assign(**flags) if flags else chunk
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose contents are collected and cleared on drain()."""
+
+    def __init__(self):
+        self._blocks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._blocks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._blocks)
+        self._blocks.clear()
+        return data
+
+
+def _iter_encoded(frame, columns, chunks, fmt):
+    """Write each chunk with Arrow's streaming writer and yield what it produced."""
+    import pyarrow as pa
+    import pyarrow.csv as csv
+    import pyarrow.parquet as pq
+
+    schema = _export_schema(frame, columns, fmt)
+    sink = _Drain()
+    if fmt == 'csv':
+        writer = csv.CSVWriter(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema)
+    with writer:
+        for chunk in chunks:
+            if fmt == 'csv':
+                chunk = _csv_chunk(chunk)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    # Parquet writes its footer on close
+    yield sink.drain()
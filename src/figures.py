@@ -0,0 +1,114 @@
+"""
+Figures Module
+==============
+Dashboard figures built in a worker pool and cached for every session.
+
+One aggregation pass per view computes every chart's aggregate frame (see
+DashboardView.chart_data); what is left per chart is building the Plotly
+figure and serializing it, some 20-100 ms each. Without a cache all of
+that was redone on every rerun, including reruns caused by widgets that
+change no chart (a page of the claim explorer, an export option).
+
+build_figures_cached() looks each chart up in the result cache under
+(chart id, filter fingerprint, theme) and only builds the missing ones,
+in a shared thread pool when there are several. Finished figures are
+cached as built go.Figure objects and handed to st.plotly_chart as they
+are: given JSON or a plain dict, Streamlit re-validates the whole figure
+(about as slow as building it), whereas a Figure is only copied. Cached
+figures are shared by every session, so they must not be modified.
+
+Plotly figure construction is mostly Python, so the pool overlaps rather
+than parallelizes the builds; the cache is what keeps reruns cheap.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from charts import CHART_COLORS, CHART_DATA_KEYS, CHART_FIGURES, get_chart_layout, provider_spend_figure
+from instrumentation import attach_run, current_run, span
+
+
+DEFAULT_FIGURE_WORKERS = 2
+
+# Plotly imports its JSON engine on first use, and that import fails when
+# two threads race it; load it up front instead
+try:
+    import orjson  # noqa: F401
+except ImportError:
+    pass
+
+# Process-wide pool, see get_figure_pool()
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_figure_workers():
+    """Threads building figures, from the DASHBOARD_FIGURE_WORKERS variable."""
+    return max(1, int(os.environ.get('DASHBOARD_FIGURE_WORKERS', DEFAULT_FIGURE_WORKERS)))
+
+
+def get_figure_pool():
+    """The process-wide figure pool, created on first use."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ThreadPoolExecutor(max_workers=get_figure_workers(),
+                                              thread_name_prefix='figures')
+        return _shared_pool
+
+
+def chart_theme():
+    """Fingerprint of the chart styling, so restyled charts are not served from the cache."""
+    return hash(repr((sorted(get_chart_layout().items()), CHART_COLORS)))
+
+
+def filter_fingerprint(name, dataset, view):
+    """What a view's chart data depends on: dataset contents and filter selection."""
+    return (name, dataset.identity, view.spec, view.approximate)
+
+
+class CachedFigure:
+    """A built figure as held by the result cache, with its approximate size."""
+
+    def __init__(self, figure):
+        self.figure = figure
+        # A figure is nested dicts and lists; its JSON length is a fair proxy
+        self.nbytes = len(figure.to_json())
+
+
+def dashboard_figure_jobs(view):
+    """{chart id: (builder, data)} of the figures every dashboard view shows."""
+    jobs = {key: (CHART_FIGURES[key], view.chart_data[key]) for key in CHART_DATA_KEYS}
+    if view.provider_data is not None:
+        jobs['by_specialty'] = (provider_spend_figure, view.provider_data['by_specialty'])
+    return jobs
+
+
+def build_figures_cached(jobs, cache, fingerprint, theme=None):
+    """
+    Each figure in `jobs` ({chart id: (builder, data)}), by chart id.
+
+    Figures already in `cache` for the fingerprint and theme are reused;
+    the others are built (concurrently when there are several) and stored.
+    Each build is timed as a 'figure_<chart id>' stage of the caller's rerun.
+    """
+    theme = chart_theme() if theme is None else theme
+    keys = {chart: ('figure', chart, fingerprint, theme) for chart in jobs}
+    missing = object()
+    figures = {chart: cache.get(key, missing) for chart, key in keys.items()}
+    charts = [chart for chart, figure in figures.items() if figure is missing]
+
+    run = current_run()
+
+    def build(chart):
+        builder, data = jobs[chart]
+        with attach_run(run), span(f"figure_{chart}") as stage:
+            stage['rows'] = len(data)
+            return CachedFigure(builder(data))
+
+    built = get_figure_pool().map(build, charts) if len(charts) > 1 else map(build, charts)
+    for chart, figure in zip(charts, built):
+        cache.put(keys[chart], figure)
+        figures[chart] = figure
+    return {chart: figure.figure for chart, figure in figures.items()}
@@ -2,24 +2,35 @@
 Filters Module
 ==============
 Functions to create sidebar filters for the dashboard.
+
+Filtering a large frame column by column on every rerun is slow, so a
+FilterIndex is built once per dataset: packed bitmaps per insurer, state,
+incident type and injury flag, plus a date-sorted row order that is range
+queried with binary search. A filter request then becomes a handful of
+bitmap ANDs that yield row positions instead of a chain of frame copies.
 """
 
+import copy
+from dataclasses import dataclass
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
+from schema import FLAG_FALSE, FLAG_TRUE, flag_mask
+from text_index import OR_OPERATOR, normalize_query
+
 
-def create_date_filter(df):
-    """Create a date range filter in the sidebar."""
+def create_date_filter(df, bounds=None):
+    """
+    Create a date range filter in the sidebar.
+
+    Pass bounds=(min_date, max_date) when they are already known, e.g. from
+    the cube, to skip scanning the date column.
+    """
     st.sidebar.subheader("📅 Date Range")
     
-    min_date = df['dateOfloss'].min()
-    max_date = df['dateOfloss'].max()
-    
-    # Handle NaT values
-    if pd.isna(min_date):
-        min_date = pd.Timestamp('2020-01-01')
-    if pd.isna(max_date):
-        max_date = pd.Timestamp('2025-12-31')
+    min_date, max_date = date_bounds(df, bounds)
     
     date_range = st.sidebar.date_input(
         "Select date range",
@@ -32,6 +43,20 @@ def create_date_filter(df):
     return date_range
 
 
+def date_bounds(df, bounds=None):
+    """First and last selectable dates, with defaults when there are none."""
+    if bounds is None:
+        bounds = (df['dateOfloss'].min(), df['dateOfloss'].max())
+    min_date, max_date = bounds
+    
+    # Handle NaT values
+    if pd.isna(min_date):
+        min_date = pd.Timestamp('2020-01-01')
+    if pd.isna(max_date):
+        max_date = pd.Timestamp('2025-12-31')
+    return min_date, max_date
+
+
 def create_insurer_filter(df):
     """Create a multi-select filter for insurers."""
     st.sidebar.subheader("🏢 Insurer")
@@ -93,32 +118,310 @@ def create_injury_filter(df):
     return selected
 
 
-def apply_filters(df, date_range, insurers, states, incidents, injury):
-    """Apply all filters to the dataframe."""
-    filtered_df = df.copy()
+def create_text_search_filter():
+    """Create a keyword search box over the claim descriptions."""
+    st.sidebar.subheader("🔍 Description Search")
+    
+    query = st.sidebar.text_input(
+        "Keywords",
+        placeholder="e.g. airbag deer",
+        help=f"Claims must contain every word; separate alternatives with {OR_OPERATOR}.",
+        key="text_search_filter"
+    )
     
+    return query
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+    Normalized, hashable sidebar selection.
+
+    Two selections that filter the same rows (e.g. the same insurers picked
+    in a different order) produce equal specs, so a spec can key caches.
+    """
+
+    date_range: tuple = ()
+    insurers: tuple = ()
+    states: tuple = ()
+    incidents: tuple = ()
+    injury: str = "All"
+    # Normalized keyword query over the description columns ("" for none)
+    text: str = ""
+
+    @classmethod
+    def from_selection(cls, date_range, insurers, states, incidents, injury, text=""):
+        """Build a spec from raw widget values (as passed to apply_filters)."""
+        return cls(
+            date_range=tuple(date_range) if len(date_range) == 2 else (),
+            insurers=tuple(sorted(insurers)),
+            states=tuple(sorted(states)),
+            incidents=tuple(sorted(incidents)),
+            injury=injury,
+            text=normalize_query(text),
+        )
+
+    def as_args(self):
+        """Arguments for apply_filters / FilterIndex.select (text is not included)."""
+        return (self.date_range, list(self.insurers), list(self.states),
+                list(self.incidents), self.injury)
+
+
+def default_spec(df, bounds=None):
+    """The FilterSpec the sidebar produces before anything is changed."""
+    min_date, max_date = date_bounds(df, bounds)
+    return FilterSpec.from_selection(
+        (min_date.date(), max_date.date()),
+        df['insurer_name'].unique().tolist(),
+        df['insuredstate'].unique().tolist(),
+        df['natureOfincident'].unique().tolist(),
+        "All",
+    )
+
+
+# Sidebar selections mapped to the columns they filter
+INDEXED_COLUMNS = {
+    'insurers': 'insurer_name',
+    'states': 'insuredstate',
+    'incidents': 'natureOfincident',
+}
+
+# Below this share of rows, a date range is checked position by position
+# instead of being expanded into a full bitmap
+_SPARSE_DATE_SHARE = 1 / 32
+
+
+class FilterIndex:
+    """
+    Bitmap and sorted-date index over one dataset.
+
+    Build it once per dataset (it only reads the filter columns) and call
+    select() with the sidebar selections to get matching row positions.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.bitmaps = {}
+        # Rows with no value; like apply_filters, no selection of values matches them
+        self.missing_bitmaps = {}
+        for column in INDEXED_COLUMNS.values():
+            self.bitmaps[column] = self._value_bitmaps(df[column])
+            self.missing_bitmaps[column] = np.packbits(df[column].isna().to_numpy())
+
+        # One bitmap per flag label; rows with a missing flag are in neither
+        self.injury_bitmaps = {
+            label: np.packbits(flag_mask(df['injuryinvolved'], label))
+            for label in (FLAG_TRUE, FLAG_FALSE)
+        }
+
+        # Rows with a date, ordered by date; NaT rows never match a range
+        dates = df['dateOfloss'].to_numpy(dtype='datetime64[ns]')
+        has_date = ~np.isnat(dates)
+        self.date_bitmap = np.packbits(has_date)
+        dated_rows = np.flatnonzero(has_date)
+        order = np.argsort(dates[dated_rows], kind='stable')
+        self.date_order = dated_rows[order]
+        self.sorted_dates = dates[self.date_order]
+
+    def _value_bitmaps(self, series):
+        """One packed bitmap per distinct value of a column."""
+        codes, uniques = pd.factorize(series)
+        return {
+            value: np.packbits(codes == code)
+            for code, value in enumerate(uniques.tolist())
+        }
+
+    def options(self, column):
+        """Sorted distinct values of an indexed column."""
+        return sorted(self.bitmaps[column])
+
+    def select(self, date_range, insurers, states, incidents, injury):
+        """
+        Row positions (ascending) matching the sidebar selections.
+
+        Takes the same arguments as apply_filters and follows the same rules:
+        an empty multiselect means no filter on that column.
+        """
+        bitmaps = []
+        selections = {'insurers': insurers, 'states': states, 'incidents': incidents}
+        for key, column in INDEXED_COLUMNS.items():
+            bitmap = self._selection_bitmap(column, selections[key])
+            if bitmap is not None:
+                bitmaps.append(bitmap)
+
+        if injury != "All":
+            bitmaps.append(self.injury_bitmaps[injury])
+
+        date_rows = None
+        if len(date_range) == 2:
+            date_rows = self._date_rows(*date_range)
+            if date_rows is None:
+                bitmaps.append(self.date_bitmap)
+            elif len(date_rows) > self.n_rows * _SPARSE_DATE_SHARE:
+                bitmaps.append(self._rows_to_bitmap(date_rows))
+                date_rows = None
+
+        if date_rows is not None:
+            # Narrow date range: probe the other bitmaps at those rows only
+            keep = np.ones(len(date_rows), dtype=bool)
+            for bitmap in bitmaps:
+                keep &= _bits_at(bitmap, date_rows)
+            return np.sort(date_rows[keep])
+
+        if not bitmaps:
+            return np.arange(self.n_rows)
+
+        combined = bitmaps[0].copy()
+        for bitmap in bitmaps[1:]:
+            combined &= bitmap
+        return np.flatnonzero(np.unpackbits(combined, count=self.n_rows))
+
+    def _selection_bitmap(self, column, selected):
+        """OR of the bitmaps for the selected values, or None for no filter."""
+        if not selected:
+            return None
+        value_bitmaps = self.bitmaps[column]
+        # Missing values only match a selection holding a missing value (as with isin)
+        with_missing = any(pd.isna(value) for value in selected)
+        selected = {value for value in selected if not pd.isna(value)}
+        missing = self.missing_bitmaps[column]
+        if not missing.any():
+            with_missing = True
+        if selected.issuperset(value_bitmaps):
+            return None if with_missing else ~missing
+
+        # Whichever side of the selection is smaller gets OR-ed together
+        unselected = [v for v in value_bitmaps if v not in selected]
+        chosen = [value_bitmaps[v] for v in selected if v in value_bitmaps]
+        if len(unselected) < len(chosen):
+            bitmap = missing.copy() if not with_missing else np.zeros_like(self.date_bitmap)
+            for value in unselected:
+                bitmap |= value_bitmaps[value]
+            return ~bitmap
+
+        bitmap = missing.copy() if with_missing else np.zeros_like(self.date_bitmap)
+        for value_bitmap in chosen:
+            bitmap |= value_bitmap
+        return bitmap
+
+    def _date_rows(self, start_date, end_date):
+        """
+        Row positions dated within [start_date, end_date] (whole days).
+
+        Returns None when the range covers every dated row.
+        """
+        start, stop = _date_bounds(start_date, end_date)
+        lo = np.searchsorted(self.sorted_dates, start, side='left')
+        hi = np.searchsorted(self.sorted_dates, stop, side='left')
+        if lo == 0 and hi == len(self.sorted_dates):
+            return None
+        return self.date_order[lo:hi]
+
+    def extend(self, delta):
+        """
+        New index covering this index's rows followed by the rows of `delta`.
+
+        Only the delta's rows are factorized and sorted, so appending new
+        claims does not rebuild the index from scratch; the packed bitmaps
+        and the date order are still copied.
+        This index is left unchanged.
+        """
+        extended = copy.copy(self)
+        n_old, n_new = self.n_rows, len(delta)
+        extended.n_rows = n_old + n_new
+
+        extended.bitmaps = {}
+        extended.missing_bitmaps = {}
+        for column in INDEXED_COLUMNS.values():
+            old_bitmaps = self.bitmaps[column]
+            codes, uniques = pd.factorize(delta[column])
+            extended.missing_bitmaps[column] = _append_bits(self.missing_bitmaps[column], n_old, codes < 0)
+            values = list(old_bitmaps) + [v for v in uniques.tolist() if v not in old_bitmaps]
+            code_of = {value: code for code, value in enumerate(uniques.tolist())}
+            extended.bitmaps[column] = {
+                value: _append_bits(
+                    old_bitmaps.get(value), n_old,
+                    codes == code_of[value] if value in code_of else np.zeros(n_new, dtype=bool)
+                )
+                for value in values
+            }
+
+        extended.injury_bitmaps = {
+            label: _append_bits(bitmap, n_old, flag_mask(delta['injuryinvolved'], label))
+            for label, bitmap in self.injury_bitmaps.items()
+        }
+
+        dates = delta['dateOfloss'].to_numpy(dtype='datetime64[ns]')
+        has_date = ~np.isnat(dates)
+        extended.date_bitmap = _append_bits(self.date_bitmap, n_old, has_date)
+        new_rows = np.flatnonzero(has_date)
+        order = np.argsort(dates[new_rows], kind='stable')
+        new_dates = dates[new_rows][order]
+        # Merge the delta into the sorted order; ties keep old rows first
+        slots = np.searchsorted(self.sorted_dates, new_dates, side='right')
+        extended.sorted_dates = np.insert(self.sorted_dates, slots, new_dates)
+        extended.date_order = np.insert(self.date_order, slots, new_rows[order] + n_old)
+        return extended
+
+    def _rows_to_bitmap(self, rows):
+        """Packed bitmap with the given row positions set."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+
+def _date_bounds(start_date, end_date):
+    """Half-open datetime64 bounds covering whole days start..end."""
+    start = np.datetime64(start_date, 'D').astype('datetime64[ns]')
+    stop = (np.datetime64(end_date, 'D') + np.timedelta64(1, 'D')).astype('datetime64[ns]')
+    return start, stop
+
+
+def _append_bits(packed, n_bits, new_bits):
+    """
+    Packed bitmap of `n_bits` existing bits followed by `new_bits`.
+
+    `packed` may be None for a value not seen before (all existing bits 0).
+    """
+    if packed is None:
+        packed = np.zeros((n_bits + 7) // 8, dtype=np.uint8)
+    full_bytes = n_bits // 8
+    # Re-pack the partially filled last byte together with the new bits
+    tail = np.unpackbits(packed[full_bytes:], count=n_bits - full_bytes * 8).astype(bool)
+    return np.concatenate([packed[:full_bytes], np.packbits(np.concatenate([tail, new_bits]))])
+
+
+def _bits_at(bitmap, rows):
+    """Values of a packed bitmap at the given row positions."""
+    return ((bitmap[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+def apply_filters(df, date_range, insurers, states, incidents, injury, index=None):
+    """
+    Apply all filters to the dataframe.
+
+    With a FilterIndex built for `df`, matching rows are found from its
+    bitmaps; otherwise the columns are scanned once into a single mask.
+    """
+    if index is not None:
+        return df.take(index.select(date_range, insurers, states, incidents, injury))
+
+    mask = np.ones(len(df), dtype=bool)
+
     # Apply date filter
     if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = filtered_df[
-            (filtered_df['dateOfloss'].dt.date >= start_date) &
-            (filtered_df['dateOfloss'].dt.date <= end_date)
-        ]
-    
-    # Apply insurer filter
-    if insurers:
-        filtered_df = filtered_df[filtered_df['insurer_name'].isin(insurers)]
-    
-    # Apply state filter
-    if states:
-        filtered_df = filtered_df[filtered_df['insuredstate'].isin(states)]
-    
-    # Apply incident filter
-    if incidents:
-        filtered_df = filtered_df[filtered_df['natureOfincident'].isin(incidents)]
-    
+        start, stop = _date_bounds(*date_range)
+        dates = df['dateOfloss'].to_numpy(dtype='datetime64[ns]')
+        mask &= (dates >= start) & (dates < stop)
+
+    # Apply insurer, state and incident filters
+    selections = {'insurers': insurers, 'states': states, 'incidents': incidents}
+    for key, column in INDEXED_COLUMNS.items():
+        if selections[key]:
+            mask &= df[column].isin(selections[key]).to_numpy()
+
     # Apply injury filter
     if injury != "All":
-        filtered_df = filtered_df[filtered_df['injuryinvolved'] == injury]
-    
-    return filtered_df
+        mask &= flag_mask(df['injuryinvolved'], injury)
+
+    return df[mask]
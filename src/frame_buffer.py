@@ -0,0 +1,213 @@
+"""
+Frame Buffer Module
+===================
+A claims frame that appended claims are written onto, not re-concatenated with.
+
+Concatenating the loaded frame with each delta copies every loaded claim
+on every append. A FrameBuffer instead keeps each column in storage with
+spare room at the end (GROWTH_FACTOR), writes the delta's rows into it and
+hands out a new DataFrame over the first n rows, without copying them:
+
+    numeric and date columns          numpy arrays with spare capacity
+    nullable columns (flags)          their values and missing mask, each
+                                      in such an array
+    categorical columns               their codes, in such an array, plus
+                                      categories that only ever grow
+    Arrow-backed text                 a list of Arrow chunks; the delta is
+                                      added as a chunk, and chunks of similar
+                                      size are merged pairwise
+
+Only rows past the ones already handed out are ever written, so frames
+held by readers of earlier snapshots never change. When the storage is
+full it is reallocated with room to spare, so the copying is amortized
+over many appends. Columns of any other kind are concatenated as before.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import concat_claims
+
+
+# Storage is grown to this multiple of the rows needed when it runs out
+GROWTH_FACTOR = 1.25
+
+
+class FrameBuffer:
+    """Column storage behind a claims frame, appended to in place."""
+
+    def __init__(self, frame):
+        self.columns = list(frame.columns)
+        self.n_rows = len(frame)
+        self._storage = {column: _column_storage(frame[column]) for column in self.columns}
+
+    @property
+    def frame(self):
+        """DataFrame over the first n_rows rows (no copy)."""
+        return pd.DataFrame({column: self._storage[column].values(self.n_rows) for column in self.columns},
+                            copy=False)
+
+    def append(self, delta):
+        """
+        Write the rows of a typed delta after the current ones and return the new frame.
+
+        A delta with other columns is concatenated the old way, and the
+        buffer restarted from the result.
+        """
+        if list(delta.columns) != self.columns:
+            combined = concat_claims([self.frame, delta])
+            self.__init__(combined)
+            return combined
+        n_rows = self.n_rows + len(delta)
+        for column in self.columns:
+            storage = self._storage[column].append(self.n_rows, delta[column])
+            if storage is None:
+                # Kinds without spare-capacity storage are concatenated
+                storage = _SeriesStorage(concat_claims([self.frame[[column]], delta[[column]]])[column])
+            self._storage[column] = storage
+        self.n_rows = n_rows
+        return self.frame
+
+
+def _column_storage(series):
+    """Storage for one column, by kind."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and not series.dtype.ordered:
+        return _CategoricalStorage(series)
+    if _is_arrow_string(series):
+        return _ArrowStorage(series)
+    if isinstance(series.array, _MASKED_ARRAYS):
+        return _MaskedStorage(series.array)
+    if isinstance(series.array, (pd.arrays.NumpyExtensionArray, pd.arrays.DatetimeArray)) \
+            and not isinstance(series.dtype, pd.DatetimeTZDtype):
+        return _ArrayStorage(series.to_numpy())
+    return _SeriesStorage(series)
+
+
+_MASKED_ARRAYS = (pd.arrays.BooleanArray, pd.arrays.IntegerArray, pd.arrays.FloatingArray)
+
+
+def _is_arrow_string(series):
+    return isinstance(series.array, pd.arrays.ArrowStringArray)
+
+
+def _grown(array, n_rows, n_needed):
+    """`array` if it holds n_needed rows, else a larger copy of its first n_rows."""
+    if len(array) >= n_needed:
+        return array
+    grown = np.empty(int(n_needed * GROWTH_FACTOR) + 1, dtype=array.dtype)
+    grown[:n_rows] = array[:n_rows]
+    return grown
+
+
+class _ArrayStorage:
+    """A numpy column with spare rows at the end."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def values(self, n_rows):
+        return self.array[:n_rows]
+
+    def append(self, n_rows, values):
+        try:
+            values = values.to_numpy(dtype=self.array.dtype)
+        except (TypeError, ValueError):
+            return None
+        if values.dtype != self.array.dtype:
+            return None
+        self.array = _grown(self.array, n_rows, n_rows + len(values))
+        self.array[n_rows:n_rows + len(values)] = values
+        return self
+
+
+class _CategoricalStorage:
+    """Codes of a categorical column with spare rows; categories are only ever added to."""
+
+    def __init__(self, series):
+        self.categories = series.cat.categories
+        self.codes = _ArrayStorage(series.cat.codes.to_numpy())
+
+    def values(self, n_rows):
+        return pd.Categorical.from_codes(self.codes.values(n_rows), dtype=pd.CategoricalDtype(self.categories),
+                                         validate=False)
+
+    def append(self, n_rows, values):
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        new = values.cat.categories.difference(self.categories, sort=False)
+        categories = self.categories.append(new) if len(new) else self.categories
+        # Existing codes stay valid: new categories only go at the end. The
+        # trailing -1 maps missing values (code -1) to missing.
+        mapping = np.append(categories.get_indexer(values.cat.categories), -1)
+        codes = mapping[values.cat.codes.to_numpy()]
+        dtype = pd.CategoricalDtype(categories)
+        code_dtype = pd.Categorical([], dtype=dtype).codes.dtype
+        array = self.codes.array
+        if array.dtype != code_dtype:
+            # More categories than the code type can hold: widen (rare, copies)
+            array = array.astype(code_dtype)
+        self.codes = _ArrayStorage(array)
+        self.codes.append(n_rows, pd.Series(codes.astype(code_dtype)))
+        self.categories = categories
+        return self
+
+
+class _MaskedStorage:
+    """A nullable column as its values and missing mask, both with spare rows."""
+
+    def __init__(self, array):
+        self.kind = type(array)
+        self.dtype = array.dtype
+        self.data = _ArrayStorage(array.to_numpy(dtype=array.dtype.numpy_dtype, na_value=0))
+        self.mask = _ArrayStorage(np.asarray(pd.isna(array)))
+
+    def values(self, n_rows):
+        return self.kind(self.data.values(n_rows), self.mask.values(n_rows))
+
+    def append(self, n_rows, values):
+        if values.dtype != self.dtype:
+            return None
+        array = values.array
+        self.data.append(n_rows, pd.Series(array.to_numpy(dtype=self.dtype.numpy_dtype, na_value=0)))
+        self.mask.append(n_rows, pd.Series(np.asarray(pd.isna(array))))
+        return self
+
+
+class _ArrowStorage:
+    """Arrow-backed text column as a list of chunks, largest first."""
+
+    def __init__(self, series):
+        array = series.array._pa_array
+        self.type = array.type
+        self.chunks = [array.combine_chunks()] if array.num_chunks else []
+
+    def values(self, n_rows):
+        import pyarrow as pa
+        chunks = pa.chunked_array(self.chunks, type=self.type).slice(0, n_rows)
+        return pd.arrays.ArrowStringArray(chunks)
+
+    def append(self, n_rows, values):
+        import pyarrow as pa
+        if not _is_arrow_string(values):
+            values = values.astype(pd.StringDtype('pyarrow'))
+        chunk = values.array._pa_array.combine_chunks().cast(self.type)
+        # Rows past n_rows were never handed out (an append that failed part way)
+        chunks = list(pa.chunked_array(self.chunks, type=self.type).slice(0, n_rows).chunks)
+        while chunks and len(chunks[-1]) <= len(chunk):
+            chunk = pa.concat_arrays([chunks.pop(), chunk])
+        chunks.append(chunk)
+        self.chunks = chunks
+        return self
+
+
+class _SeriesStorage:
+    """Any other column, kept as a Series and concatenated on append."""
+
+    def __init__(self, series):
+        self.series = series.reset_index(drop=True)
+
+    def values(self, n_rows):
+        return self.series.iloc[:n_rows].array
+
+    def append(self, n_rows, values):
+        return None
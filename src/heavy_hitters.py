@@ -0,0 +1,268 @@
+"""
+Heavy Hitters Module
+====================
+Top cities, postal codes, insureds and providers in bounded memory.
+
+Grouping a high-cardinality column (thousands of cities, millions of
+insured names) builds a table with one row per distinct value. Here each
+column instead gets a HeavyHitters tracker: two count-min sketches (claim
+count and payment) of fixed size, plus a min-heap of the k keys with the
+largest estimates seen so far. Batches of claims update both in one pass,
+so the trackers are built while loading (or ingesting chunks) and updated
+when claims are appended, without ever materializing the distinct values.
+
+Count-min estimates never undercount and overcount by at most
+e / SKETCH_WIDTH of the column's total, with high probability. The top
+keys over every claim are read straight from the trackers, as estimates.
+A filtered selection (which needs the claim rows in memory) is streamed in
+batches through a fresh tracker, and only that tracker's candidates are
+then counted exactly (see top_keys), so memory stays fixed however many
+distinct keys the selection holds.
+
+The provider tracker counts provider lines (one per claim and specialty)
+keyed by tax id.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from filters import FilterSpec
+
+
+HEAVY_HITTER_COLUMNS = ['insuredCity', 'insuredpostalCode', 'insuredname']
+
+# Key of the provider tracker (fed from provider lines, see providers.py)
+PROVIDER_KEY = 'provider'
+
+RANK_BY = ['claims', 'payment']
+
+# Candidates kept per tracker and ranking
+DEFAULT_TOP_K = 50
+
+# Selected claims hashed per batch when a filtered selection is counted
+BATCH_ROWS = 100_000
+
+SKETCH_WIDTH = 2 ** 14
+SKETCH_DEPTH = 4
+
+# An insured with at least this many claims is flagged as a repeat claimant
+REPEAT_CLAIMS = 3
+
+_WIDTH_BITS = int(np.log2(SKETCH_WIDTH))
+# Odd multipliers of the multiply-shift hash of each sketch row
+_MULTIPLIERS = np.random.default_rng(20240611).integers(1, 2 ** 63, SKETCH_DEPTH, dtype=np.uint64) * 2 + 1
+
+
+def hash_keys(values):
+    """
+    64-bit hash of each value, and a mask of the values that are present.
+
+    Categorical columns hash their categories once. Equal values hash the
+    same in every frame, so trackers built from different chunks agree.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        category_hashes = pd.util.hash_array(np.asarray(values.cat.categories, dtype=object))
+        present = codes >= 0
+        return category_hashes[np.where(present, codes, 0)], present
+    present = values.notna().to_numpy()
+    hashes = np.zeros(len(values), dtype=np.uint64)
+    hashes[present] = pd.util.hash_array(values[present].to_numpy(dtype=object))
+    return hashes, present
+
+
+class CountMinSketch:
+    """Fixed-size table of weighted counts indexed by SKETCH_DEPTH hashes."""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.table = np.zeros((depth, width), dtype='float64')
+
+    def _columns(self, hashes):
+        shift = np.uint64(64 - _WIDTH_BITS)
+        return [((hashes * multiplier) >> shift).astype(np.intp) for multiplier in _MULTIPLIERS]
+
+    def add(self, hashes, weights=None):
+        """Count each hash once, or with its weight."""
+        for row, columns in enumerate(self._columns(hashes)):
+            self.table[row] += np.bincount(columns, weights=weights, minlength=self.table.shape[1])
+
+    def estimate(self, hashes):
+        """Upper-bound estimate of each hash's total."""
+        return np.min([self.table[row, columns] for row, columns in enumerate(self._columns(hashes))], axis=0)
+
+    def copy(self):
+        sketch = CountMinSketch.__new__(CountMinSketch)
+        sketch.table = self.table.copy()
+        return sketch
+
+
+class HeavyHitters:
+    """Top keys of one column by claim count and by payment."""
+
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.k = k
+        self.sketches = {by: CountMinSketch() for by in RANK_BY}
+        # Min-heaps of (estimate, hash, key): the smallest kept estimate is heap[0]
+        self.heaps = {by: [] for by in RANK_BY}
+        self.totals = dict.fromkeys(RANK_BY, 0.0)
+
+    def copy(self):
+        """Independent copy, for updating without changing readers' snapshots."""
+        hitters = HeavyHitters(self.k)
+        hitters.sketches = {by: sketch.copy() for by, sketch in self.sketches.items()}
+        hitters.heaps = {by: list(heap) for by, heap in self.heaps.items()}
+        hitters.totals = dict(self.totals)
+        return hitters
+
+    def update(self, keys, payments):
+        """Add a batch of claims (or provider lines): their keys and payments."""
+        hashes, present = hash_keys(keys)
+        hashes = hashes[present]
+        if not len(hashes):
+            return self
+        weights = {'claims': None, 'payment': np.nan_to_num(np.asarray(payments, dtype='float64')[present])}
+        batch_keys = np.asarray(keys, dtype=object)[present]
+        unique, first = np.unique(hashes, return_index=True)
+        for by in RANK_BY:
+            self.sketches[by].add(hashes, weights[by])
+            self.totals[by] += len(hashes) if by == 'claims' else float(weights[by].sum())
+            self._offer(by, unique, batch_keys[first])
+        return self
+
+    def _offer(self, by, hashes, keys):
+        """Re-rank the heap with the batch's keys (only those that can enter it)."""
+        heap = self.heaps[by]
+        sketch = self.sketches[by]
+        estimates = sketch.estimate(hashes)
+        if len(heap) >= self.k:
+            entering = estimates > heap[0][0]
+            hashes, keys, estimates = hashes[entering], keys[entering], estimates[entering]
+        if len(hashes) > self.k:
+            best = np.argpartition(-estimates, self.k)[:self.k]
+            hashes, keys, estimates = hashes[best], keys[best], estimates[best]
+
+        candidates = {entry[1]: entry[2] for entry in heap}
+        candidates.update(zip(hashes.tolist(), keys.tolist()))
+        known = np.fromiter(candidates, dtype=np.uint64, count=len(candidates))
+        current = sketch.estimate(known) if len(known) else []
+        entries = [(float(estimate), key_hash, candidates[key_hash])
+                   for estimate, key_hash in zip(current, known.tolist())]
+        heap[:] = heapq.nlargest(self.k, entries)
+        heapq.heapify(heap)
+
+    def top(self, n=20, by='claims'):
+        """
+        The n keys with the largest estimated total, as [key, claims, payment].
+
+        Both columns are count-min estimates (upper bounds).
+        """
+        entries = heapq.nlargest(n, self.heaps[by])
+        hashes = np.array([entry[1] for entry in entries], dtype=np.uint64)
+        return pd.DataFrame({
+            'key': [entry[2] for entry in entries],
+            'claims': self.sketches['claims'].estimate(hashes) if len(hashes) else [],
+            'payment': self.sketches['payment'].estimate(hashes) if len(hashes) else [],
+        })
+
+
+def _key_batches(frame, providers, key):
+    """(keys, payments) of a tracker's input: claim rows, or provider lines."""
+    if key == PROVIDER_KEY:
+        lines = providers.lines
+        return lines['tax_id'], lines['payment'].to_numpy(dtype='float64')
+    return frame[key], frame['total_insurance_payment'].to_numpy(dtype='float64')
+
+
+def build_heavy_hitters(frame, providers=None, current=None, k=DEFAULT_TOP_K):
+    """
+    Trackers of every HEAVY_HITTER_COLUMNS column (and providers) over claims.
+
+    With `current`, copies of those trackers are updated with the claims
+    instead (for appends and chunked ingestion).
+    """
+    keys = [column for column in HEAVY_HITTER_COLUMNS if column in frame]
+    if providers is not None and len(providers.specialties):
+        keys.append(PROVIDER_KEY)
+    hitters = {} if current is None else {key: hitters.copy() for key, hitters in current.items()}
+    for key in keys:
+        values, payments = _key_batches(frame, providers, key)
+        hitters.setdefault(key, HeavyHitters(k)).update(values, payments)
+    return hitters
+
+
+def top_keys(hitters, frame, providers, key, positions=None, n=20, by='claims'):
+    """
+    Top n keys of a selection as [key, claims, payment], largest `by` first.
+
+    Every claim (positions None, see is_estimate) is answered from the
+    load-time tracker without touching the rows: the numbers are count-min
+    estimates. A filtered selection is counted exactly in two passes over
+    the selected claims: the first feeds a fresh tracker, whose candidates
+    the second counts exactly. Provider results also get a 'name' column.
+    """
+    if positions is None:
+        top = hitters[key].top(n, by)
+    else:
+        top = _exact_top(lambda: _selection_batches(frame, providers, key, positions), n, by)
+    if key == PROVIDER_KEY and providers is not None:
+        names = providers.providers.set_index('tax_id')['name']
+        top.insert(1, 'name', names.reindex(top['key']).to_numpy())
+    return top
+
+
+def is_estimate(spec, default_spec):
+    """
+    True if top_keys answers a FilterSpec from the trackers' estimates.
+
+    The trackers cover every claim, so they stand in for a session with no
+    filters or with the default ones (whose full date range only leaves
+    out undated claims).
+    """
+    return spec in (FilterSpec(), default_spec)
+
+
+def _selection_batches(frame, providers, key, positions):
+    """(keys, payments) of the selected claims (or their provider lines), BATCH_ROWS at a time."""
+    if key == PROVIDER_KEY:
+        lines = providers.select(positions)
+        values, payments = lines['tax_id'], lines['payment'].to_numpy(dtype='float64')
+        for start in range(0, len(values), BATCH_ROWS):
+            yield values.iloc[start:start + BATCH_ROWS], payments[start:start + BATCH_ROWS]
+        return
+    for start in range(0, len(positions), BATCH_ROWS):
+        batch = positions[start:start + BATCH_ROWS]
+        yield frame[key].take(batch), frame['total_insurance_payment'].to_numpy(dtype='float64')[batch]
+
+
+def _exact_top(batches, n, by):
+    """
+    Exact top n of a selection, from the candidates of a tracker built over it.
+
+    `batches` returns a fresh iterator of (keys, payments) for each pass.
+    Count-min estimates never undercount, so keys outside the tracker's
+    top candidates only rank in the top n when the sketch is overloaded.
+    """
+    tracker = HeavyHitters(max(n, DEFAULT_TOP_K))
+    for values, payments in batches():
+        tracker.update(values, payments)
+    candidates = sorted(tracker.heaps[by], key=lambda entry: entry[1])
+    hashes = np.array([entry[1] for entry in candidates], dtype=np.uint64)
+    claims = np.zeros(len(hashes), dtype='int64')
+    paid = np.zeros(len(hashes))
+    for values, payments in batches():
+        if not len(hashes):
+            break
+        batch_hashes, present = hash_keys(values)
+        slots = np.minimum(np.searchsorted(hashes, batch_hashes), len(hashes) - 1)
+        found = present & (hashes[slots] == batch_hashes)
+        claims += np.bincount(slots[found], minlength=len(hashes))
+        paid += np.bincount(slots[found], weights=np.nan_to_num(payments[found]), minlength=len(hashes))
+    top = pd.DataFrame({'key': [entry[2] for entry in candidates], 'claims': claims, 'payment': paid})
+    return top.sort_values(by, ascending=False, kind='stable').head(n).reset_index(drop=True)
+
+
+def flag_repeat_claimants(top, min_claims=REPEAT_CLAIMS):
+    """Top insureds with a 'repeat' column: True for min_claims claims or more."""
+    return top.assign(repeat=top['claims'] >= min_claims)
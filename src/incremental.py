@@ -0,0 +1,184 @@
+"""
+Incremental Module
+==================
+Append newly landed claims to a loaded dataset without a full reload.
+
+append_claims() types the new rows, drops claims already loaded (by
+claimNumber), and folds them into the dataset without rebuilding it. The
+frame and claim numbers grow by the delta with amortized work in
+proportion to it (see frame_buffer.py and claim_ids.py), and the cube
+touches its cells but never the loaded claims (see cube.extend_cube).
+The filter, provider, tax id, text and time series indexes only
+factorize and sort the delta's rows, but each still copies its existing
+arrays once per append.
+
+The dataset version is bumped, so cached views of the old contents are
+simply no longer looked up; rows added to a shared SQL backend carry the
+new version, so snapshots of the old one do not see them.
+
+A drop folder can also be watched: every CSV placed in it is appended and
+then moved to a processed/ subfolder (or failed/ if it could not be read).
+"""
+
+import logging
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from cube import extend_cube
+from frame_buffer import FrameBuffer
+from heavy_hitters import build_heavy_hitters
+from ingest import coerce_claims
+from providers import ProviderTable
+from schema import CLAIM_ID_COLUMN, STRING_READ_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_DIR_NAME = 'processed'
+FAILED_DIR_NAME = 'failed'
+
+# Seconds between drop folder scans
+DEFAULT_POLL_SECONDS = 30
+
+# Appends read the current contents and then swap in new ones, so two
+# appends must never interleave
+_append_lock = threading.Lock()
+
+
+@dataclass
+class AppendResult:
+    """Outcome of one append."""
+
+    added: int
+    duplicates: int
+    version: int
+
+
+def append_claims(dataset, new_rows):
+    """
+    Append raw or typed claim rows to a dataset.
+
+    Rows whose claimNumber is already loaded, or repeated within new_rows,
+    are skipped. Returns an AppendResult.
+    """
+    delta = coerce_claims(new_rows)
+    received = len(delta)
+    with _append_lock:
+        return _append_delta(dataset, delta, received)
+
+
+def _append_delta(dataset, delta, received):
+    """Deduplicate a typed delta and fold it into the dataset."""
+    current = dataset.snapshot()
+
+    claim_ids = current.claim_ids
+    if CLAIM_ID_COLUMN in delta:
+        ids = delta[CLAIM_ID_COLUMN]
+        keep = ~(claim_ids.contains(ids) | (ids.duplicated() & ids.notna()).to_numpy())
+        delta = delta[keep].reset_index(drop=True)
+        claim_ids = claim_ids.extend(delta[CLAIM_ID_COLUMN])
+
+    if len(delta) == 0:
+        return AppendResult(added=0, duplicates=received, version=current.version)
+
+    # Every derived structure is built first; none of them changes the
+    # current contents, so a failure here leaves the dataset as it was
+    changes = {
+        'cube': extend_cube(current.cube, delta),
+        'claim_ids': claim_ids,
+    }
+    if current.heavy_hitters is not None:
+        changes['heavy_hitters'] = build_heavy_hitters(delta, ProviderTable(delta), current=current.heavy_hitters)
+    if current.in_memory:
+        changes['filter_index'] = current.filter_index.extend(delta)
+        if current.providers is not None:
+            changes['providers'] = current.providers.extend(delta)
+            changes['tax_ids'] = current.tax_ids.extend(changes['providers'])
+        if current.text_index is not None:
+            changes['text_index'] = current.text_index.extend(delta)
+        if current.timeseries is not None:
+            changes['timeseries'] = current.timeseries.extend(delta)
+
+    # Then the shared stores are written. Snapshots of the current version
+    # filter the new SQL rows out; appends are serialized, so no other
+    # append can use the same version. If the frame cannot take the rows,
+    # they are deleted again so that the next append does not reveal them
+    # under its version.
+    version = current.version + 1
+    if current.sql is not None:
+        current.sql.append(delta, version=version)
+    if current.in_memory:
+        buffer = current.frame_buffer or FrameBuffer(current.frame)
+        try:
+            # The buffer only counts the new rows once all are written
+            changes['frame'] = buffer.append(delta)
+        except Exception:
+            if current.sql is not None:
+                current.sql.discard(version)
+            raise
+        changes['frame_buffer'] = buffer
+    dataset.update(**changes)
+
+    return AppendResult(added=len(delta), duplicates=received - len(delta),
+                        version=dataset.version)
+
+
+def append_csv(dataset, csv_path):
+    """Append the claims in a CSV file to a dataset."""
+    return append_claims(dataset, pd.read_csv(csv_path, dtype=STRING_READ_COLUMNS))
+
+
+def ingest_drop_folder(dataset, folder):
+    """
+    Append every CSV waiting in a drop folder, oldest first.
+
+    Each file is moved to processed/ once appended, or failed/ if it could
+    not be read. Returns a list of (file name, AppendResult or None).
+    """
+    folder = Path(folder)
+    results = []
+    for csv_path in sorted(folder.glob('*.csv'), key=lambda p: p.stat().st_mtime):
+        try:
+            result = append_csv(dataset, csv_path)
+            destination = PROCESSED_DIR_NAME
+        except (OSError, ValueError, KeyError) as error:
+            logger.warning("Could not append %s: %s", csv_path.name, error)
+            result = None
+            destination = FAILED_DIR_NAME
+        (folder / destination).mkdir(exist_ok=True)
+        shutil.move(str(csv_path), str(folder / destination / csv_path.name))
+        results.append((csv_path.name, result))
+    return results
+
+
+class DropFolderWatcher:
+    """Background thread that polls a drop folder and appends new CSVs."""
+
+    def __init__(self, dataset, folder, poll_seconds=DEFAULT_POLL_SECONDS):
+        self.dataset = dataset
+        self.folder = Path(folder)
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='drop-folder-watcher', daemon=True)
+
+    def start(self):
+        """Start polling in the background."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop polling and wait for the current scan to finish."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for name, result in ingest_drop_folder(self.dataset, self.folder):
+                if result is not None:
+                    logger.info("Appended %s: %d new claims, %d duplicates",
+                                name, result.added, result.duplicates)
+            self._stop.wait(self.poll_seconds)
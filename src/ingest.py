@@ -0,0 +1,134 @@
+"""
+Ingest Module
+=============
+Chunked, out-of-core ingestion for CSVs larger than memory.
+
+Instead of parsing the whole CSV into one DataFrame, the file is streamed
+through a generator pipeline: read a chunk, coerce dateOfloss and apply the
+schema, aggregate the chunk into a cube and optionally write it out as a
+Parquet partition. Chunk cubes are merged pairwise as they arrive (a binary
+merge tree), so peak memory is bounded by the chunk size plus O(log chunks)
+partial cubes, and the dashboard's KPIs and charts are answered from the
+cube alone.
+Heavy-hitter trackers (see heavy_hitters.py) are updated from each chunk
+as well.
+"""
+
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from claim_ids import ClaimIds
+from cube import ClaimsCube, build_cube, merge_cubes
+from heavy_hitters import build_heavy_hitters
+from providers import ProviderTable
+from schema import CLAIM_ID_COLUMN, STRING_READ_COLUMNS, apply_schema
+
+
+# Rows parsed per chunk
+DEFAULT_CHUNK_ROWS = 250_000
+
+LOAD_MODE_MEMORY = 'memory'
+LOAD_MODE_CHUNKED = 'chunked'
+
+
+def get_load_mode():
+    """How the dashboard loads data, from the DASHBOARD_LOAD_MODE variable."""
+    return os.environ.get('DASHBOARD_LOAD_MODE', LOAD_MODE_MEMORY).lower()
+
+
+def get_chunk_rows():
+    """Rows per chunk, from the DASHBOARD_CHUNK_ROWS variable."""
+    return int(os.environ.get('DASHBOARD_CHUNK_ROWS', DEFAULT_CHUNK_ROWS))
+
+
+@dataclass
+class IngestResult:
+    """Aggregates built by a chunked ingestion run."""
+
+    cube: ClaimsCube
+    rows: int = 0
+    chunks: int = 0
+    partitions: list = field(default_factory=list)
+    # Hashes of the claim numbers seen, see claim_ids.py
+    claim_ids: ClaimIds = field(default_factory=ClaimIds)
+    # Top-key trackers, see heavy_hitters.py
+    heavy_hitters: dict = field(default_factory=dict)
+
+
+def read_csv_chunks(data_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield raw DataFrame chunks of a claims CSV."""
+    yield from pd.read_csv(data_path, dtype=STRING_READ_COLUMNS, chunksize=chunk_rows)
+
+
+def coerce_claims(df):
+    """Parse dates and apply the declared schema to raw claim rows."""
+    df = df.assign(dateOfloss=pd.to_datetime(df['dateOfloss'], errors='coerce'))
+    return apply_schema(df)
+
+
+def coerce_chunks(chunks):
+    """Parse dates and apply the declared schema to each chunk."""
+    for chunk in chunks:
+        yield coerce_claims(chunk)
+
+
+def write_partitions(chunks, partition_dir):
+    """Write each chunk to a numbered Parquet file, passing chunks through."""
+    partition_dir = Path(partition_dir)
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    for number, chunk in enumerate(chunks):
+        path = partition_dir / f"part-{number:05d}.parquet"
+        chunk.to_parquet(path, index=False)
+        yield chunk, path
+
+
+def ingest_csv(data_path, chunk_rows=DEFAULT_CHUNK_ROWS, partition_dir=None):
+    """
+    Stream a claims CSV into a cube without materializing all rows.
+
+    With partition_dir, the typed chunks are also written there as Parquet
+    partitions that can be scanned later without re-parsing the CSV.
+    """
+    chunks = coerce_chunks(read_csv_chunks(data_path, chunk_rows))
+    if partition_dir is None:
+        chunks = ((chunk, None) for chunk in chunks)
+    else:
+        chunks = write_partitions(chunks, partition_dir)
+
+    result = None
+    cubes = []
+    for chunk, path in chunks:
+        if result is None:
+            result = IngestResult(cube=None)
+        _push_cube(cubes, build_cube(chunk))
+        result.rows += len(chunk)
+        result.chunks += 1
+        # Kept so later appends can be deduplicated without the rows
+        if CLAIM_ID_COLUMN in chunk:
+            result.claim_ids = result.claim_ids.extend(chunk[CLAIM_ID_COLUMN])
+        result.heavy_hitters = build_heavy_hitters(chunk, ProviderTable(chunk), current=result.heavy_hitters)
+        if path is not None:
+            result.partitions.append(path)
+
+    if result is None:
+        raise ValueError(f"{data_path} contains no claims")
+    result.cube = cubes[0][1] if len(cubes) == 1 else merge_cubes(cube for _, cube in cubes)
+    return result
+
+
+def _push_cube(cubes, cube):
+    """
+    Add a chunk's cube to a stack of (level, cube) pairs, merging as a binary tree.
+
+    Two cubes of the same level are merged into one of the next level, so
+    each cell is regrouped O(log chunks) times rather than once per chunk,
+    and at most O(log chunks) partial cubes are held.
+    """
+    level = 0
+    while cubes and cubes[-1][0] == level:
+        cube = merge_cubes([cubes.pop()[1], cube])
+        level += 1
+    cubes.append((level, cube))
@@ -0,0 +1,292 @@
+"""
+Instrumentation Module
+======================
+Timing and memory instrumentation for the dashboard pipeline.
+
+Wrap each stage of a rerun in span("stage name"): its wall time is recorded
+in a latency histogram, rows it processed in a counter and, when memory
+tracing is on (DASHBOARD_TRACE_MEMORY=1), its peak allocation. tracemalloc
+has a single process-wide peak, so only a span that ran alone is measured:
+the outermost one, with no spans of other threads overlapping it (nested
+spans' allocations count towards it). Spans of the
+current rerun are also kept per thread (worker threads can attach to the
+rerun they work for), so the sidebar can show where this rerun's time went.
+
+Metrics can be exported in Prometheus text format (e.g. for the node
+exporter's textfile collector via DASHBOARD_METRICS_FILE) or as JSON lines,
+and each rerun can be appended to a JSON lines log (DASHBOARD_METRICS_LOG).
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+METRIC_PREFIX = 'dashboard_'
+
+_HELP = {
+    'stage_seconds': 'Wall time spent in each dashboard stage',
+    'rerun_seconds': 'Wall time of a whole dashboard rerun',
+    'stage_rows_total': 'Rows (or cube cells) processed by each stage',
+    'stage_peak_bytes': 'Peak traced allocation during the last unshared run of each top-level stage',
+    'cache_hits_total': 'Result cache hits',
+    'cache_misses_total': 'Result cache misses',
+    'cache_entries': 'Entries held by the result cache',
+    'cache_bytes': 'Estimated bytes held by the result cache',
+}
+
+
+def memory_tracing_enabled():
+    """True when DASHBOARD_TRACE_MEMORY asks for allocation tracking."""
+    return os.environ.get('DASHBOARD_TRACE_MEMORY', '').lower() in ('1', 'true', 'yes')
+
+
+class MetricsRegistry:
+    """Thread-safe store of histograms, counters and gauges with labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name, value, **labels):
+        """Add an observation to a histogram."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def increment(self, name, amount=1, **labels):
+        """Add to a counter."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_counter(self, name, value, **labels):
+        """Set a counter to a running total kept elsewhere (it must never decrease)."""
+        with self._lock:
+            self._counters[(name, _label_key(labels))] = value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def samples(self):
+        """Snapshot of every series as (type, name, labels, value) tuples."""
+        with self._lock:
+            samples = [('histogram', n, dict(k), dict(h, buckets=list(h['buckets'])))
+                       for (n, k), h in self._histograms.items()]
+            samples += [('counter', n, dict(k), v) for (n, k), v in self._counters.items()]
+            samples += [('gauge', n, dict(k), v) for (n, k), v in self._gauges.items()]
+        return sorted(samples, key=lambda s: (s[1], sorted(s[2].items())))
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        described = set()
+        for kind, name, labels, value in self.samples():
+            full_name = METRIC_PREFIX + name
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {full_name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {full_name} {kind}")
+            if kind == 'histogram':
+                for bound, count in zip(LATENCY_BUCKETS, value['buckets']):
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, le=bound)} {count}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels, le='+Inf')} {value['count']}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{full_name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def to_json_lines(self):
+        """All metrics as JSON lines, one series per line."""
+        now = time.time()
+        lines = []
+        for kind, name, labels, value in self.samples():
+            record = {'time': now, 'metric': METRIC_PREFIX + name, 'type': kind, 'labels': labels}
+            if kind == 'histogram':
+                record.update(buckets=dict(zip(map(str, LATENCY_BUCKETS), value['buckets'])),
+                              sum=value['sum'], count=value['count'])
+            else:
+                record['value'] = value
+            lines.append(json.dumps(record))
+        return '\n'.join(lines) + '\n'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+# Process-wide registry shared by every session
+METRICS = MetricsRegistry()
+
+_current_run = threading.local()
+
+# Spans being memory-traced, process-wide: tracemalloc's peak is reset only
+# when the first one starts, and a span is only measured if every span that
+# overlapped it ran on its own thread (so was nested inside it)
+_tracing_lock = threading.Lock()
+_tracing = {'active': 0, 'threads': set(), 'shared': False}
+
+
+@contextmanager
+def span(stage, registry=None):
+    """
+    Time a pipeline stage.
+
+    Yields a dict; set its 'rows' key to count the rows the stage processed.
+    """
+    registry = registry or METRICS
+    record = {'stage': stage, 'rows': None}
+    tracing = memory_tracing_enabled() and tracemalloc.is_tracing()
+    if tracing:
+        measured = _start_traced_span()
+        before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        registry.observe('stage_seconds', record['seconds'], stage=stage)
+        if record['rows'] is not None:
+            registry.increment('stage_rows_total', record['rows'], stage=stage)
+        if tracing and _finish_traced_span(measured):
+            record['peak_bytes'] = max(0, tracemalloc.get_traced_memory()[1] - before)
+            registry.set_gauge('stage_peak_bytes', record['peak_bytes'], stage=stage)
+        spans = getattr(_current_run, 'spans', None)
+        if spans is not None:
+            spans.append(record)
+
+
+def _start_traced_span():
+    """Register a traced span; True if it is the outermost one running."""
+    thread = threading.get_ident()
+    with _tracing_lock:
+        outermost = _tracing['active'] == 0
+        if outermost:
+            tracemalloc.reset_peak()
+            _tracing['threads'] = set()
+            _tracing['shared'] = False
+        elif thread not in _tracing['threads']:
+            # Another thread's span overlaps: the peak covers both
+            _tracing['shared'] = True
+        _tracing['active'] += 1
+        _tracing['threads'].add(thread)
+    return outermost
+
+
+def _finish_traced_span(outermost):
+    """Unregister a traced span; True if its peak is its own and should be recorded."""
+    with _tracing_lock:
+        _tracing['active'] -= 1
+        return outermost and not _tracing['shared']
+
+
+def start_run():
+    """Start collecting the spans of a rerun on this thread."""
+    if memory_tracing_enabled() and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _current_run.spans = []
+    _current_run.start = time.perf_counter()
+
+
+def current_run_spans():
+    """Spans recorded so far in this thread's rerun."""
+    return list(getattr(_current_run, 'spans', None) or [])
+
+
+def current_run():
+    """Handle on this thread's rerun (None outside one), for attach_run()."""
+    return getattr(_current_run, 'spans', None)
+
+
+@contextmanager
+def attach_run(run):
+    """
+    Record spans on this thread into another thread's rerun.
+
+    Worker threads use it so the stages they run for a rerun show up in
+    that rerun's breakdown.
+    """
+    previous = getattr(_current_run, 'spans', None)
+    _current_run.spans = run
+    try:
+        yield
+    finally:
+        _current_run.spans = previous
+
+
+def finish_run(registry=None):
+    """
+    Finish this thread's rerun: record its total time and write exports.
+
+    Returns the run's spans.
+    """
+    registry = registry or METRICS
+    spans = current_run_spans()
+    start = getattr(_current_run, 'start', None)
+    _current_run.spans = None
+    if start is None:
+        return spans
+
+    total = time.perf_counter() - start
+    registry.observe('rerun_seconds', total)
+    write_exports(registry, {'time': time.time(), 'seconds': total, 'stages': spans})
+    return spans
+
+
+def record_cache_stats(stats, cache='views', registry=None):
+    """Publish ResultCache.stats() as metrics."""
+    registry = registry or METRICS
+    registry.set_counter('cache_hits_total', stats['hits'], cache=cache)
+    registry.set_counter('cache_misses_total', stats['misses'], cache=cache)
+    registry.set_gauge('cache_entries', stats['entries'], cache=cache)
+    registry.set_gauge('cache_bytes', stats['bytes'], cache=cache)
+
+
+def write_exports(registry, run_record=None):
+    """
+    Write the configured metric exports.
+
+    DASHBOARD_METRICS_FILE is replaced with the Prometheus text, and
+    DASHBOARD_METRICS_LOG gets one JSON line per rerun.
+    """
+    metrics_file = os.environ.get('DASHBOARD_METRICS_FILE')
+    if metrics_file:
+        tmp_path = metrics_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(registry.to_prometheus())
+        os.replace(tmp_path, metrics_file)
+
+    metrics_log = os.environ.get('DASHBOARD_METRICS_LOG')
+    if metrics_log and run_record is not None:
+        with open(metrics_log, 'a') as f:
+            f.write(json.dumps(run_record, default=str) + '\n')
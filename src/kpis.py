@@ -2,8 +2,134 @@
 KPI Calculation Module
 ======================
 Functions to calculate key performance indicators from insurance data.
+
+compute_kpis() is the main entry point: it reads each needed column once and
+returns every dashboard metric together, optionally per group. The single
+calculate_* functions are kept for callers that only need one number.
 """
 
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from schema import flag_mask
+
+
+# Additive totals every KPI is derived from
+KPI_SUMS = ['total_claims', 'total_claimed', 'total_paid', 'injury_count', 'lawsuit_count']
+
+
+@dataclass(frozen=True)
+class KPIResult:
+    """Dashboard metrics for one set of claims."""
+
+    total_claims: int
+    total_claimed: float
+    total_paid: float
+    injury_count: int
+    lawsuit_count: int
+
+    @property
+    def average_claim(self):
+        """Mean claimed loss per claim."""
+        if self.total_claims == 0:
+            return 0
+        return self.total_claimed / self.total_claims
+
+    @property
+    def injury_rate(self):
+        """Percentage of claims involving injuries."""
+        if self.total_claims == 0:
+            return 0
+        return self.injury_count / self.total_claims * 100
+
+    @property
+    def lawsuit_rate(self):
+        """Percentage of claims with lawsuits filed."""
+        if self.total_claims == 0:
+            return 0
+        return self.lawsuit_count / self.total_claims * 100
+
+    @property
+    def payment_ratio(self):
+        """Payments as a percentage of claimed losses (loss ratio)."""
+        if self.total_claimed == 0:
+            return 0
+        return self.total_paid / self.total_claimed * 100
+
+    def as_dict(self):
+        """Totals and derived ratios as a plain dict (e.g. for JSON)."""
+        return {
+            'total_claims': self.total_claims,
+            'total_claimed': self.total_claimed,
+            'total_paid': self.total_paid,
+            'injury_count': self.injury_count,
+            'lawsuit_count': self.lawsuit_count,
+            'average_claim': self.average_claim,
+            'injury_rate': self.injury_rate,
+            'lawsuit_rate': self.lawsuit_rate,
+            'payment_ratio': self.payment_ratio,
+        }
+
+    @classmethod
+    def from_sums(cls, sums):
+        """Build a result from a mapping holding the KPI_SUMS totals."""
+        return cls(
+            total_claims=int(sums['total_claims']),
+            total_claimed=float(sums['total_claimed']),
+            total_paid=float(sums['total_paid']),
+            injury_count=int(sums['injury_count']),
+            lawsuit_count=int(sums['lawsuit_count']),
+        )
+
+
+def compute_kpis(df, by=None):
+    """
+    Calculate every dashboard KPI in one pass over the claims.
+
+    Returns a KPIResult. With `by` (a column name or list of names), returns
+    a DataFrame with one row of KPIs per group instead, from a single groupby.
+    """
+    if by is None:
+        return KPIResult(
+            total_claims=len(df),
+            total_claimed=float(np.sum(df['total_claimed_losses'].to_numpy(), dtype='float64')),
+            total_paid=float(np.sum(df['total_insurance_payment'].to_numpy(), dtype='float64')),
+            injury_count=int(flag_mask(df['injuryinvolved']).sum()),
+            lawsuit_count=int(flag_mask(df['lawsuit_filed']).sum()),
+        )
+
+    if isinstance(by, str):
+        by = [by]
+    values = pd.DataFrame({
+        'total_claimed': df['total_claimed_losses'].to_numpy(dtype='float64'),
+        'total_paid': df['total_insurance_payment'].to_numpy(dtype='float64'),
+        'injury_count': flag_mask(df['injuryinvolved']),
+        'lawsuit_count': flag_mask(df['lawsuit_filed']),
+    })
+    keys = [df[column].reset_index(drop=True) for column in by]
+    grouped = values.groupby(keys, observed=True)
+    sums = grouped.sum()
+    sums.insert(0, 'total_claims', grouped.size())
+    return add_kpi_ratios(sums)
+
+
+def add_kpi_ratios(sums):
+    """
+    Add the derived KPI columns to a frame of KPI_SUMS totals.
+
+    Rows with no claims (or nothing claimed) get 0, like KPIResult.
+    """
+    table = sums.astype({'injury_count': 'int64', 'lawsuit_count': 'int64'})
+    claims = table['total_claims'].where(table['total_claims'] != 0)
+    claimed = table['total_claimed'].where(table['total_claimed'] != 0)
+    table['average_claim'] = (table['total_claimed'] / claims).fillna(0)
+    table['injury_rate'] = (table['injury_count'] / claims * 100).fillna(0)
+    table['lawsuit_rate'] = (table['lawsuit_count'] / claims * 100).fillna(0)
+    table['payment_ratio'] = (table['total_paid'] / claimed * 100).fillna(0)
+    return table
+
 
 def calculate_total_claims(df):
     """Calculate total number of claims."""
@@ -31,7 +157,7 @@ def calculate_injury_rate(df):
     """Calculate percentage of claims involving injuries."""
     if len(df) == 0:
         return 0
-    injury_count = df[df['injuryinvolved'] == 'Yes'].shape[0]
+    injury_count = flag_mask(df['injuryinvolved']).sum()
     return (injury_count / len(df)) * 100
 
 
@@ -39,7 +165,7 @@ def calculate_lawsuit_rate(df):
     """Calculate percentage of claims with lawsuits filed."""
     if len(df) == 0:
         return 0
-    lawsuit_count = df[df['lawsuit_filed'] == 'Yes'].shape[0]
+    lawsuit_count = flag_mask(df['lawsuit_filed']).sum()
     return (lawsuit_count / len(df)) * 100
 
 
@@ -67,3 +193,8 @@ def format_currency(value):
 def format_number(value):
     """Format number with commas."""
     return f"{value:,.0f}"
+
+
+def format_percent(value):
+    """Format a percentage with one decimal."""
+    return f"{value:.1f}%"
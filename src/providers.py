@@ -0,0 +1,296 @@
+"""
+Providers Module
+================
+Long-format table of the medical providers paid on each claim.
+
+The CSV stores providers as wide column triplets, one per specialty:
+providers_<specialty>, providers_<specialty>_tax_id and
+providers_<specialty>_payment. ProviderTable reshapes them into one compact
+"provider line" per claim and specialty that has a provider:
+
+    claim_row    position of the claim in the claims frame
+    specialty    categorical specialty
+    provider_id  integer id of the provider (one per tax id)
+    tax_id       categorical tax id, sharing provider_id as its codes
+    payment      float32 amount paid to the provider on that claim
+
+The reshape works column by column with NumPy, never row by row. Provider
+names are kept once per provider in ProviderTable.providers.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import PROVIDER_PAYMENT_DTYPE, PROVIDER_PREFIX
+
+
+TAX_ID_SUFFIX = '_tax_id'
+PAYMENT_SUFFIX = '_payment'
+
+
+def provider_specialties(columns):
+    """Specialty names of the provider column triplets in `columns`, in order."""
+    present = set(columns)
+    specialties = []
+    for column in columns:
+        if column.startswith(PROVIDER_PREFIX) and column.endswith(TAX_ID_SUFFIX):
+            specialty = column[len(PROVIDER_PREFIX):-len(TAX_ID_SUFFIX)]
+            base = PROVIDER_PREFIX + specialty
+            if base in present and base + PAYMENT_SUFFIX in present:
+                specialties.append(specialty)
+    return specialties
+
+
+def _row_dtype(n_rows):
+    return np.int32 if n_rows <= np.iinfo(np.int32).max else np.int64
+
+
+def _wide_to_lines(df, specialties, row_offset=0):
+    """
+    Stack the wide provider columns of `df` into line arrays.
+
+    Returns (claim_rows, specialty_codes, tax_ids, names, payments); tax ids
+    and names are Series so Arrow-backed strings stay Arrow-backed.
+    """
+    claim_rows, codes, tax_ids, names, payments = [], [], [], [], []
+    for code, specialty in enumerate(specialties):
+        base = PROVIDER_PREFIX + specialty
+        tax_id = df[base + TAX_ID_SUFFIX]
+        rows = np.flatnonzero((tax_id.notna() & (tax_id != '')).to_numpy(dtype=bool))
+        claim_rows.append(rows + row_offset)
+        codes.append(np.full(len(rows), code, dtype=np.int8))
+        tax_ids.append(tax_id.take(rows))
+        names.append(df[base].take(rows))
+        payments.append(df[base + PAYMENT_SUFFIX].to_numpy(dtype=PROVIDER_PAYMENT_DTYPE)[rows])
+
+    if not specialties:
+        return (np.array([], dtype=np.int64), np.array([], dtype=np.int8),
+                pd.Series([], dtype=object), pd.Series([], dtype=object),
+                np.array([], dtype=PROVIDER_PAYMENT_DTYPE))
+    return (np.concatenate(claim_rows), np.concatenate(codes),
+            pd.concat(tax_ids, ignore_index=True), pd.concat(names, ignore_index=True),
+            np.concatenate(payments))
+
+
+def _first_lines(ids, n_ids):
+    """Position of the first line of each id."""
+    first = np.zeros(n_ids, dtype=np.int64)
+    first[ids[::-1]] = np.arange(len(ids))[::-1]
+    return first
+
+
+def _provider_frame(tax_ids, names):
+    return pd.DataFrame({
+        'tax_id': np.asarray(tax_ids, dtype=object),
+        'name': np.asarray(names.to_numpy(dtype=object, na_value=None), dtype=object),
+    })
+
+
+class ProviderTable:
+    """Provider lines of a claims frame, with spend aggregates."""
+
+    def __init__(self, df):
+        self.specialties = provider_specialties(df.columns)
+        self.n_claims = len(df)
+        claim_rows, codes, tax_ids, names, payments = _wide_to_lines(df, self.specialties)
+
+        provider_ids, unique_tax_ids = pd.factorize(tax_ids)
+        # Each provider is named after its first line
+        first = _first_lines(provider_ids, len(unique_tax_ids))
+        self.providers = _provider_frame(unique_tax_ids, names.take(first))
+        self.lines = self._make_lines(claim_rows, codes, provider_ids, payments)
+
+    def _make_lines(self, claim_rows, codes, provider_ids, payments):
+        provider_ids = provider_ids.astype(np.int32)
+        return pd.DataFrame({
+            'claim_row': claim_rows.astype(_row_dtype(self.n_claims)),
+            'specialty': pd.Categorical.from_codes(codes, self.specialties),
+            'provider_id': provider_ids,
+            'tax_id': pd.Categorical.from_codes(provider_ids, self.providers['tax_id']),
+            'payment': payments,
+        })
+
+    def __len__(self):
+        return len(self.lines)
+
+    def extend(self, delta):
+        """
+        New table for this one plus the claims of `delta`.
+
+        Delta claims take the next row positions, matching a frame built by
+        concatenating `delta` after the current claims. Existing providers
+        keep their ids; new tax ids get the next ones. Only the delta is
+        reshaped into lines, but the existing lines are copied into the new
+        table.
+        """
+        claim_rows, codes, tax_ids, names, payments = _wide_to_lines(
+            delta, self.specialties, row_offset=self.n_claims
+        )
+        known = pd.Index(self.providers['tax_id'])
+        provider_ids = known.get_indexer(tax_ids.to_numpy(dtype=object))
+        new = np.flatnonzero(provider_ids < 0)
+        new_ids, new_tax_ids = pd.factorize(tax_ids.take(new))
+        provider_ids[new] = new_ids + len(known)
+
+        table = ProviderTable.__new__(ProviderTable)
+        table.specialties = self.specialties
+        table.n_claims = self.n_claims + len(delta)
+        first = new[_first_lines(new_ids, len(new_tax_ids))]
+        table.providers = pd.concat(
+            [self.providers, _provider_frame(new_tax_ids, names.take(first))], ignore_index=True
+        )
+        delta_lines = table._make_lines(claim_rows, codes, provider_ids, payments)
+        current = self.lines.assign(
+            claim_row=self.lines['claim_row'].astype(delta_lines['claim_row'].dtype),
+            tax_id=pd.Categorical.from_codes(self.lines['provider_id'], table.providers['tax_id']),
+        )
+        table.lines = pd.concat([current, delta_lines], ignore_index=True)
+        return table
+
+    def select(self, positions=None):
+        """Lines of the claims at `positions` (all lines when None)."""
+        if positions is None:
+            return self.lines
+        selected = np.zeros(self.n_claims, dtype=bool)
+        selected[positions] = True
+        return self.lines[selected[self.lines['claim_row'].to_numpy()]]
+
+    def spend_by_specialty(self, positions=None):
+        """
+        Lines, providers and total payment per specialty.
+
+        A claim has at most one provider per specialty, so lines are also the
+        number of claims that used the specialty.
+        """
+        lines = self.select(positions)
+        n_specialties = len(self.specialties)
+        codes = lines['specialty'].cat.codes.to_numpy()
+        ids = lines['provider_id'].to_numpy().astype(np.int64)
+        pairs = pd.unique(codes * np.int64(len(self.providers)) + ids)
+        return pd.DataFrame({
+            'specialty': pd.Categorical(self.specialties, categories=self.specialties),
+            'lines': np.bincount(codes, minlength=n_specialties),
+            'providers': np.bincount(pairs // max(len(self.providers), 1), minlength=n_specialties),
+            'payment': np.bincount(codes, weights=lines['payment'].to_numpy(dtype='float64'),
+                                   minlength=n_specialties),
+        })
+
+    def spend_by_insurer(self, frame, positions=None):
+        """Total provider payment per insurer and specialty."""
+        lines = self.select(positions)
+        insurer = frame['insurer_name'].take(lines['claim_row'].to_numpy())
+        data = pd.DataFrame({
+            'insurer_name': insurer.array,
+            'specialty': lines['specialty'].array,
+            'payment': lines['payment'].to_numpy(dtype='float64'),
+        })
+        return data.groupby(['insurer_name', 'specialty'], observed=True)['payment'].sum().reset_index()
+
+    def provider_counts(self, positions=None):
+        """Distinct providers per specialty."""
+        return self.spend_by_specialty(positions)[['specialty', 'providers']]
+
+    def top_providers(self, n=10, positions=None):
+        """The n providers paid the most, with their claim counts."""
+        lines = self.select(positions)
+        ids = lines['provider_id'].to_numpy()
+        totals = np.bincount(ids, weights=lines['payment'].to_numpy(dtype='float64'),
+                             minlength=len(self.providers))
+        counts = np.bincount(ids, minlength=len(self.providers))
+        n = min(n, int(np.count_nonzero(counts)))
+        top = np.argsort(-totals, kind='stable')[:n]
+
+        # Each provider's main specialty: the one with the most lines
+        n_specialties = max(len(self.specialties), 1)
+        chosen = np.isin(ids, top)
+        pairs = np.bincount(
+            ids[chosen].astype(np.int64) * n_specialties + lines['specialty'].cat.codes.to_numpy()[chosen],
+            minlength=len(self.providers) * n_specialties,
+        ).reshape(-1, n_specialties)
+        specialties = np.asarray(self.specialties, dtype=object)
+        return pd.DataFrame({
+            'provider_id': top.astype(np.int32),
+            'name': self.providers['name'].to_numpy()[top],
+            'tax_id': self.providers['tax_id'].to_numpy()[top],
+            'specialty': specialties[pairs[top].argmax(axis=1)] if n else [],
+            'claims': counts[top],
+            'payment': totals[top],
+        })
+
+
+class TaxIdIndex:
+    """
+    Hash index from provider tax id to the provider's lines.
+
+    Lines are grouped by provider (CSR layout: one sorted array of line
+    numbers plus per-provider offsets), so a lookup is one hash probe plus a
+    slice the size of the answer.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        ids = table.lines['provider_id'].to_numpy()
+        n_providers = len(table.providers)
+        self._tax_ids = pd.Index(table.providers['tax_id'])
+        self._line_order = np.argsort(ids, kind='stable').astype(_row_dtype(len(ids)))
+        self._offsets = np.zeros(n_providers + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=n_providers), out=self._offsets[1:])
+
+    def extend(self, table):
+        """
+        Index of `table`, this index's table extended by a delta (see ProviderTable.extend).
+
+        Only the delta's lines are sorted. They have larger line numbers
+        than every existing line, so each goes at the end of its provider's
+        run and the runs stay sorted. Inserting them copies the existing
+        line order once.
+        """
+        n_lines = len(self._line_order)
+        ids = table.lines['provider_id'].to_numpy()[n_lines:]
+        n_providers = len(table.providers)
+        n_known = len(self._offsets) - 1
+        order = np.argsort(ids, kind='stable')
+        offsets = np.concatenate([self._offsets, np.full(n_providers - n_known, self._offsets[-1])])
+
+        extended = TaxIdIndex.__new__(TaxIdIndex)
+        extended.table = table
+        extended._tax_ids = self._tax_ids.append(pd.Index(table.providers['tax_id'].iloc[n_known:]))
+        extended._line_order = np.insert(self._line_order.astype(_row_dtype(n_lines + len(ids))),
+                                         offsets[ids[order] + 1], order + n_lines)
+        extended._offsets = offsets
+        extended._offsets[1:] += np.cumsum(np.bincount(ids, minlength=n_providers))
+        return extended
+
+    def __contains__(self, tax_id):
+        return _normalize_tax_id(tax_id) in self._tax_ids
+
+    def provider_id(self, tax_id):
+        """Provider id for a tax id, or None if it is unknown."""
+        tax_id = _normalize_tax_id(tax_id)
+        if tax_id not in self._tax_ids:
+            return None
+        return int(self._tax_ids.get_loc(tax_id))
+
+    def lookup(self, tax_id):
+        """Lines (claim_row, specialty, payment) paid to a tax id, by claim row."""
+        provider_id = self.provider_id(tax_id)
+        if provider_id is None:
+            return self.table.lines.iloc[:0][['claim_row', 'specialty', 'payment']]
+        lines = self._line_order[self._offsets[provider_id]:self._offsets[provider_id + 1]]
+        lines = self.table.lines.take(lines)[['claim_row', 'specialty', 'payment']]
+        return lines.sort_values('claim_row', kind='stable')
+
+    def claims(self, tax_id, frame, columns=('claimNumber', 'dateOfloss', 'insurer_name', 'insuredstate')):
+        """Claims of `frame` linked to a tax id, with the provider's specialty and payment."""
+        lines = self.lookup(tax_id)
+        rows = frame.take(lines['claim_row'].to_numpy())
+        columns = [column for column in columns if column in frame]
+        return pd.DataFrame({
+            **{column: rows[column].to_numpy() for column in columns},
+            'specialty': lines['specialty'].to_numpy(),
+            'payment': lines['payment'].to_numpy(dtype='float64'),
+        })
+
+
+def _normalize_tax_id(tax_id):
+    return str(tax_id).strip()
@@ -0,0 +1,327 @@
+"""
+Dataset Registry Module
+=======================
+Named datasets loaded once per process and shared by every reader.
+
+A dashboard process can serve several datasets (e.g. one per line of
+business), configured as DASHBOARD_DATASETS="auto=data/auto.csv;home=...".
+DatasetRegistry loads each one on first use and hands every Streamlit
+session, batch report and background thread the same Dataset: nothing is
+copied per reader. Claim columns are read from the memory-mapped columnar
+cache (see data_loader.py), so their pages are shared with every other
+process on the machine that maps the same cache.
+
+Readers hold a lease on a dataset while they use it. Datasets with no
+leases are evicted, least recently used first, when the registry holds
+more than DASHBOARD_REGISTRY_MB of private memory or more datasets than
+allowed, and are simply loaded again when next asked for. A reloaded
+dataset is a new load (see Dataset.identity), so results cached for the
+earlier one are not served for it.
+
+Datasets that claims were appended to (see incremental.py) are never
+evicted: the appended claims exist only in memory, and reloading the CSV
+would silently drop them.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_PATH, get_derived_cache_path, read_claims
+from dataset import build_dataset, build_streamed_dataset
+from ingest import LOAD_MODE_CHUNKED, get_chunk_rows, get_load_mode
+from sql_backend import QUERY_BACKEND_SQL, duckdb_available, get_query_backend
+from text_index import load_text_index
+
+logger = logging.getLogger(__name__)
+
+
+# Name of the dataset served when DASHBOARD_DATASETS is not set
+DEFAULT_DATASET = 'claims'
+
+# Process-wide registry, see get_shared_registry()
+_shared_registry = None
+_shared_lock = threading.Lock()
+
+
+def get_dataset_paths():
+    """
+    Datasets to serve, by name, from the DASHBOARD_DATASETS variable.
+
+    The variable lists name=path pairs separated by ';'. Without it, the
+    bundled claims CSV is served as DEFAULT_DATASET.
+    """
+    config = os.environ.get('DASHBOARD_DATASETS', '').strip()
+    if not config:
+        return {DEFAULT_DATASET: DATA_PATH}
+    paths = {}
+    for entry in filter(None, (part.strip() for part in config.split(';'))):
+        name, separator, path = entry.partition('=')
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError(f"DASHBOARD_DATASETS entries must look like name=path, got {entry!r}")
+        paths[name.strip()] = Path(path.strip())
+    return paths
+
+
+def get_registry_budget():
+    """Registry memory budget in bytes (DASHBOARD_REGISTRY_MB), or None for no limit."""
+    value = float(os.environ.get('DASHBOARD_REGISTRY_MB', 0))
+    return int(value * 1024 * 1024) if value > 0 else None
+
+
+def load_dataset(data_path):
+    """Dataset for a claims CSV, in the configured load mode and query backend."""
+    sql = get_query_backend() == QUERY_BACKEND_SQL
+    if get_load_mode() == LOAD_MODE_CHUNKED:
+        # Out-of-core: stream the CSV into the cube, keep no claim rows
+        # (the SQL backend scans the Parquet partitions instead)
+        partition_dir = get_derived_cache_path(data_path, 'parts') if sql else None
+        return build_streamed_dataset(data_path, chunk_rows=get_chunk_rows(),
+                                      partition_dir=partition_dir, sql=sql)
+    if sql and not duckdb_available():
+        # The SQLite fallback would be an in-memory copy of every claim
+        logger.warning("DASHBOARD_QUERY_BACKEND=sql needs duckdb in memory mode; using pandas")
+        sql = False
+    df = read_claims(data_path)
+    return build_dataset(df, text_index=load_text_index(data_path, df), sql=sql)
+
+
+def private_bytes(dataset):
+    """
+    Approximate memory a dataset holds that is not shared with other processes.
+
+    Indexes, cubes, sketches and trackers are measured recursively through
+    the objects they hold, and memory reachable more than once (such as the
+    provider table behind the tax id index, or arrays viewed by the frame)
+    is counted once. Read-only numpy arrays are views of the memory-mapped
+    cache and are not counted.
+    """
+    seen = set()
+    return sum(_private_size(value, seen) for name, value in vars(dataset).items()
+               if not name.startswith('_') and name != 'sql')
+
+
+def _private_size(value, seen):
+    """Bytes held by `value` and what it refers to, skipping anything in `seen`."""
+    if value is None or id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        if not value.flags.writeable:
+            return 0
+        base = value
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if base is not value:
+            if id(base) in seen:
+                return 0
+            seen.add(id(base))
+        return base.nbytes
+    if isinstance(value, pd.DataFrame):
+        return sum(_private_size(value[column], seen) for column in value.columns)
+    if isinstance(value, (pd.Series, pd.Index)):
+        if isinstance(value.dtype, pd.CategoricalDtype):
+            return _private_size(value.array.codes, seen) + _private_size(value.array.categories, seen)
+        if value.dtype.kind in 'biufcmM' and not isinstance(value.dtype, pd.DatetimeTZDtype):
+            return _private_size(np.asarray(value.array), seen)
+        return int(value.memory_usage(deep=True) if isinstance(value, pd.Index)
+                   else value.memory_usage(deep=True, index=False))
+    if isinstance(value, pd.Categorical):
+        return _private_size(value.codes, seen) + _private_size(value.categories, seen)
+    if type(value).__module__.startswith('pyarrow') and hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_private_size(key, seen) + _private_size(item, seen)
+                                          for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(_private_size(item, seen) for item in value)
+    if hasattr(value, '__dict__') and not isinstance(value, (type, types.FunctionType, types.ModuleType)):
+        return sys.getsizeof(value) + _private_size(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+def get_shared_registry():
+    """
+    The registry of the configured datasets for this process, created on first use.
+
+    Kept at module level (not in Streamlit's resource cache) so that datasets
+    loaded before the first session, such as by warm-up, are the ones served.
+    """
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            registry = DatasetRegistry(max_bytes=get_registry_budget())
+            for name, path in get_dataset_paths().items():
+                registry.register(name, path)
+            _shared_registry = registry
+        return _shared_registry
+
+
+def _has_appends(entry):
+    """True if claims were appended to an entry's dataset since it was loaded."""
+    return entry.dataset.version > 0
+
+
+@dataclass
+class _Entry:
+    """A registered dataset and its bookkeeping."""
+
+    source: object
+    dataset: object = None
+    refs: int = 0
+    nbytes: int = 0
+    loads: int = 0
+    # Dataset version nbytes was measured at (appends grow the dataset)
+    sized_version: int = 0
+    last_used: float = 0.0
+    # Held while loading, so concurrent first readers load only once
+    loading: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class DatasetLease:
+    """A reader's hold on a registered dataset; release it when done."""
+
+    def __init__(self, registry, name, dataset):
+        self.registry = registry
+        self.name = name
+        self.dataset = dataset
+        self._released = False
+
+    def release(self):
+        """Give up the hold (safe to call more than once)."""
+        if not self._released:
+            self._released = True
+            self.registry.release(self.name)
+
+    def __enter__(self):
+        return self.dataset
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class DatasetRegistry:
+    """Thread-safe set of named datasets with reference counts and eviction."""
+
+    def __init__(self, loader=load_dataset, max_bytes=None, max_datasets=None):
+        # loader(source) builds the Dataset for a registered source
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.max_datasets = max_datasets
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def register(self, name, source):
+        """Make a dataset available under `name` (loaded on first acquire)."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.source != source:
+                if entry.refs:
+                    raise ValueError(f"Dataset {name!r} is in use and cannot be re-registered")
+                del self._entries[name]
+                entry = None
+            if entry is None:
+                self._entries[name] = _Entry(source=source)
+
+    def names(self):
+        """Registered dataset names, in registration order."""
+        with self._lock:
+            return list(self._entries)
+
+    def source(self, name):
+        """What a dataset was registered with (its CSV path, by default)."""
+        with self._lock:
+            return self._entries[name].source
+
+    def acquire(self, name):
+        """
+        Lease on a dataset, loading it if it is not in memory.
+
+        Use as `with registry.acquire(name) as dataset:` or call
+        lease.release() when done.
+        """
+        with self._lock:
+            if name not in self._entries:
+                raise KeyError(f"Unknown dataset {name!r}; registered: {list(self._entries)}")
+            entry = self._entries[name]
+            # Counted before loading so the dataset cannot be evicted under us
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+        try:
+            with entry.loading:
+                if entry.dataset is None:
+                    dataset = self.loader(entry.source)
+                    with self._lock:
+                        entry.dataset = dataset
+                        entry.nbytes = private_bytes(dataset)
+                        entry.sized_version = dataset.version
+                        entry.loads += 1
+        except BaseException:
+            self.release(name)
+            raise
+        self._evict()
+        return DatasetLease(self, name, entry.dataset)
+
+    def release(self, name):
+        """Drop one reference taken by acquire(), then evict if over budget."""
+        with self._lock:
+            entry = self._entries[name]
+            entry.refs = max(entry.refs - 1, 0)
+        self._evict()
+
+    def evict(self, name):
+        """Unload a dataset now if nobody holds it and it has no appends. Returns True if unloaded."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.refs or entry.dataset is None or _has_appends(entry):
+                return False
+            self._unload(entry)
+            return True
+
+    def _evict(self):
+        """Unload unheld datasets, least recently used first, until within budget."""
+        with self._lock:
+            loaded = [entry for entry in self._entries.values() if entry.dataset is not None]
+            for entry in loaded:
+                if entry.sized_version != entry.dataset.version:
+                    entry.nbytes = private_bytes(entry.dataset)
+                    entry.sized_version = entry.dataset.version
+            total = sum(entry.nbytes for entry in loaded)
+            for entry in sorted(loaded, key=lambda entry: entry.last_used):
+                over_bytes = self.max_bytes is not None and total > self.max_bytes
+                over_count = self.max_datasets is not None and len(loaded) > self.max_datasets
+                if not (over_bytes or over_count):
+                    break
+                if entry.refs or _has_appends(entry):
+                    continue
+                total -= entry.nbytes
+                loaded.remove(entry)
+                self._unload(entry)
+
+    def _unload(self, entry):
+        entry.dataset = None
+        entry.nbytes = 0
+        entry.sized_version = 0
+        self.evictions += 1
+
+    def stats(self):
+        """Per-dataset state: loaded, refs, bytes and loads."""
+        with self._lock:
+            return {
+                name: {
+                    'loaded': entry.dataset is not None,
+                    'refs': entry.refs,
+                    'bytes': entry.nbytes,
+                    'loads': entry.loads,
+                }
+                for name, entry in self._entries.items()
+            }
@@ -0,0 +1,140 @@
+"""
+Result Cache Module
+===================
+Process-wide cache for computed dashboard views.
+
+Only load_data used to be cached, so every session recomputed filters, KPIs
+and charts even when another analyst had just looked at the same selection.
+ResultCache keeps recent results keyed on a normalized FilterSpec, shared by
+all sessions in the process, within a fixed memory budget. The least recently
+used entries are evicted first.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import fields, is_dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Default budget, overridable with the DASHBOARD_CACHE_MB environment variable
+DEFAULT_CACHE_MB = 256
+
+
+def get_cache_budget():
+    """Configured result cache budget in bytes."""
+    return int(float(os.environ.get('DASHBOARD_CACHE_MB', DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+
+# Process-wide cache of dashboard views, see get_shared_cache()
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """
+    The view cache shared by everything in this process, created on first use.
+
+    Kept at module level (not in Streamlit's resource cache) so that work
+    done before the first session, such as warm-up, lands in the same cache.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache()
+        return _shared_cache
+
+
+def estimate_size(value):
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(value, pd.DataFrame) else int(usage)
+    if isinstance(getattr(value, 'nbytes', None), int):
+        # Objects that report their own size (e.g. figures.CachedFigure)
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(
+            estimate_size(getattr(value, f.name)) for f in fields(value)
+        )
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache bounded by total estimated size."""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = get_cache_budget() if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Cached value for `key` (marking it recently used), or `default`."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to fit."""
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                # Larger than the whole budget: not worth keeping
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters and usage as a plain dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
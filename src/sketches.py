@@ -0,0 +1,313 @@
+"""
+Sketches Module
+===============
+Mergeable quantile sketches of claim severity.
+
+Sums and means hide the tail of the severity distribution, but exact
+percentiles need the matching claims sorted. Instead, each metric is
+bucketed on a logarithmic scale (as in DDSketch): bucket i holds the values
+in (gamma^(i-1), gamma^i], with gamma = (1 + a) / (1 - a), so any
+percentile read from the bucket counts is within relative accuracy `a` of
+a true value. Bucket counts of disjoint claim sets simply add, so sketches
+are kept per cube cell and the percentiles of any selection come from
+merging the sketches of its cells; new claims only add to the counts.
+
+Values at or below MIN_VALUE (e.g. unpaid claims) are counted in a zero
+bucket. The per-claim loss ratio is paid / claimed and is left out for
+claims with nothing claimed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import FLAG_COLUMNS, flag_label
+
+
+# Metrics sketched per claim, in storage order
+SKETCH_METRICS = ['claimed', 'paid', 'loss_ratio']
+
+METRIC_LABELS = {'claimed': 'Claimed loss', 'paid': 'Paid amount', 'loss_ratio': 'Loss ratio'}
+
+# Percentiles shown as KPIs
+PERCENTILES = [50, 90, 99]
+
+# Relative accuracy of every percentile
+RELATIVE_ACCURACY = 0.01
+
+# Values at or below this are counted as zero
+MIN_VALUE = 1e-4
+
+# Bucket of the values at or below MIN_VALUE (sorts before every other bucket)
+ZERO_BUCKET = np.iinfo(np.int16).min
+
+# Bins of a distribution histogram
+DEFAULT_BINS = 30
+
+_BUCKET_OFFSET = -int(ZERO_BUCKET)
+_BUCKET_SPAN = 2 * _BUCKET_OFFSET
+
+
+def metric_values(df):
+    """Per-claim values of each SKETCH_METRICS metric (NaN where undefined)."""
+    claimed = df['total_claimed_losses'].to_numpy(dtype='float64')
+    paid = df['total_insurance_payment'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(claimed > 0, paid / claimed, np.nan)
+    return {'claimed': claimed, 'paid': paid, 'loss_ratio': ratio}
+
+
+def _gamma(accuracy):
+    return (1 + accuracy) / (1 - accuracy)
+
+
+def bucket_index(values, accuracy=RELATIVE_ACCURACY):
+    """
+    Bucket of each value as int16 (ZERO_BUCKET for small values).
+
+    Also returns a mask of the values that are defined (not NaN).
+    """
+    values = np.asarray(values, dtype='float64')
+    valid = ~np.isnan(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = np.ceil(np.log(np.maximum(values, MIN_VALUE)) / np.log(_gamma(accuracy)))
+    index = np.where(valid & (values > MIN_VALUE), index, ZERO_BUCKET)
+    return index.astype(np.int16), valid
+
+
+def bucket_value(index, accuracy=RELATIVE_ACCURACY):
+    """Representative value of buckets (within `accuracy` of every value in them)."""
+    gamma = _gamma(accuracy)
+    index = np.asarray(index)
+    return np.where(index == ZERO_BUCKET, 0.0, 2 * gamma ** index.astype('float64') / (gamma + 1))
+
+
+def quantiles(buckets, counts, percentiles=PERCENTILES, accuracy=RELATIVE_ACCURACY):
+    """Percentiles from merged bucket counts (buckets ascending); NaN if empty."""
+    total = counts.sum()
+    if total <= 0:
+        return np.full(len(percentiles), np.nan)
+    cumulative = np.cumsum(counts)
+    ranks = np.asarray(percentiles, dtype='float64') / 100 * (total - 1)
+    found = np.minimum(np.searchsorted(cumulative, ranks, side='right'), len(buckets) - 1)
+    return bucket_value(buckets[found], accuracy)
+
+
+def percentile_table(merged, percentiles=PERCENTILES, accuracy=RELATIVE_ACCURACY):
+    """
+    Percentile KPIs as a frame: one row per metric, a 'p<q>' column per percentile.
+
+    `merged` maps each metric to its (buckets, counts).
+    """
+    rows = {
+        metric: quantiles(buckets, counts, percentiles, accuracy)
+        for metric, (buckets, counts) in merged.items()
+    }
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=[f'p{q}' for q in percentiles])
+    table['claims'] = [counts.sum() for _, counts in merged.values()]
+    table.index.name = 'metric'
+    return table
+
+
+def _merge_counts(metric, bucket, count):
+    """Sum counts per (metric, bucket): {metric: (buckets ascending, counts)}."""
+    keys = metric.astype(np.int64) * _BUCKET_SPAN + bucket.astype(np.int64) + _BUCKET_OFFSET
+    totals = np.bincount(keys, weights=count, minlength=len(SKETCH_METRICS) * _BUCKET_SPAN)
+    merged = {}
+    for code, name in enumerate(SKETCH_METRICS):
+        block = totals[code * _BUCKET_SPAN:(code + 1) * _BUCKET_SPAN]
+        present = np.flatnonzero(block)
+        merged[name] = ((present - _BUCKET_OFFSET).astype(np.int16), block[present])
+    return merged
+
+
+def sketch_rows(df, weights=None, accuracy=RELATIVE_ACCURACY):
+    """
+    Merged sketches of a set of claim rows, without sorting them.
+
+    `weights` counts each claim that many times (e.g. sampling weights).
+    """
+    metrics, buckets, counts = [], [], []
+    weights = np.ones(len(df)) if weights is None else np.asarray(weights, dtype='float64')
+    for code, values in enumerate(metric_values(df).values()):
+        bucket, valid = bucket_index(values, accuracy)
+        metrics.append(np.full(int(valid.sum()), code, dtype=np.int8))
+        buckets.append(bucket[valid])
+        counts.append(weights[valid])
+    return _merge_counts(np.concatenate(metrics), np.concatenate(buckets), np.concatenate(counts))
+
+
+def distribution(buckets, counts, groups, labels, bins=DEFAULT_BINS, accuracy=RELATIVE_ACCURACY):
+    """
+    Histogram per group: [label, 'low', 'high', 'count'] with geometric bins.
+
+    Buckets are combined into at most `bins` bins of equal width on the log
+    scale; the zero bucket becomes a bin of its own. `groups` are codes
+    into `labels`.
+    """
+    label_name = getattr(labels, 'name', None) or 'group'
+    if not len(buckets):
+        return pd.DataFrame({label_name: [], 'low': [], 'high': [], 'count': []})
+    zero = buckets == ZERO_BUCKET
+    nonzero = buckets[~zero].astype(np.int64)
+    first = int(nonzero.min()) if len(nonzero) else 0
+    width = max(1, -(-(int(nonzero.max()) - first + 1) // bins)) if len(nonzero) else 1
+    # Bin 0 holds the zero bucket, bins 1.. the log buckets
+    binned = np.where(zero, 0, (buckets.astype(np.int64) - first) // width + 1)
+    n_bins = int(binned.max()) + 1
+
+    totals = np.bincount(groups * n_bins + binned, weights=counts, minlength=len(labels) * n_bins)
+    totals = totals.reshape(len(labels), n_bins)
+    group, bin_code = np.nonzero(totals)
+
+    gamma = _gamma(accuracy)
+    low_bucket = first + (bin_code - 1) * width
+    low = np.where(bin_code == 0, 0.0, gamma ** (low_bucket - 1.0))
+    high = np.where(bin_code == 0, MIN_VALUE, gamma ** (low_bucket + width - 1.0))
+    return pd.DataFrame({
+        label_name: np.asarray(labels)[group],
+        'low': low,
+        'high': high,
+        'count': totals[group, bin_code],
+    })
+
+
+def rows_distribution(df, metric, by, bins=DEFAULT_BINS, weights=None, accuracy=RELATIVE_ACCURACY):
+    """Histogram of one metric per value of column `by`, from claim rows."""
+    bucket, valid = bucket_index(metric_values(df)[metric], accuracy)
+    codes, labels = pd.factorize(_labels(df[by]), sort=True)
+    keep = valid & (codes >= 0)
+    weights = np.ones(len(df)) if weights is None else np.asarray(weights, dtype='float64')
+    return distribution(bucket[keep], weights[keep], codes[keep], pd.Index(labels, name=by), bins, accuracy)
+
+
+def _labels(values):
+    """Flag columns as 'Yes'/'No' labels, other columns unchanged."""
+    if values.name in FLAG_COLUMNS:
+        return values.map(flag_label)
+    return values
+
+
+class CellSketches:
+    """
+    Sketch bucket counts for every cell of a cube.
+
+    Stored as flat entries (cell, metric, bucket, count), one per non-empty
+    bucket of a cell's sketch, sorted by cell. Appends (see extend) add
+    unsorted entries at the end, for buckets that may already have one;
+    readers sum them.
+    """
+
+    def __init__(self, cell, metric, bucket, count, accuracy=RELATIVE_ACCURACY):
+        self.cell = cell
+        self.metric = metric
+        self.bucket = bucket
+        self.count = count
+        self.accuracy = accuracy
+        # Entries when they were last summed per (cell, metric, bucket)
+        self.compacted = len(cell)
+
+    def __len__(self):
+        return len(self.cell)
+
+    def extend(self, other, cell_map):
+        """
+        These sketches plus those of disjoint claims, whose cells map to ours by cell_map.
+
+        The other entries are appended rather than summed into ours (every
+        reader adds counts up anyway), so only they are touched. Once the
+        appended entries outnumber the summed ones, everything is summed
+        again, which keeps the entry count within twice its minimum.
+        """
+        cell = np.concatenate([self.cell, np.asarray(cell_map, dtype=np.int32)[other.cell]])
+        metric = np.concatenate([self.metric, other.metric])
+        bucket = np.concatenate([self.bucket, other.bucket])
+        count = np.concatenate([self.count, other.count.astype(self.count.dtype)])
+        compacted = self.compacted
+        if len(cell) > 2 * compacted:
+            return _sketches_from_entries(cell.astype(np.int64), metric.astype(np.int64), bucket,
+                                          count.astype('float64'), self.accuracy)
+        sketches = CellSketches(cell, metric, bucket, count, self.accuracy)
+        sketches.compacted = compacted
+        return sketches
+
+    def _entries(self, cells):
+        """Mask of the entries belonging to `cells` (a slice of the cube's cells)."""
+        if cells is None:
+            return slice(None)
+        selected = np.zeros(int(self.cell.max()) + 1 if len(self.cell) else 0, dtype=bool)
+        ids = cells.index.to_numpy()
+        selected[ids[ids < len(selected)]] = True
+        return selected[self.cell]
+
+    def merged(self, cells=None):
+        """Sketches of a slice of cells merged: {metric: (buckets, counts)}."""
+        entries = self._entries(cells)
+        return _merge_counts(self.metric[entries], self.bucket[entries],
+                             self.count[entries].astype('float64'))
+
+    def percentiles(self, cells=None, percentiles=PERCENTILES):
+        """Percentile table (see percentile_table) for a slice of cells."""
+        return percentile_table(self.merged(cells), percentiles, self.accuracy)
+
+    def distribution(self, cells, metric, by, bins=DEFAULT_BINS):
+        """Histogram of one metric per value of cell column `by`, for a slice of cells."""
+        entries = self._entries(cells)
+        keep = self.metric[entries] == SKETCH_METRICS.index(metric)
+        cell = self.cell[entries][keep]
+        codes, labels = pd.factorize(_labels(cells[by]), sort=True)
+        group_of_cell = np.full(int(cells.index.max()) + 1 if len(cells) else 0, -1)
+        group_of_cell[cells.index.to_numpy()] = codes
+        groups = group_of_cell[cell]
+        known = groups >= 0
+        return distribution(self.bucket[entries][keep][known],
+                            self.count[entries][keep][known].astype('float64'),
+                            groups[known], pd.Index(labels, name=by), bins, self.accuracy)
+
+
+def build_cell_sketches(df, cell_ids, accuracy=RELATIVE_ACCURACY):
+    """Sketches of claim rows per cube cell; cell_ids gives each row's cell."""
+    cell_ids = np.asarray(cell_ids, dtype=np.int64)
+    cells, metrics, buckets = [], [], []
+    for code, values in enumerate(metric_values(df).values()):
+        bucket, valid = bucket_index(values, accuracy)
+        cells.append(cell_ids[valid])
+        metrics.append(np.full(int(valid.sum()), code, dtype=np.int64))
+        buckets.append(bucket[valid])
+    return _sketches_from_entries(np.concatenate(cells), np.concatenate(metrics),
+                                  np.concatenate(buckets), None, accuracy)
+
+
+def merge_cell_sketches(sketches, cell_maps):
+    """
+    Combine cell sketches of disjoint claims after their cubes were merged.
+
+    cell_maps[k] maps the cell ids of sketches[k] to cells of the merged cube.
+    """
+    sketches = list(sketches)
+    return _sketches_from_entries(
+        np.concatenate([np.asarray(cell_map)[sketch.cell] for sketch, cell_map in zip(sketches, cell_maps)]),
+        np.concatenate([sketch.metric for sketch in sketches]).astype(np.int64),
+        np.concatenate([sketch.bucket for sketch in sketches]),
+        np.concatenate([sketch.count for sketch in sketches]),
+        sketches[0].accuracy,
+    )
+
+
+def _sketches_from_entries(cell, metric, bucket, count, accuracy):
+    """Sum entries with the same (cell, metric, bucket) into a CellSketches."""
+    keys = (cell * len(SKETCH_METRICS) + metric) * _BUCKET_SPAN + bucket.astype(np.int64) + _BUCKET_OFFSET
+    if count is None:
+        keys, count = np.unique(keys, return_counts=True)
+    else:
+        keys, inverse = np.unique(keys, return_inverse=True)
+        count = np.bincount(inverse, weights=count, minlength=len(keys))
+    cell_metric, bucket = np.divmod(keys, _BUCKET_SPAN)
+    cell, metric = np.divmod(cell_metric, len(SKETCH_METRICS))
+    count_dtype = np.int32 if len(count) == 0 or count.max() <= np.iinfo(np.int32).max else np.int64
+    return CellSketches(
+        cell=cell.astype(np.int32),
+        metric=metric.astype(np.int8),
+        bucket=(bucket - _BUCKET_OFFSET).astype(np.int16),
+        count=count.astype(count_dtype),
+        accuracy=accuracy,
+    )
@@ -0,0 +1,276 @@
+"""
+SQL Backend Module
+==================
+Optional embedded SQL engine for filters, KPIs and chart aggregates.
+
+With DASHBOARD_QUERY_BACKEND=sql the claims are registered in an embedded
+engine and each view is answered by pushing the sidebar filters, KPI sums
+and chart group-bys down as SQL, instead of aggregating pandas rows:
+
+    duckdb   the engine in requirements.txt: multi-threaded and columnar,
+             and scans the Parquet partitions of a chunked ingestion in
+             place without loading them into memory
+    sqlite   standard-library fallback when duckdb is not installed: the
+             claims are copied into a single-connection SQLite database,
+             which serializes every query. In memory mode that copy would
+             double the claims' memory, so registry.load_dataset only uses
+             SQLite for chunked ingestion (where it lives on disk) and
+             otherwise falls back to the pandas path
+
+Results have exactly the shapes the pandas path produces (a KPIResult and
+the CHART_DATA_KEYS frames), so the pandas path remains the fallback for
+anything the backend is not configured for.
+
+The engine is shared by every snapshot of a dataset, so each row records
+the dataset version that added it (VERSION_COLUMN) and queries pass their
+snapshot's version: rows appended after the snapshot was taken are not
+seen, just as they are not in the snapshot's frame and cube.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pandas as pd
+
+from kpis import KPIResult
+from schema import FLAG_COLUMNS, flag_values
+from timeseries import period_labels
+
+
+QUERY_BACKEND_PANDAS = 'pandas'
+QUERY_BACKEND_SQL = 'sql'
+
+ENGINE_DUCKDB = 'duckdb'
+ENGINE_SQLITE = 'sqlite'
+
+TABLE_NAME = 'claims'
+
+# Dataset version that added each row (0 for the rows loaded initially)
+VERSION_COLUMN = '_version'
+
+# Columns the dashboard queries (flags stored as 0/1); nothing else is loaded
+QUERY_COLUMNS = [
+    'dateOfloss', 'insurer_name', 'insuredstate', 'natureOfincident',
+    'injuryinvolved', 'lawsuit_filed', 'total_claimed_losses', 'total_insurance_payment',
+]
+
+# Integer month key (year * 12 + month - 1) in each dialect
+_MONTH_KEY = {
+    ENGINE_DUCKDB: 'year("dateOfloss") * 12 + month("dateOfloss") - 1',
+    ENGINE_SQLITE: ('CAST(substr("dateOfloss", 1, 4) AS INTEGER) * 12 '
+                    '+ CAST(substr("dateOfloss", 6, 2) AS INTEGER) - 1'),
+}
+
+
+def get_query_backend():
+    """Which query backend to use, from the DASHBOARD_QUERY_BACKEND variable."""
+    return os.environ.get('DASHBOARD_QUERY_BACKEND', QUERY_BACKEND_PANDAS).lower()
+
+
+def duckdb_available():
+    """True if the optional duckdb package is installed."""
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class SQLBackend:
+    """Claims registered in an embedded SQL engine."""
+
+    def __init__(self, connection, engine, append_table=TABLE_NAME):
+        self.connection = connection
+        self.engine = engine
+        # Table that appended claims go to (queries always read TABLE_NAME)
+        self.append_table = append_table
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, engine=None):
+        """Copy the query columns of a claims frame into the engine."""
+        engine = engine or (ENGINE_DUCKDB if duckdb_available() else ENGINE_SQLITE)
+        if engine == ENGINE_DUCKDB:
+            import duckdb
+            connection = duckdb.connect()
+            # Registered frames are only visible to this connection, not to
+            # the per-query cursors, so load them into a (compressed) table
+            connection.register('claims_frame', _query_frame(df, engine))
+            connection.execute(f"CREATE TABLE {TABLE_NAME} AS SELECT * FROM claims_frame")
+            connection.unregister('claims_frame')
+        else:
+            connection = sqlite3.connect(':memory:', check_same_thread=False)
+            _query_frame(df, engine).to_sql(TABLE_NAME, connection, index=False)
+        return cls(connection, engine)
+
+    @classmethod
+    def from_partitions(cls, paths, engine=None, database=':memory:'):
+        """
+        Register Parquet partitions written by ingest.ingest_csv.
+
+        DuckDB queries the files directly. SQLite loads them one partition at
+        a time into `database`, so pass a file path to stay out of memory.
+        """
+        paths = [str(path) for path in paths]
+        engine = engine or (ENGINE_DUCKDB if duckdb_available() else ENGINE_SQLITE)
+        if engine == ENGINE_DUCKDB:
+            import duckdb
+            connection = duckdb.connect()
+            files = ', '.join("'" + path.replace("'", "''") + "'" for path in paths)
+            columns = ', '.join(
+                f'CAST("{column}" AS INTEGER) AS "{column}"' if column in FLAG_COLUMNS else f'"{column}"'
+                for column in QUERY_COLUMNS
+            ) + f', 0 AS "{VERSION_COLUMN}"'
+            parts = f"SELECT {columns} FROM read_parquet([{files}])"
+            # Parquet files are read-only: appended claims go to a table
+            # that the view unions with them
+            connection.execute(f"CREATE TABLE appended AS {parts} LIMIT 0")
+            connection.execute(f"CREATE VIEW {TABLE_NAME} AS {parts} UNION ALL SELECT * FROM appended")
+            return cls(connection, engine, append_table='appended')
+        else:
+            connection = sqlite3.connect(database, check_same_thread=False)
+            connection.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+            for path in paths:
+                chunk = pd.read_parquet(path, columns=QUERY_COLUMNS)
+                _query_frame(chunk, engine).to_sql(TABLE_NAME, connection, index=False, if_exists='append')
+            connection.commit()
+        return cls(connection, engine)
+
+    def append(self, delta, version):
+        """Add the claims of a typed delta frame, as added by dataset version `version`."""
+        with self._lock:
+            if self.engine == ENGINE_DUCKDB:
+                self.connection.register('delta_frame', _query_frame(delta, self.engine, version))
+                try:
+                    self.connection.execute(
+                        f"INSERT INTO {self.append_table} BY NAME SELECT * FROM delta_frame"
+                    )
+                finally:
+                    self.connection.unregister('delta_frame')
+            else:
+                _query_frame(delta, self.engine, version).to_sql(self.append_table, self.connection,
+                                                                 index=False, if_exists='append')
+                self.connection.commit()
+
+    def discard(self, version):
+        """Delete the claims added by dataset version `version` (an append that failed)."""
+        with self._lock:
+            self.connection.execute(f'DELETE FROM {self.append_table} WHERE "{VERSION_COLUMN}" = ?', [version])
+            if self.engine == ENGINE_SQLITE:
+                self.connection.commit()
+
+    def _query(self, sql, params):
+        """Run a query and return a DataFrame."""
+        if self.engine == ENGINE_DUCKDB:
+            # A cursor is a separate connection, safe to use from this thread
+            cursor = self.connection.cursor()
+            try:
+                return cursor.execute(sql, params).df()
+            finally:
+                cursor.close()
+        with self._lock:
+            return pd.read_sql_query(sql, self.connection, params=params)
+
+    def where(self, spec, version=None):
+        """
+        SQL WHERE clause and parameters for a FilterSpec (text excluded).
+
+        With a dataset version, rows appended by later versions are left out.
+        """
+        clauses, params = [], []
+        if version is not None:
+            clauses.append(f'"{VERSION_COLUMN}" <= ?')
+            params.append(version)
+        if len(spec.date_range) == 2:
+            start_date, end_date = spec.date_range
+            clauses.append('"dateOfloss" >= ? AND "dateOfloss" < ?')
+            params += [_sql_date(start_date, self.engine),
+                       _sql_date(end_date + timedelta(days=1), self.engine)]
+        for column, selected in (('insurer_name', spec.insurers), ('insuredstate', spec.states),
+                                 ('natureOfincident', spec.incidents)):
+            if selected:
+                clauses.append(f'"{column}" IN ({", ".join("?" * len(selected))})')
+                params += list(selected)
+        if spec.injury != "All":
+            clauses.append('"injuryinvolved" = ?')
+            params.append(1 if spec.injury == "Yes" else 0)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def kpis(self, spec, version=None):
+        """KPIResult for a FilterSpec, from one aggregate query."""
+        where, params = self.where(spec, version)
+        row = self._query(f"""
+            SELECT count(*) AS total_claims,
+                   coalesce(sum("total_claimed_losses"), 0) AS total_claimed,
+                   coalesce(sum("total_insurance_payment"), 0) AS total_paid,
+                   coalesce(sum("injuryinvolved"), 0) AS injury_count,
+                   coalesce(sum("lawsuit_filed"), 0) AS lawsuit_count
+            FROM {TABLE_NAME}{where}
+        """, params).iloc[0]
+        return KPIResult.from_sums(row)
+
+    def chart_data(self, spec, version=None):
+        """All dashboard chart aggregates for a FilterSpec, grouped in SQL."""
+        where, params = self.where(spec, version)
+
+        def counts(column):
+            data = self._query(
+                f'SELECT "{column}", count(*) AS count FROM {TABLE_NAME}{where} '
+                f'GROUP BY "{column}" ORDER BY "{column}"', params
+            )
+            return data.dropna(subset=[column]).reset_index(drop=True)
+
+        dated = where + (' AND ' if where else ' WHERE ') + '"dateOfloss" IS NOT NULL'
+        months = self._query(
+            f'SELECT {_MONTH_KEY[self.engine]} AS month, count(*) AS count '
+            f'FROM {TABLE_NAME}{dated} GROUP BY 1 ORDER BY 1', params
+        )
+        by_month = pd.DataFrame({
+            'month': period_labels(months['month'].to_numpy(dtype='int64'), 'month'),
+            'count': months['count'].to_numpy(dtype='int64'),
+        })
+
+        payments = self._query(
+            f'SELECT "insurer_name", sum("total_claimed_losses") AS total_claimed_losses, '
+            f'sum("total_insurance_payment") AS total_insurance_payment '
+            f'FROM {TABLE_NAME}{where} GROUP BY "insurer_name" ORDER BY "insurer_name"', params
+        )
+
+        by_injury = counts('injuryinvolved')
+        by_injury['injuryinvolved'] = by_injury['injuryinvolved'].astype(bool)
+        return {
+            'by_insurer': counts('insurer_name'),
+            'by_incident': counts('natureOfincident'),
+            'by_month': by_month,
+            'by_state': counts('insuredstate'),
+            'payments': payments.dropna(subset=['insurer_name']).reset_index(drop=True),
+            'by_injury': by_injury,
+        }
+
+
+def _sql_date(value, engine):
+    # SQLite stores timestamps as ISO text, which compares correctly as text
+    if engine == ENGINE_SQLITE:
+        return value.isoformat()
+    return pd.Timestamp(value).to_pydatetime()
+
+
+def _query_frame(df, engine, version=0):
+    """
+    Query columns of a claims frame in types the engine stores natively.
+
+    Flags become 0/1 integers whether the frame is typed or raw ('Yes'/'No'),
+    with missing flags as NULL so that they match neither value.
+    Rows are stamped with the dataset version adding them.
+    """
+    columns = [column for column in QUERY_COLUMNS if column in df]
+    converted = {column: pd.Series(flag_values(df[column]), index=df.index).astype('Int64')
+                 for column in FLAG_COLUMNS if column in df}
+    if engine == ENGINE_SQLITE:
+        for column in columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                converted[column] = df[column].astype(object)
+    converted[VERSION_COLUMN] = version
+    return df[columns].assign(**converted)
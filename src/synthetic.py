@@ -0,0 +1,218 @@
+"""
+Synthetic Data Module
+=====================
+Seeded generator of claims that follow the real CSV schema.
+
+The bundled CSV only has 1,000 rows, which says nothing about how the
+dashboard scales. generate_claims() produces any number of rows with the same
+columns and value formats: insurers, states and incident types, the eight
+providers_* specialty triplets and heavy-tailed payment amounts. Rows are
+generated in fixed-size blocks seeded by (seed, block number), so the same
+seed always yields the same data, whether held in memory or written to CSV
+block by block for scales that do not fit in memory.
+"""
+
+import numpy as np
+import pandas as pd
+
+from schema import PROVIDER_PREFIX
+
+
+# Rows generated per block (also the CSV write granularity)
+BLOCK_ROWS = 100_000
+
+INSURERS = [
+    'StateFarm', 'Geico', 'Progressive', 'Allstate', 'USAA', 'Liberty Mutual',
+    'Farmers', 'Nationwide', 'Travelers', 'American Family', 'Erie', 'Auto-Owners',
+]
+INSURER_WEIGHTS = [18, 14, 13, 10, 6, 5, 5, 4, 3, 3, 2, 2]
+
+STATES = [
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL',
+    'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT',
+    'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI',
+    'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+]
+
+INCIDENTS = ['Single vehicle accident', 'Hit and run', 'Collision', 'Rear-end collision']
+
+VEHICLE_DAMAGES = [
+    'Fender damage', 'Windshield crack', 'Rear-end collision', 'Front-end collision', 'Side impact',
+]
+
+INJURIES = [
+    'Minor cuts', 'Fracture', 'Other sprain/strain', 'Knee injury', 'Disk injury',
+    'Bruises', 'Neck sprain/strain', 'Shoulder injury',
+]
+
+# Specialty names as they appear in the providers_<specialty> columns
+PROVIDER_SPECIALTIES = [
+    'alternative_medicine', 'chiropractor', 'diagnostic_radiologist', 'ER physician',
+    'general_practitioner', 'neurologist', 'orthopedist', 'physical_therapist',
+]
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+    'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+    'Thomas', 'Sarah', 'Charles', 'Karen', 'Denise', 'Kristina', 'Krista', 'Brian',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+    'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Hill', 'Walsh', 'Baldwin',
+]
+CITY_PREFIXES = ['Lake', 'East', 'West', 'North', 'South', 'New', 'Port', 'Fort', '']
+CITY_SUFFIXES = ['bury', 'shire', 'ville', 'mouth', 'stad', 'ton', 'land', 'field']
+COMPANY_SUFFIXES = ['Inc', 'LLC', 'Group', 'and Sons', 'PLC', 'Ltd']
+STREET_TYPES = ['Mill', 'Orchard', 'Parks', 'Street', 'Avenue', 'Road', 'Lane']
+WORDS = [
+    'airbag', 'bumper', 'intersection', 'rain', 'highway', 'parking', 'lot', 'deer',
+    'brake', 'signal', 'merge', 'skid', 'ice', 'glass', 'door', 'hood', 'night',
+    'driver', 'passenger', 'police', 'report', 'tow', 'speed', 'turn', 'lane',
+    'mirror', 'tire', 'fog', 'truck', 'cyclist', 'pedestrian', 'rear', 'front',
+]
+
+# Pool sizes for generated free-text values
+_SENTENCE_POOL = 5_000
+_ADDRESS_POOL = 20_000
+
+
+def iter_synthetic_blocks(n_rows, seed=0, block_rows=BLOCK_ROWS):
+    """Yield raw claim frames of at most block_rows rows, n_rows in total."""
+    pools = _value_pools(n_rows, seed)
+    for block, start in enumerate(range(0, n_rows, block_rows)):
+        size = min(block_rows, n_rows - start)
+        rng = np.random.default_rng([seed, block])
+        yield _generate_block(rng, pools, start, size)
+
+
+def generate_claims(n_rows, seed=0):
+    """Raw claims frame (as read from the CSV) with n_rows seeded rows."""
+    blocks = list(iter_synthetic_blocks(n_rows, seed))
+    if not blocks:
+        return _generate_block(np.random.default_rng(seed), _value_pools(0, seed), 0, 0)
+    return pd.concat(blocks, ignore_index=True)
+
+
+def write_synthetic_csv(path, n_rows, seed=0):
+    """Write n_rows seeded claims to a CSV, one block at a time."""
+    for number, block in enumerate(iter_synthetic_blocks(n_rows, seed)):
+        block.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+    return path
+
+
+def _value_pools(n_rows, seed):
+    """
+    Pools of names, cities, providers and text that rows draw from.
+
+    Pools grow with the number of rows so high-cardinality columns keep a
+    realistic number of distinct values at every scale. Rows pick from pools
+    by position, which keeps per-row string work out of the hot loop.
+    """
+    rng = np.random.default_rng([seed, 2**31])
+
+    def combine(*parts, size, sep=' '):
+        picked = [rng.choice(part, size) for part in parts]
+        return np.array([sep.join(p for p in values if p).strip() for values in zip(*picked)])
+
+    n_names = max(1_000, min(n_rows // 3, 500_000))
+    initials = [f"{letter}." for letter in 'ABCDEFGHIJKLMNOPRSTW'] + [''] * 20
+    insured_names = combine(FIRST_NAMES, initials, LAST_NAMES, size=n_names)
+
+    n_cities = max(50, min(n_rows // 20, 200_000))
+    cities = np.char.add(combine(CITY_PREFIXES, LAST_NAMES, size=n_cities),
+                         rng.choice(CITY_SUFFIXES, n_cities))
+
+    providers = {}
+    n_providers = max(50, min(n_rows // 200, 100_000))
+    for number, specialty in enumerate(PROVIDER_SPECIALTIES):
+        names = combine(LAST_NAMES, LAST_NAMES, COMPANY_SUFFIXES, size=n_providers)
+        # Tax ids are unique per provider: a specialty prefix plus a serial
+        serials = rng.choice(10_000_000, n_providers, replace=False)
+        tax_ids = np.char.add(f"{10 + number * 11:02d}-", _zero_pad(serials, 7))
+        # Provider popularity rank, fixed across blocks
+        ranking = rng.permutation(n_providers)
+        providers[specialty] = (names, tax_ids, ranking)
+
+    sentences = np.array([
+        ' '.join(rng.choice(WORDS, rng.integers(4, 10))).capitalize() + '.'
+        for _ in range(_SENTENCE_POOL)
+    ])
+    streets = combine(LAST_NAMES, STREET_TYPES, size=_ADDRESS_POOL)
+    numbers = rng.integers(1, 9999, _ADDRESS_POOL).astype(str)
+    addresses = np.char.add(np.char.add(numbers, ' '), streets)
+    addresses = np.char.add(np.char.add(addresses, ', '), rng.choice(cities, _ADDRESS_POOL))
+
+    return {
+        'insured_names': insured_names,
+        'cities': cities,
+        'providers': providers,
+        'sentences': sentences,
+        'addresses': addresses,
+    }
+
+
+def _zero_pad(values, width):
+    """Zero-padded decimal strings for non-negative integers, vectorized."""
+    padded = (np.asarray(values, dtype=np.int64) + 10 ** width).astype(f'U{width + 1}')
+    return padded.view('U1').reshape(-1, width + 1)[:, 1:].copy().view(f'U{width}').ravel()
+
+
+def _hex_ids(ids):
+    """8-digit lowercase hex strings for uint32 ids, vectorized."""
+    digits = ids.astype('>u4').tobytes().hex().encode()
+    return np.frombuffer(digits, dtype='S8').astype('U8')
+
+
+def _generate_block(rng, pools, start, size):
+    """One block of raw claim rows starting at row number `start`."""
+    def pick(values, weights=None):
+        p = None if weights is None else np.asarray(weights) / np.sum(weights)
+        return rng.choice(values, size, p=p)
+
+    injury = rng.random(size) < 0.5
+    lawsuit = rng.random(size) < 0.45
+    days = rng.integers(0, 6 * 365, size)
+    dates = (np.datetime64('2020-01-01') + days.astype('timedelta64[D]')).astype(str)
+
+    # Bijective scramble of the row number: unique 8-hex-digit claim numbers
+    ids = ((np.arange(start, start + size, dtype=np.uint64) * np.uint64(2654435761))
+           % np.uint64(2**32))
+
+    df = pd.DataFrame({
+        'insurer_name': pick(INSURERS, INSURER_WEIGHTS),
+        'insuredname': pick(pools['insured_names']),
+        'insuredCity': pick(pools['cities']),
+        'insuredstate': pick(STATES),
+        'insuredpostalCode': _zero_pad(rng.integers(501, 99950, size), 5),
+        'natureOfincident': pick(INCIDENTS),
+        'dateOfloss': dates,
+        'injuryinvolved': np.where(injury, 'Yes', 'No'),
+        'loss_description': pick(pools['sentences']),
+        'location_of_loss': pick(pools['addresses']),
+        'claimNumber': _hex_ids(ids),
+        'vehicle_damages_1': pick(VEHICLE_DAMAGES),
+        'vehicle_damages_2': np.where(rng.random(size) < 0.5, pick(VEHICLE_DAMAGES), None),
+        'injury_description': np.where(injury, pick(INJURIES), None),
+        'lawsuit_filed': np.where(lawsuit, 'Yes', 'No'),
+    })
+
+    # Roughly half the claims see each specialty; payments are lognormal
+    provider_total = np.zeros(size)
+    for specialty in PROVIDER_SPECIALTIES:
+        names, tax_ids, ranking = pools['providers'][specialty]
+        # A few providers see far more claims than the rest
+        provider = ranking[np.minimum(rng.zipf(1.3, size) - 1, len(names) - 1)]
+        used = rng.random(size) < 0.5
+        payment = np.where(used, np.round(rng.lognormal(7.2, 0.8, size), 2), 0.0)
+        column = f"{PROVIDER_PREFIX}{specialty}"
+        df[column] = np.where(used, names[provider], None)
+        df[f"{column}_tax_id"] = np.where(used, tax_ids[provider], None)
+        df[f"{column}_payment"] = payment
+        provider_total += payment
+
+    vehicle = rng.lognormal(8.5, 0.7, size)
+    claimed = np.round(provider_total + vehicle, 2)
+    df['total_claimed_losses'] = claimed
+    df['total_insurance_payment'] = np.round(claimed * rng.uniform(0.5, 0.95, size), 2)
+    return df
@@ -0,0 +1,214 @@
+"""
+Text Index Module
+=================
+Inverted keyword index over the claims' free-text columns.
+
+Each term (a lowercase run of letters and digits) maps to the sorted row
+positions of the claims whose loss description, injury description or
+location contains it. Keyword queries then intersect or union a few short
+posting lists instead of scanning every description:
+
+    airbag deer          claims mentioning both words
+    airbag OR deer       claims mentioning either
+    airbag rain OR fog   (airbag AND rain) OR fog
+
+Postings are stored in CSR form: one array of row positions grouped by term,
+plus each term's offset into it. The index is saved next to the columnar
+cache and reused while the CSV is unchanged.
+"""
+
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_loader import get_cache_key, get_derived_cache_path
+
+logger = logging.getLogger(__name__)
+
+TEXT_SEARCH_COLUMNS = ['loss_description', 'injury_description', 'location_of_loss']
+
+# Bump when tokenization or the saved layout changes
+TEXT_INDEX_VERSION = 1
+
+OR_OPERATOR = 'OR'
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Distinct lowercase terms of a text, in order of appearance."""
+    return list(dict.fromkeys(_TOKEN.findall(str(text).lower())))
+
+
+def parse_query(query):
+    """
+    Split a keyword query into OR groups of AND terms.
+
+    "airbag rain OR fog" -> [['airbag', 'rain'], ['fog']]
+    """
+    groups = []
+    for part in re.split(rf'\s+{OR_OPERATOR}\s+|\|', f" {query} "):
+        terms = tokenize(part)
+        if terms:
+            groups.append(terms)
+    return groups
+
+
+def normalize_query(query):
+    """Canonical form of a query, so equivalent queries share cached views."""
+    return f' {OR_OPERATOR} '.join(' '.join(sorted(terms)) for terms in parse_query(query or ''))
+
+
+def _row_dtype(n_rows):
+    return np.int32 if n_rows <= np.iinfo(np.int32).max else np.int64
+
+
+def _term_rows(series, term_ids, row_offset=0):
+    """
+    (term id, row) pairs for one text column.
+
+    Distinct texts are tokenized once each; their terms are then expanded to
+    every row holding that text with NumPy, without a per-row loop.
+    """
+    codes, uniques = pd.factorize(series)
+    text_terms, term_counts = [], []
+    for text in uniques:
+        ids = [term_ids.setdefault(term, len(term_ids)) for term in tokenize(text)]
+        text_terms.extend(ids)
+        term_counts.append(len(ids))
+    text_terms = np.asarray(text_terms, dtype=np.int64)
+    term_counts = np.asarray(term_counts, dtype=np.int64)
+    term_starts = np.concatenate([[0], np.cumsum(term_counts)[:-1]]) if len(uniques) else term_counts
+
+    rows = np.flatnonzero(codes >= 0)
+    codes = codes[rows]
+    per_row = term_counts[codes]
+    # Each row repeats its text's term list
+    row_index = np.repeat(rows, per_row)
+    within = np.arange(per_row.sum()) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+    terms = text_terms[np.repeat(term_starts[codes], per_row) + within]
+    return terms, row_index + row_offset
+
+
+class TextIndex:
+    """Term -> sorted row positions over TEXT_SEARCH_COLUMNS."""
+
+    def __init__(self, terms, offsets, postings, n_rows):
+        self.terms = pd.Index(terms, dtype=object)
+        self.offsets = offsets
+        self.postings = postings
+        self.n_rows = n_rows
+
+    @classmethod
+    def build(cls, df, row_offset=0, terms=None):
+        """Index the text columns of a claims frame."""
+        term_ids = {term: i for i, term in enumerate(terms if terms is not None else [])}
+        pairs_terms, pairs_rows = [], []
+        for column in TEXT_SEARCH_COLUMNS:
+            if column in df:
+                column_terms, column_rows = _term_rows(df[column], term_ids, row_offset)
+                pairs_terms.append(column_terms)
+                pairs_rows.append(column_rows)
+        n_rows = row_offset + len(df)
+        terms = list(term_ids)
+        if not pairs_terms:
+            return cls(terms, np.zeros(len(terms) + 1, dtype=np.int64),
+                       np.array([], dtype=_row_dtype(n_rows)), n_rows)
+        return cls._from_pairs(terms, np.concatenate(pairs_terms), np.concatenate(pairs_rows), n_rows)
+
+    @classmethod
+    def _from_pairs(cls, terms, pair_terms, pair_rows, n_rows):
+        # One sort on a combined key groups by term with rows ascending
+        keys = np.unique(pair_terms.astype(np.int64) * max(n_rows, 1) + pair_rows)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // max(n_rows, 1), minlength=len(terms)), out=offsets[1:])
+        postings = (keys % max(n_rows, 1)).astype(_row_dtype(n_rows))
+        return cls(terms, offsets, postings, n_rows)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def rows(self, term):
+        """Sorted row positions of the claims containing a term."""
+        if term not in self.terms:
+            return self.postings[:0]
+        i = self.terms.get_loc(term)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def search(self, query):
+        """Sorted row positions matching a keyword query (see parse_query)."""
+        matches = []
+        for group in parse_query(query):
+            # Intersect the shortest lists first so the work shrinks quickly
+            lists = sorted((self.rows(term) for term in group), key=len)
+            result = lists[0]
+            for rows in lists[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, rows, assume_unique=True)
+            matches.append(result)
+        if not matches:
+            return self.postings[:0]
+        if len(matches) == 1:
+            return matches[0]
+        return np.unique(np.concatenate(matches))
+
+    def extend(self, delta):
+        """
+        New index for this one plus the claims of `delta`, appended after it.
+
+        Only the delta's postings are sorted. Their rows follow every
+        existing row, so each term's new postings go after its existing
+        run and just the offsets are recomputed. Inserting them copies the
+        existing postings once.
+        """
+        added = TextIndex.build(delta, row_offset=self.n_rows, terms=list(self.terms))
+        offsets = np.concatenate([self.offsets, np.full(len(added.terms) - len(self.terms), self.offsets[-1])])
+        new_terms = np.repeat(np.arange(len(added.terms), dtype=np.int64), np.diff(added.offsets))
+        postings = np.insert(self.postings.astype(_row_dtype(added.n_rows)), offsets[new_terms + 1],
+                             added.postings)
+        return TextIndex(list(added.terms), offsets + added.offsets, postings, added.n_rows)
+
+    def save(self, path, key):
+        """Write the index to an .npz file tagged with a cache key."""
+        tmp_path = path.with_name(path.name + '.tmp.npz')
+        np.savez(tmp_path, terms=np.asarray(list(self.terms), dtype=str), offsets=self.offsets,
+                 postings=self.postings, n_rows=self.n_rows, key=f"{TEXT_INDEX_VERSION}:{key}")
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path, key):
+        """Read a saved index, or None if it is missing or for other data."""
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                if str(saved['key']) != f"{TEXT_INDEX_VERSION}:{key}":
+                    return None
+                return cls(saved['terms'].tolist(), saved['offsets'], saved['postings'],
+                           int(saved['n_rows']))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def load_text_index(data_path, df):
+    """
+    Text index of a frame read with data_loader.read_claims(data_path).
+
+    Reuses the index saved beside the columnar cache while the CSV is
+    unchanged, otherwise builds it and saves it there.
+    """
+    key = get_cache_key(data_path)
+    path = get_derived_cache_path(data_path, 'text.npz')
+    if key is not None:
+        index = TextIndex.load(path, key)
+        if index is not None and index.n_rows == len(df):
+            return index
+
+    index = TextIndex.build(df)
+    if key is not None:
+        try:
+            index.save(path, key)
+        except OSError:
+            logger.info("Could not save the text index to %s", path)
+    return index
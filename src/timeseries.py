@@ -0,0 +1,177 @@
+"""
+Time Series Module
+==================
+Claim counts and payment totals over time at any granularity.
+
+Integer period keys for every claim are computed once per dataset, for each
+granularity:
+
+    day      days since 1970-01-01
+    week     weeks since the Monday before 1970-01-01 (weeks start on Monday)
+    month    year * 12 + month - 1 (the same keys as the cube's cells)
+    quarter  year * 4 + quarter - 1
+    year     the year
+
+A series is then one np.bincount over the keys of the selected rows, with
+no frame copies, Period objects or string grouping. Series are dense (every
+period between the first and last, zero-filled), so rolling windows and
+year-over-year comparisons are plain array shifts.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+GRANULARITIES = ['day', 'week', 'month', 'quarter', 'year']
+
+# Periods per year, for year-over-year comparisons (weeks compare 52 back)
+PERIODS_PER_YEAR = {'day': 365, 'week': 52, 'month': 12, 'quarter': 4, 'year': 1}
+
+# Rolling window lengths that read naturally at each granularity
+DEFAULT_ROLLING_WINDOWS = {'day': 7, 'week': 4, 'month': 3, 'quarter': 4, 'year': 3}
+
+# Key of claims without a date of loss
+MISSING_PERIOD = np.iinfo(np.int32).min
+
+# 1970-01-01 was a Thursday: shift by 3 days so weeks start on Monday
+_WEEK_SHIFT = 3
+
+
+def period_keys(dates, granularity):
+    """Integer period keys for dates; MISSING_PERIOD where missing."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity!r}; use one of {GRANULARITIES}")
+    values = pd.DatetimeIndex(dates).to_numpy(dtype='datetime64[D]')
+    missing = np.isnat(values)
+    if granularity == 'day':
+        keys = values.astype(np.int64)
+    elif granularity == 'week':
+        keys = (values.astype(np.int64) + _WEEK_SHIFT) // 7
+    else:
+        # Months since 1970-01 -> absolute year * 12 + month - 1
+        months = values.astype('datetime64[M]').astype(np.int64) + 1970 * 12
+        keys = {'month': months, 'quarter': months // 3, 'year': months // 12}[granularity]
+    keys = np.where(missing, MISSING_PERIOD, keys)
+    return keys.astype(np.int32)
+
+
+def period_start(keys, granularity):
+    """First day of each period, as datetime64[D]."""
+    keys = np.asarray(keys, dtype=np.int64)
+    if granularity == 'day':
+        return keys.astype('datetime64[D]')
+    if granularity == 'week':
+        return (keys * 7 - _WEEK_SHIFT).astype('datetime64[D]')
+    months = {'month': keys, 'quarter': keys * 3, 'year': keys * 12}[granularity]
+    return (months - 1970 * 12).astype('datetime64[M]').astype('datetime64[D]')
+
+
+def period_labels(keys, granularity):
+    """Display labels: dates for days and weeks, 'YYYY-MM', 'YYYY-Qn' or 'YYYY'."""
+    keys = np.asarray(keys, dtype=np.int64)
+    if granularity in ('day', 'week'):
+        return period_start(keys, granularity).astype(str)
+    if granularity == 'month':
+        return period_start(keys, granularity).astype('datetime64[M]').astype(str)
+    if granularity == 'quarter':
+        return np.char.add(np.char.add((keys // 4).astype(str), '-Q'), (keys % 4 + 1).astype(str))
+    return keys.astype(str)
+
+
+def previous_year_keys(keys, granularity):
+    """Key of the same period one year earlier."""
+    keys = np.asarray(keys, dtype=np.int64)
+    if granularity != 'day':
+        return keys - PERIODS_PER_YEAR[granularity]
+    # Same calendar day last year (29 February falls back to the 28th)
+    days = keys.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    day_of_month = (days - months.astype('datetime64[D]')).astype(np.int64)
+    last_year = months - np.timedelta64(12, 'M')
+    month_length = ((last_year + np.timedelta64(1, 'M')).astype('datetime64[D]')
+                    - last_year.astype('datetime64[D]')).astype(np.int64)
+    return (last_year.astype('datetime64[D]').astype(np.int64)
+            + np.minimum(day_of_month, month_length - 1))
+
+
+class TimeSeriesIndex:
+    """Per-claim period keys at every granularity, plus the values summed."""
+
+    def __init__(self, df):
+        self.keys = {granularity: period_keys(df['dateOfloss'], granularity)
+                     for granularity in GRANULARITIES}
+        self.claimed = df['total_claimed_losses'].to_numpy(dtype='float64')
+        self.paid = df['total_insurance_payment'].to_numpy(dtype='float64')
+
+    def __len__(self):
+        return len(self.claimed)
+
+    def extend(self, delta):
+        """New index for this one plus the claims of `delta`, appended after it (the arrays are copied)."""
+        added = TimeSeriesIndex(delta)
+        index = TimeSeriesIndex.__new__(TimeSeriesIndex)
+        index.keys = {granularity: np.concatenate([self.keys[granularity], added.keys[granularity]])
+                      for granularity in GRANULARITIES}
+        index.claimed = np.concatenate([self.claimed, added.claimed])
+        index.paid = np.concatenate([self.paid, added.paid])
+        return index
+
+    def series(self, granularity='month', positions=None):
+        """
+        Claims, claimed and paid totals per period for the selected rows.
+
+        Returns a dense frame [period, label, count, claimed, paid] covering
+        every period from the first to the last dated claim.
+        """
+        keys = self.keys[granularity]
+        claimed, paid = self.claimed, self.paid
+        if positions is not None:
+            keys, claimed, paid = keys[positions], claimed[positions], paid[positions]
+        dated = keys != MISSING_PERIOD
+        if not dated.all():
+            keys, claimed, paid = keys[dated], claimed[dated], paid[dated]
+        if not len(keys):
+            return pd.DataFrame({'period': np.array([], dtype=np.int64), 'label': [],
+                                 'count': np.array([], dtype=np.int64), 'claimed': [], 'paid': []})
+
+        first = int(keys.min())
+        offsets = keys - first
+        size = int(keys.max()) - first + 1
+        periods = np.arange(first, first + size, dtype=np.int64)
+        return pd.DataFrame({
+            'period': periods,
+            'label': period_labels(periods, granularity),
+            'count': np.bincount(offsets, minlength=size),
+            'claimed': np.bincount(offsets, weights=claimed, minlength=size),
+            'paid': np.bincount(offsets, weights=paid, minlength=size),
+        })
+
+
+def add_rolling(data, window, columns=('count',)):
+    """Add '<column>_rolling' trailing means over `window` periods."""
+    return data.assign(**{
+        f"{column}_rolling": data[column].rolling(window, min_periods=1).mean()
+        for column in columns
+    })
+
+
+def add_year_over_year(data, granularity, columns=('count',)):
+    """
+    Add '<column>_previous_year' and '<column>_yoy' (percentage change).
+
+    Periods whose previous year is outside the series get NaN.
+    """
+    periods = data['period'].to_numpy(dtype=np.int64)
+    previous = previous_year_keys(periods, granularity)
+    rows = np.minimum(np.searchsorted(periods, previous), max(len(periods) - 1, 0))
+    found = periods[rows] == previous
+    changes = {}
+    for column in columns:
+        values = data[column].to_numpy(dtype='float64')
+        before = np.full(len(values), np.nan)
+        before[found] = values[rows[found]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(before > 0, (values - before) / before * 100, np.nan)
+        changes[f"{column}_previous_year"] = before
+        changes[f"{column}_yoy"] = change
+    return data.assign(**changes)
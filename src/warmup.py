@@ -0,0 +1,225 @@
+"""
+Warm-up Module
+==============
+Make the first render after a deploy as fast as every later one.
+
+A cold dashboard process pays, on its first session, for building the
+columnar and text caches, loading the dataset, computing the default
+(unfiltered) view and Plotly's first figure, which loads its validators.
+Warm-up does all of it ahead of time:
+
+    python src/warmup.py --build    at image build: write the disk caches and
+                                    a snapshot of the default view
+    python src/warmup.py --serve    at boot: start Streamlit and, in the same
+                                    process, load every dataset, seed the view
+                                    cache from the snapshot and draw (and cache)
+                                    the default figures; then write the ready file
+
+The serving process writes the ready file (DASHBOARD_READY_FILE) only once
+it is warm, so a health check that requires it does not pass before the
+app can answer quickly.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import get_cache_key, get_derived_cache_path
+from dataset import DashboardView, compute_view
+from filters import default_spec
+from kpis import KPIResult
+from registry import get_shared_registry
+from result_cache import get_shared_cache
+
+
+SNAPSHOT_SUFFIX = 'warm.npz'
+
+# Bump when the snapshot contents change so old snapshots are ignored
+SNAPSHOT_VERSION = 2
+
+APP_PATH = Path(__file__).parent.parent / "app.py"
+
+
+def get_ready_path():
+    """Where a warm process reports readiness (DASHBOARD_READY_FILE)."""
+    default = Path(tempfile.gettempdir()) / "insurance-dashboard.ready"
+    return Path(os.environ.get('DASHBOARD_READY_FILE', default))
+
+
+def dataset_default_spec(dataset):
+    """The FilterSpec of a fresh session on this dataset."""
+    options = dataset.frame if dataset.in_memory else dataset.cube.cells
+    return default_spec(options, bounds=(dataset.cube.min_date, dataset.cube.max_date))
+
+
+# =============================================================================
+# DEFAULT VIEW SNAPSHOT
+# =============================================================================
+
+def save_snapshot(path, key, view):
+    """Save a computed view under a cache key (see data_loader.get_cache_key)."""
+    frames = {'chart_data': view.chart_data, 'provider_data': view.provider_data or {}}
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'key': key,
+        'spec': _spec_json(view.spec),
+        'kpis': {name: getattr(view.kpis, name) for name in KPIResult.__dataclass_fields__},
+        'frames': {
+            group: {name: frame.to_json(orient='split', index=False) for name, frame in values.items()}
+            for group, values in frames.items()
+        },
+        'has_provider_data': view.provider_data is not None,
+        'percentiles': (None if view.percentiles is None
+                        else view.percentiles.reset_index().to_json(orient='split', index=False)),
+    }
+    positions = view.positions if view.positions is not None else np.array([], dtype=np.int32)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp.npz')
+    np.savez(tmp_path, meta=np.array(json.dumps(meta)), positions=positions,
+             has_positions=np.array(view.positions is not None))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, key, spec):
+    """The view saved for `spec` under `key`, or None if there is no such snapshot."""
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            positions = data['positions'] if bool(data['has_positions']) else None
+    except (OSError, ValueError, KeyError):
+        return None
+    if meta['version'] != SNAPSHOT_VERSION or meta['key'] != key or meta['spec'] != _spec_json(spec):
+        return None
+
+    frames = {
+        group: {name: _read_frame(text) for name, text in values.items()}
+        for group, values in meta['frames'].items()
+    }
+    return DashboardView(
+        spec=spec,
+        positions=positions,
+        kpis=KPIResult(**meta['kpis']),
+        chart_data=frames['chart_data'],
+        provider_data=frames['provider_data'] if meta['has_provider_data'] else None,
+        percentiles=(None if meta['percentiles'] is None
+                     else _read_frame(meta['percentiles']).set_index('metric')),
+    )
+
+
+def _spec_json(spec):
+    return json.loads(json.dumps(
+        {name: list(value) if isinstance(value, tuple) else value for name, value in vars(spec).items()},
+        default=str,
+    ))
+
+
+def _read_frame(text):
+    # No type guessing: 'YYYY-MM' labels and tax ids must stay strings
+    return pd.read_json(io.StringIO(text), orient='split', dtype=False, convert_dates=False)
+
+
+# =============================================================================
+# WARM-UP
+# =============================================================================
+
+def warm_dataset(registry, name, view_cache=None, draw=True):
+    """
+    Load one dataset and its default view, seeding view_cache with it.
+
+    The view comes from the snapshot when it matches the data, and the
+    snapshot is (re)written otherwise. Returns a dict of stage timings.
+    """
+    from charts import build_figures
+    from figures import build_figures_cached, dashboard_figure_jobs, filter_fingerprint
+
+    timings = {}
+    start = time.perf_counter()
+    with registry.acquire(name) as shared_dataset:
+        timings['load'] = time.perf_counter() - start
+        dataset = shared_dataset.snapshot()
+        spec = dataset_default_spec(dataset)
+
+        start = time.perf_counter()
+        key = get_cache_key(registry.source(name)) if dataset.in_memory else None
+        snapshot_path = get_derived_cache_path(registry.source(name), SNAPSHOT_SUFFIX)
+        view = load_snapshot(snapshot_path, key, spec) if key else None
+        if view is None:
+            view = compute_view(dataset, spec)
+            if key:
+                save_snapshot(snapshot_path, key, view)
+        if view_cache is not None:
+            view_cache.put((name, dataset.identity, spec), view)
+        timings['view'] = time.perf_counter() - start
+
+        if draw:
+            # Plotly loads most of its machinery on the first figure built
+            start = time.perf_counter()
+            if view_cache is not None:
+                # Cached too, so the first session does not rebuild them
+                build_figures_cached(dashboard_figure_jobs(view), view_cache,
+                                     filter_fingerprint(name, dataset, view))
+            else:
+                build_figures(view.chart_data)
+            timings['figures'] = time.perf_counter() - start
+    return timings
+
+
+def warm_up(registry=None, view_cache=None, draw=True):
+    """Warm every registered dataset. Returns {name: stage timings}."""
+    registry = registry or get_shared_registry()
+    return {name: warm_dataset(registry, name, view_cache, draw) for name in registry.names()}
+
+
+def mark_ready(path, details):
+    """Atomically write the ready file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(details, indent=2))
+    os.replace(tmp_path, path)
+
+
+def _warm_and_mark_ready(ready_path):
+    start = time.perf_counter()
+    timings = warm_up(view_cache=get_shared_cache())
+    mark_ready(ready_path, {'seconds': time.perf_counter() - start, 'datasets': timings})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the dashboard caches before serving")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--build', action='store_true',
+                      help="write disk caches and snapshots, then exit (the default)")
+    mode.add_argument('--serve', action='store_true', help="run Streamlit, warming up in-process")
+    parser.add_argument('streamlit_args', nargs=argparse.REMAINDER,
+                        help="with --serve: options passed to `streamlit run` (after --)")
+    args = parser.parse_args(argv)
+    ready_path = get_ready_path()
+
+    if args.serve:
+        from streamlit.web import cli
+
+        ready_path.unlink(missing_ok=True)
+        threading.Thread(target=_warm_and_mark_ready, args=(ready_path,),
+                         name='warm-up', daemon=True).start()
+        options = [arg for arg in args.streamlit_args if arg != '--']
+        return cli.main(['run', str(APP_PATH), *options], prog_name='streamlit')
+
+    start = time.perf_counter()
+    timings = warm_up(draw=False)
+    print(f"Warmed {len(timings)} dataset(s) in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
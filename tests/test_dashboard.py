@@ -148,6 +148,53 @@ class TestClaimCalculations:
         assert calculate_lawsuit_rate(df) == 25.0
 
 
+class TestComputeKpis:
+    """Tests for the single-pass KPI engine."""
+
+    def _frame(self):
+        return pd.DataFrame({
+            'insurer_name': ['Geico', 'Geico', 'StateFarm', 'StateFarm'],
+            'total_claimed_losses': [1000.0, 3000.0, 500.0, 500.0],
+            'total_insurance_payment': [500.0, 1500.0, 500.0, 0.0],
+            'injuryinvolved': ['Yes', 'No', 'No', 'No'],
+            'lawsuit_filed': ['No', 'No', 'Yes', 'No'],
+        })
+
+    def test_compute_kpis_matches_single_functions(self):
+        """Every metric should agree with the calculate_* functions."""
+        import kpis
+        df = self._frame()
+        result = kpis.compute_kpis(df)
+
+        assert result.total_claims == kpis.calculate_total_claims(df)
+        assert result.total_claimed == kpis.calculate_total_claimed_losses(df)
+        assert result.total_paid == kpis.calculate_total_payments(df)
+        assert result.average_claim == kpis.calculate_average_claim(df)
+        assert result.injury_rate == kpis.calculate_injury_rate(df)
+        assert result.lawsuit_rate == kpis.calculate_lawsuit_rate(df)
+        assert result.payment_ratio == kpis.calculate_payment_ratio(df)
+
+    def test_compute_kpis_empty_dataframe(self):
+        """Ratios should be 0 when there are no claims."""
+        from kpis import compute_kpis
+        result = compute_kpis(self._frame().iloc[0:0])
+        assert result.total_claims == 0
+        assert result.average_claim == 0
+        assert result.injury_rate == 0
+        assert result.payment_ratio == 0
+
+    def test_compute_kpis_by_group(self):
+        """Grouped KPIs should give one row per group."""
+        from kpis import compute_kpis
+        table = compute_kpis(self._frame(), by='insurer_name')
+
+        assert list(table.index) == ['Geico', 'StateFarm']
+        assert table.loc['Geico', 'total_claims'] == 2
+        assert table.loc['Geico', 'average_claim'] == 2000.0
+        assert table.loc['StateFarm', 'lawsuit_rate'] == 50.0
+        assert table.loc['StateFarm', 'payment_ratio'] == 50.0
+
+
 # =============================================================================
 # DATA LOADER TESTS
 # =============================================================================
@@ -166,6 +213,132 @@ class TestDataLoader:
         assert callable(get_column_options)
 
 
+class TestColumnarCache:
+    """Tests for the on-disk columnar cache behind load_data."""
+
+    CSV = (
+        "insurer_name,dateOfloss,total_claimed_losses\n"
+        "Geico,2023-01-15,100.0\n"
+        "StateFarm,2023-06-20,250.5\n"
+    )
+
+    def test_read_claims_writes_cache(self, tmp_path):
+        """First read should parse the CSV and leave a cache behind."""
+        from data_loader import read_claims, get_cache_paths
+        csv_path = tmp_path / "claims.csv"
+        csv_path.write_text(self.CSV)
+
+        df = read_claims(csv_path)
+        cache_path, meta_path = get_cache_paths(csv_path)
+
+        assert len(df) == 2
+        assert cache_path.exists()
+        assert meta_path.exists()
+
+    def test_read_claims_uses_cache_when_unchanged(self, tmp_path, monkeypatch):
+        """An unchanged CSV should be served from the cache, not re-parsed."""
+        import data_loader
+        csv_path = tmp_path / "claims.csv"
+        csv_path.write_text(self.CSV)
+        expected = data_loader.read_claims(csv_path)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("CSV should not be parsed again")
+        monkeypatch.setattr(data_loader, "parse_claims_csv", fail)
+
+        cached = data_loader.read_claims(csv_path)
+        pd.testing.assert_frame_equal(cached, expected)
+
+    def test_read_claims_rebuilds_on_content_change(self, tmp_path):
+        """Changing the CSV contents should invalidate the cache."""
+        from data_loader import read_claims
+        csv_path = tmp_path / "claims.csv"
+        csv_path.write_text(self.CSV)
+        read_claims(csv_path)
+
+        csv_path.write_text(self.CSV + "Progressive,2023-07-01,75.0\n")
+        df = read_claims(csv_path)
+
+        assert len(df) == 3
+        assert df['insurer_name'].iloc[-1] == 'Progressive'
+
+    def test_same_size_change_hashes_once(self, tmp_path, monkeypatch):
+        """A same-size content change should hash the CSV once, not again for the new cache."""
+        import data_loader
+        csv_path = tmp_path / "claims.csv"
+        csv_path.write_text(self.CSV)
+        data_loader.read_claims(csv_path)
+
+        hashed = []
+        digest = data_loader.file_digest
+        monkeypatch.setattr(data_loader, "file_digest", lambda path: hashed.append(path) or digest(path))
+        csv_path.write_text(self.CSV.replace("Geico", "Gecko"))
+        df = data_loader.read_claims(csv_path)
+
+        assert df['insurer_name'].iloc[0] == 'Gecko'
+        assert len(hashed) == 1
+        assert data_loader.get_cache_key(csv_path) == digest(csv_path)
+
+
+class TestSchema:
+    """Tests for the declared in-memory schema."""
+
+    def _raw_frame(self):
+        return pd.DataFrame({
+            'insurer_name': ['Geico', 'StateFarm', 'Geico'],
+            'injuryinvolved': ['Yes', 'No', 'Yes'],
+            'lawsuit_filed': ['No', 'No', 'Yes'],
+            'loss_description': ['Rear ended', 'Hail', 'Parking lot'],
+            'providers_chiropractor_payment': [100.0, 0.0, 50.5],
+            'total_claimed_losses': [1000.0, 200.0, 300.0],
+        })
+
+    def test_apply_schema_sets_declared_dtypes(self):
+        """Known columns should get their compact declared types."""
+        from schema import apply_schema
+        df = apply_schema(self._raw_frame())
+
+        assert isinstance(df['insurer_name'].dtype, pd.CategoricalDtype)
+        assert df['injuryinvolved'].dtype == 'boolean'
+        assert df['providers_chiropractor_payment'].dtype == 'float32'
+        assert df['total_claimed_losses'].dtype == 'float64'
+        assert isinstance(df['loss_description'].dtype, pd.StringDtype)
+
+    def test_apply_schema_converts_flags(self):
+        """Yes/No flags should become True/False."""
+        from schema import apply_schema
+        df = apply_schema(self._raw_frame())
+        assert df['injuryinvolved'].tolist() == [True, False, True]
+
+    def test_missing_flags_stay_missing(self):
+        """A missing or blank flag should be neither 'Yes' nor 'No'."""
+        from schema import apply_schema
+        df = apply_schema(self._raw_frame().assign(injuryinvolved=['Yes', None, '']))
+        assert df['injuryinvolved'].isna().tolist() == [False, True, True]
+
+    def test_injury_description_is_text(self):
+        """Free-text injury descriptions should not become categoricals."""
+        from schema import apply_schema
+        df = apply_schema(self._raw_frame().assign(injury_description=['Whiplash', 'None', 'Cut']))
+        assert isinstance(df['injury_description'].dtype, pd.StringDtype)
+
+    def test_kpis_accept_typed_flags(self):
+        """Rate KPIs should give the same answer on typed and raw frames."""
+        from schema import apply_schema
+        from kpis import calculate_injury_rate, calculate_lawsuit_rate
+        raw = self._raw_frame()
+        typed = apply_schema(raw)
+
+        assert calculate_injury_rate(typed) == calculate_injury_rate(raw)
+        assert calculate_lawsuit_rate(typed) == calculate_lawsuit_rate(raw)
+
+    def test_typed_frame_uses_less_memory(self):
+        """The typed bundled dataset should be smaller than the raw parse."""
+        from data_loader import parse_claims_csv, DATA_PATH
+        _, memory = parse_claims_csv(DATA_PATH, with_memory_report=True)
+        assert memory['after'] < memory['before']
+
+
 # =============================================================================
 # STYLES TESTS
 # =============================================================================
@@ -221,6 +394,15 @@ class TestCharts:
         assert isinstance(CHART_COLORS, list)
         assert len(CHART_COLORS) >= 6
     
+    def test_figures_accept_filtered_categoricals(self):
+        """Categories removed by a filter should not break the figures."""
+        from charts import claims_by_insurer_figure, count_claims
+        df = pd.DataFrame({
+            'insurer_name': pd.Categorical(['Geico', 'Geico'], categories=['Geico', 'StateFarm'])
+        })
+        fig = claims_by_insurer_figure(count_claims(df, 'insurer_name'))
+        assert list(fig.data[0].y) == ['Geico']
+
     def test_chart_layout_configuration(self):
         """Chart layout function should return proper configuration."""
         from charts import get_chart_layout
@@ -232,6 +414,43 @@ class TestCharts:
         assert 'font' in layout
 
 
+class TestDownsampling:
+    """Tests for chart point and category budgets."""
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        """LTTB should keep the ends and a sharp spike within budget."""
+        import numpy as np
+        from downsampling import lttb
+        y = np.zeros(1000)
+        y[437] = 100.0
+        kept = lttb(np.arange(1000), y, 50)
+
+        assert len(kept) == 50
+        assert kept[0] == 0 and kept[-1] == 999
+        assert 437 in kept
+        assert (np.diff(kept) > 0).all()
+
+    def test_top_n_with_other_keeps_totals(self):
+        """The long tail should collapse into one "Other" row with its sum."""
+        from downsampling import OTHER_LABEL, top_n_with_other
+        data = pd.DataFrame({'insuredCity': [f"city{i}" for i in range(100)], 'count': range(100)})
+        bucketed = top_n_with_other(data, 'insuredCity', 'count', 10)
+
+        assert len(bucketed) == 10
+        assert bucketed['insuredCity'].iloc[-1] == OTHER_LABEL
+        assert bucketed['count'].sum() == data['count'].sum()
+        assert bucketed['count'].iloc[0] == 99
+
+    def test_figures_respect_budgets(self):
+        """Figures should carry no more points or bars than their budget."""
+        from charts import claims_by_insurer_figure, monthly_claims_trend_figure
+        insurers = pd.DataFrame({'insurer_name': [f"Insurer {i}" for i in range(40)], 'count': range(40)})
+        months = pd.DataFrame({'month': [f"m{i}" for i in range(2000)], 'count': range(2000)})
+
+        assert len(claims_by_insurer_figure(insurers, max_categories=8).data) == 8
+        assert len(monthly_claims_trend_figure(months, max_points=100).data[0].x) == 100
+
+
 # =============================================================================
 # FILTERS TESTS
 # =============================================================================
@@ -312,6 +531,1640 @@ class TestFilters:
         assert result.iloc[0]['injuryinvolved'] == 'Yes'
 
 
+class TestFilterIndex:
+    """Tests for the bitmap filter index."""
+
+    def _frame(self):
+        return pd.DataFrame({
+            'dateOfloss': pd.to_datetime([
+                '2023-01-15 09:00', '2023-06-20 08:00', '2023-06-20 18:30', None, '2024-02-01 12:00'
+            ]),
+            'insurer_name': ['Geico', 'StateFarm', 'Geico', 'Geico', 'Allstate'],
+            'insuredstate': ['CA', 'TX', 'TX', 'CA', 'NY'],
+            'natureOfincident': ['Collision', 'Hit and run', 'Collision', 'Theft', 'Theft'],
+            'injuryinvolved': ['Yes', 'No', 'Yes', 'No', 'No']
+        })
+
+    def test_select_matches_apply_filters(self):
+        """Index selection should return the same rows as a column scan."""
+        from filters import apply_filters, FilterIndex
+        df = self._frame()
+        index = FilterIndex(df)
+        args = ((date(2023, 1, 1), date(2023, 12, 31)), ['Geico'], ['TX', 'CA'], [], "Yes")
+
+        scanned = apply_filters(df, *args)
+        indexed = apply_filters(df, *args, index=index)
+
+        pd.testing.assert_frame_equal(indexed, scanned)
+        assert indexed.index.tolist() == [0, 2]
+
+    def test_select_matches_apply_filters_with_missing_categories(self):
+        """Rows with a missing insurer or state should match only as they do in a scan."""
+        import numpy as np
+        from filters import apply_filters, FilterIndex
+        df = self._frame()
+        df['insurer_name'] = pd.Categorical(['Geico', None, 'Geico', 'StateFarm', 'Allstate'])
+        df['insuredstate'] = ['CA', 'TX', None, 'CA', 'NY']
+        index = FilterIndex(df)
+        extended = FilterIndex(df.iloc[:3]).extend(df.iloc[3:].reset_index(drop=True))
+
+        selections = [
+            (['Geico', 'StateFarm', 'Allstate'], []),   # every value: no filter in the sidebar
+            (['Geico', 'StateFarm'], []),               # complement is smaller
+            (['Geico'], ['CA', 'TX', 'NY']),
+            (['Geico', np.nan], []),                    # isin matches a selected NaN
+        ]
+        for insurers, states in selections:
+            args = ((), insurers, states, [], "All")
+            scanned = apply_filters(df, *args).index.tolist()
+            assert index.select(*args).tolist() == scanned
+            assert extended.select(*args).tolist() == scanned
+
+    def test_select_date_range_is_inclusive_by_day(self):
+        """Timestamps late on the end date should still match."""
+        from filters import FilterIndex
+        index = FilterIndex(self._frame())
+        rows = index.select((date(2023, 6, 20), date(2023, 6, 20)), [], [], [], "All")
+        assert rows.tolist() == [1, 2]
+
+    def test_select_excludes_missing_dates(self):
+        """Rows without a date never match a date range."""
+        from filters import FilterIndex
+        index = FilterIndex(self._frame())
+        rows = index.select((date(2000, 1, 1), date(2030, 1, 1)), [], [], [], "All")
+        assert rows.tolist() == [0, 1, 2, 4]
+
+    def test_select_without_date_range(self):
+        """A half-picked date range should not filter by date."""
+        from filters import FilterIndex
+        index = FilterIndex(self._frame())
+        rows = index.select((date(2023, 1, 1),), [], [], ['Theft'], "No")
+        assert rows.tolist() == [3, 4]
+
+
+# =============================================================================
+# CUBE TESTS
+# =============================================================================
+
+def _claims_frame():
+    """Small claims frame with every column the cube and KPIs use."""
+    return pd.DataFrame({
+        'dateOfloss': pd.to_datetime([
+            '2023-01-15', '2023-01-31', '2023-02-01', '2023-03-10', None
+        ]),
+        'insurer_name': ['Geico', 'Geico', 'StateFarm', 'Allstate', 'Geico'],
+        'insuredstate': ['CA', 'TX', 'TX', 'NY', 'CA'],
+        'natureOfincident': ['Collision', 'Collision', 'Theft', 'Theft', 'Collision'],
+        'injuryinvolved': ['Yes', 'No', 'Yes', 'No', 'No'],
+        'lawsuit_filed': ['No', 'Yes', 'No', 'No', 'Yes'],
+        'total_claimed_losses': [1000.0, 2000.0, 500.0, 800.0, 100.0],
+        'total_insurance_payment': [900.0, 1000.0, 500.0, 0.0, 50.0],
+        'claimNumber': ['c1', 'c2', 'c3', 'c4', 'c5'],
+    })
+
+
+class TestCube:
+    """Tests for the pre-aggregated claims cube."""
+
+    def test_cube_kpis_match_rows(self):
+        """Cube totals should equal KPIs computed from the filtered rows."""
+        from cube import build_cube
+        from filters import apply_filters
+        from kpis import compute_kpis
+        df = _claims_frame()
+        cube = build_cube(df)
+        selection = ((date(2023, 1, 1), date(2023, 2, 28)), ['Geico', 'StateFarm'], [], [], "All")
+
+        assert cube.kpis(cube.slice(*selection)) == compute_kpis(apply_filters(df, *selection))
+
+    def test_cube_whole_cube_includes_undated_claims(self):
+        """Without a date range every claim should be counted."""
+        from cube import build_cube
+        cube = build_cube(_claims_frame())
+        assert cube.kpis().total_claims == 5
+
+    def test_cube_can_answer_only_whole_months(self):
+        """Ranges splitting a month should fall back to claim rows."""
+        from cube import build_cube
+        cube = build_cube(_claims_frame())
+
+        assert cube.can_answer((date(2023, 1, 1), date(2023, 2, 28)))
+        assert cube.can_answer((date(2020, 5, 17), date(2030, 5, 17)))
+        assert not cube.can_answer((date(2023, 1, 16), date(2023, 2, 28)))
+        assert not cube.can_answer((date(2023, 1, 1), date(2023, 2, 14)))
+
+    def test_cube_chart_data_matches_rows(self):
+        """Chart aggregates from the cube should equal those from rows."""
+        from cube import build_cube
+        from charts import chart_data_from_rows
+        df = _claims_frame()
+        from_cube = build_cube(df).chart_data()
+        from_rows = chart_data_from_rows(df)
+
+        for key in ['by_insurer', 'by_month', 'payments']:
+            pd.testing.assert_frame_equal(
+                from_cube[key].reset_index(drop=True),
+                from_rows[key].reset_index(drop=True),
+                check_dtype=False
+            )
+
+
+class TestChunkedIngestion:
+    """Tests for out-of-core chunked ingestion."""
+
+    def test_ingest_csv_matches_in_memory_cube(self, tmp_path):
+        """Streaming in chunks should give the same cube totals."""
+        from cube import build_cube
+        from ingest import ingest_csv
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+
+        result = ingest_csv(csv_path, chunk_rows=2)
+        expected = build_cube(_claims_frame())
+
+        assert result.rows == 5
+        assert result.chunks == 3
+        assert result.cube.kpis() == expected.kpis()
+        assert len(result.cube.cells) == len(expected.cells)
+
+    def test_ingest_csv_merges_chunk_cubes_as_a_tree(self, tmp_path, monkeypatch):
+        """Chunk cubes should be merged pairwise, not folded into the running cube each chunk."""
+        import ingest
+        from cube import build_cube
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+        merges = []
+        merge_cubes = ingest.merge_cubes
+        monkeypatch.setattr(ingest, "merge_cubes", lambda cubes: merges.append(1) or merge_cubes(cubes))
+
+        result = ingest.ingest_csv(csv_path, chunk_rows=1)
+        expected = build_cube(_claims_frame())
+
+        # 5 chunks: (1+2) (3+4) (12+34) at the pushes, then one merge with chunk 5
+        assert result.chunks == 5 and len(merges) == 4
+        assert result.cube.kpis() == expected.kpis()
+        pd.testing.assert_frame_equal(result.cube.percentiles(), expected.percentiles())
+
+    def test_ingest_csv_writes_partitions(self, tmp_path):
+        """Each chunk should be written as its own Parquet partition."""
+        from ingest import ingest_csv
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+
+        result = ingest_csv(csv_path, chunk_rows=2, partition_dir=tmp_path / "parts")
+
+        assert len(result.partitions) == 3
+        assert sum(len(pd.read_parquet(p)) for p in result.partitions) == 5
+
+    def test_streamed_dataset_answers_from_cube(self, tmp_path):
+        """A cube-only dataset should still produce dashboard views."""
+        from dataset import build_streamed_dataset, compute_view
+        from filters import FilterSpec
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+
+        dataset = build_streamed_dataset(csv_path, chunk_rows=2)
+        view = compute_view(dataset, FilterSpec.from_selection((), ['Geico'], [], [], "All"))
+
+        assert not dataset.in_memory
+        assert view.positions is None
+        assert view.kpis.total_claims == 3
+
+
+class TestIncrementalAppend:
+    """Tests for appending new claims without a full reload."""
+
+    def test_append_claims_skips_known_claims(self):
+        """Already loaded or repeated claim numbers should be dropped."""
+        from dataset import build_dataset
+        from incremental import append_claims
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+        dataset = build_dataset(df.iloc[:3].reset_index(drop=True))
+
+        delta = pd.concat([df.iloc[2:], df.iloc[4:]], ignore_index=True)
+        result = append_claims(dataset, delta)
+
+        assert result.added == 2
+        assert result.duplicates == 2
+        assert dataset.version == 1
+        assert dataset.frame['claimNumber'].tolist() == ['c1', 'c2', 'c3', 'c4', 'c5']
+
+    def test_append_claims_matches_full_build(self):
+        """Views after an append should equal views of a full reload."""
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from incremental import append_claims
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+        appended = build_dataset(df.iloc[:2].reset_index(drop=True))
+        append_claims(appended, df.iloc[2:])
+        full = build_dataset(df)
+
+        spec = FilterSpec.from_selection((date(2023, 1, 20), date(2023, 3, 31)), [], [], [], "All")
+        view, expected = compute_view(appended, spec), compute_view(full, spec)
+
+        assert view.positions.tolist() == expected.positions.tolist()
+        assert view.kpis == expected.kpis
+        assert appended.cube.kpis() == full.cube.kpis()
+
+    def test_ingest_drop_folder_moves_processed_files(self, tmp_path):
+        """Dropped CSVs should be appended and moved out of the way."""
+        from dataset import build_dataset
+        from incremental import ingest_drop_folder
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+        dataset = build_dataset(df.iloc[:3].reset_index(drop=True))
+        df.iloc[3:].to_csv(tmp_path / "new_claims.csv", index=False)
+
+        results = ingest_drop_folder(dataset, tmp_path)
+
+        assert results[0][1].added == 2
+        assert dataset.total_claims == 5
+        assert (tmp_path / "processed" / "new_claims.csv").exists()
+        assert not (tmp_path / "new_claims.csv").exists()
+
+    def test_appends_leave_earlier_frames_unchanged(self):
+        """Frames written into by later appends should not change under their readers."""
+        from dataset import build_dataset
+        from incremental import append_claims
+        from ingest import coerce_claims
+        df = coerce_claims(_large_claims_frame(3_000))
+        dataset = build_dataset(df.iloc[:1_000].reset_index(drop=True))
+
+        frames = []
+        for start in range(1_000, 3_000, 500):
+            frame = dataset.snapshot().frame
+            frames.append((frame, frame.copy(deep=True)))
+            append_claims(dataset, df.iloc[start:start + 500])
+
+        for frame, expected in frames:
+            pd.testing.assert_frame_equal(frame, expected)
+        pd.testing.assert_frame_equal(dataset.frame.astype(object), df.astype(object))
+
+    def test_failed_append_leaves_no_trace(self, monkeypatch):
+        """An append failing part way should not show up in the frame, indexes or SQL."""
+        import filters
+        import frame_buffer
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from incremental import append_claims
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+        dataset = build_dataset(df.iloc[:2].reset_index(drop=True), sql=True)
+
+        def fail(*args, **kwargs):
+            raise ValueError("disk full")
+
+        for owner, method in [(filters.FilterIndex, 'extend'), (frame_buffer.FrameBuffer, 'append')]:
+            with monkeypatch.context() as patch:
+                patch.setattr(owner, method, fail)
+                with pytest.raises(ValueError):
+                    append_claims(dataset, df.iloc[2:4])
+            assert dataset.version == 0
+            assert len(dataset.frame) == 2
+        append_claims(dataset, df.iloc[4:])
+
+        expected = build_dataset(df.iloc[[0, 1, 4]].reset_index(drop=True))
+        spec = FilterSpec()
+        assert dataset.frame['claimNumber'].tolist() == ['c1', 'c2', 'c5']
+        assert compute_view(dataset, spec).kpis == compute_view(expected, spec).kpis
+        assert dataset.sql.kpis(spec, version=dataset.version) == expected.cube.kpis()
+        assert dataset.filter_index.select((), [], [], [], "No").tolist() == [1, 2]
+        assert dataset.claim_ids.contains(pd.Series(['c3', 'c4', 'c5'])).tolist() == [False, False, True]
+
+    def test_extended_cube_matches_rebuilt_cube(self):
+        """Extending a cube by a delta should equal building it from all rows."""
+        from cube import CUBE_DIMENSIONS, build_cube, extend_cube
+        from ingest import coerce_claims
+        df = coerce_claims(_large_claims_frame(3_000))
+        cube = build_cube(df.iloc[:2_000])
+        for start in range(2_000, 3_000, 250):
+            cube = extend_cube(cube, df.iloc[start:start + 250])
+        full = build_cube(df)
+
+        def totals(cells):
+            cells = cells.astype({column: object for column in CUBE_DIMENSIONS})
+            return cells.sort_values(CUBE_DIMENSIONS, na_position='first').reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(totals(cube.cells), totals(full.cells), check_dtype=False)
+        pd.testing.assert_frame_equal(cube.percentiles(cube.cells), full.percentiles(full.cells))
+
+    def test_claim_ids_find_loaded_claims(self):
+        """The claim number index should grow by each delta and skip missing numbers."""
+        from claim_ids import ClaimIds
+        ids = ClaimIds.from_ids(pd.Series(['c1', 'c2', None]))
+        extended = ids.extend(pd.Series([f'c{i}' for i in range(2, 10)]))
+
+        assert len(ids) == 2
+        assert len(extended) == 9
+        assert extended.contains(pd.Series(['c1', 'c9', 'c10', None])).tolist() == [True, True, False, False]
+        assert ids.contains(pd.Series(['c9'])).tolist() == [False]
+
+
+class TestTimeSeries:
+    """Tests for integer period keys and time series."""
+
+    def test_period_keys_and_labels(self):
+        """Each granularity should key and label dates consistently."""
+        from timeseries import MISSING_PERIOD, period_keys, period_labels
+        dates = pd.to_datetime(['2023-01-01', '2023-01-02', '2024-02-29', None])
+
+        weeks = period_keys(dates, 'week')
+        assert weeks[0] + 1 == weeks[1]  # 2023-01-02 is a Monday
+        assert period_labels(weeks[:1], 'week').tolist() == ['2022-12-26']
+        assert period_labels(period_keys(dates[:3], 'quarter'), 'quarter').tolist() == [
+            '2023-Q1', '2023-Q1', '2024-Q1'
+        ]
+        assert period_labels(period_keys(dates[:3], 'month'), 'month').tolist() == [
+            '2023-01', '2023-01', '2024-02'
+        ]
+        assert period_keys(dates, 'year')[3] == MISSING_PERIOD
+
+    def test_series_is_dense_and_selectable(self):
+        """Series should cover every period and honour row positions."""
+        from timeseries import TimeSeriesIndex
+        index = TimeSeriesIndex(_claims_frame())
+
+        monthly = index.series('month')
+        assert monthly['label'].tolist() == ['2023-01', '2023-02', '2023-03']
+        assert monthly['count'].tolist() == [2, 1, 1]
+        assert monthly['paid'].tolist() == [1900.0, 500.0, 0.0]
+
+        daily = index.series('day', positions=[0, 3])
+        assert len(daily) == 55  # 15 January to 10 March
+        assert daily['count'].sum() == 2
+
+    def test_rolling_and_year_over_year(self):
+        """Rolling means trail; year-over-year matches the same period."""
+        from timeseries import add_rolling, add_year_over_year, previous_year_keys, period_keys
+        data = pd.DataFrame({'period': [2022 * 4 + q for q in range(8)],
+                             'count': [10, 20, 30, 40, 15, 20, 15, 80]})
+
+        rolled = add_rolling(data, 2)
+        assert rolled['count_rolling'].tolist()[:3] == [10, 15, 25]
+
+        compared = add_year_over_year(data, 'quarter')
+        assert compared['count_previous_year'].isna().sum() == 4
+        assert compared['count_yoy'].tolist()[4:] == [50.0, 0.0, -50.0, 100.0]
+
+        leap_day = period_keys(pd.to_datetime(['2024-02-29']), 'day')
+        expected = period_keys(pd.to_datetime(['2023-02-28']), 'day')
+        assert previous_year_keys(leap_day, 'day').tolist() == expected.tolist()
+
+
+# =============================================================================
+# PROVIDER TESTS
+# =============================================================================
+
+def _provider_claims():
+    """Claims with two provider specialties in the wide CSV layout."""
+    return _claims_frame().assign(**{
+        'providers_chiropractor': ['Bone Inc', None, 'Bone Inc', 'Spine LLC', None],
+        'providers_chiropractor_tax_id': ['11-1', None, '11-1', '11-2', None],
+        'providers_chiropractor_payment': [100.0, 0.0, 50.0, 25.0, 0.0],
+        'providers_ER physician': ['City ER', 'City ER', None, None, 'Bone Inc'],
+        'providers_ER physician_tax_id': ['22-1', '22-1', None, None, '11-1'],
+        'providers_ER physician_payment': [300.0, 200.0, 0.0, 0.0, 10.0],
+    })
+
+
+class TestProviders:
+    """Tests for the long-format provider lines table."""
+
+    def test_lines_match_wide_columns(self):
+        """One line per claim and specialty with a provider, same totals."""
+        from providers import ProviderTable
+        table = ProviderTable(_provider_claims())
+
+        assert table.specialties == ['chiropractor', 'ER physician']
+        assert len(table) == 6
+        assert table.lines['claim_row'].tolist() == [0, 2, 3, 0, 1, 4]
+        assert table.lines['tax_id'].tolist() == ['11-1', '11-1', '11-2', '22-1', '22-1', '11-1']
+        assert table.lines['payment'].sum() == pytest.approx(685.0)
+
+    def test_spend_and_top_providers(self):
+        """Aggregates should follow the selected claims."""
+        from providers import ProviderTable
+        table = ProviderTable(_provider_claims())
+
+        spend = table.spend_by_specialty().set_index('specialty')
+        assert spend.loc['ER physician', 'payment'] == pytest.approx(510.0)
+        assert spend.loc['ER physician', 'providers'] == 2
+
+        top = table.top_providers(2)
+        assert top['tax_id'].tolist() == ['22-1', '11-1']
+        assert top['claims'].tolist() == [2, 3]
+
+        selected = table.spend_by_specialty(positions=[2, 3]).set_index('specialty')
+        assert selected.loc['chiropractor', 'payment'] == pytest.approx(75.0)
+        assert selected.loc['ER physician', 'lines'] == 0
+
+        by_insurer = table.spend_by_insurer(_provider_claims()).set_index(['insurer_name', 'specialty'])
+        assert by_insurer.loc[('Geico', 'ER physician'), 'payment'] == pytest.approx(510.0)
+
+    def test_extend_matches_full_build(self):
+        """Extending with new claims should equal building from all claims."""
+        from providers import ProviderTable
+        df = _provider_claims()
+        extended = ProviderTable(df.iloc[:2]).extend(df.iloc[2:].reset_index(drop=True))
+        full = ProviderTable(df)
+
+        pd.testing.assert_frame_equal(extended.spend_by_specialty(), full.spend_by_specialty())
+        assert sorted(extended.providers['tax_id']) == sorted(full.providers['tax_id'])
+        assert extended.lines['claim_row'].sort_values().tolist() == full.lines['claim_row'].sort_values().tolist()
+
+
+class TestTaxIdIndex:
+    """Tests for the provider tax id lookup index."""
+
+    def test_lookup_finds_every_specialty(self):
+        """A tax id should find its claims across all specialty columns."""
+        from providers import ProviderTable, TaxIdIndex
+        df = _provider_claims()
+        index = TaxIdIndex(ProviderTable(df))
+
+        lines = index.lookup(' 11-1 ')
+        assert lines['claim_row'].tolist() == [0, 2, 4]
+        assert lines['specialty'].tolist() == ['chiropractor', 'chiropractor', 'ER physician']
+
+        claims = index.claims('11-1', df)
+        assert claims['claimNumber'].tolist() == ['c1', 'c3', 'c5']
+        assert claims['payment'].sum() == pytest.approx(160.0)
+
+    def test_unknown_tax_id(self):
+        """Unknown tax ids should give no lines rather than an error."""
+        from providers import ProviderTable, TaxIdIndex
+        index = TaxIdIndex(ProviderTable(_provider_claims()))
+
+        assert '99-9' not in index
+        assert index.provider_id('99-9') is None
+        assert len(index.lookup('99-9')) == 0
+
+    def test_index_refreshed_on_append(self):
+        """Appended claims should be found by the dataset's tax id index."""
+        from dataset import build_dataset
+        from incremental import append_claims
+        from ingest import coerce_claims
+        df = coerce_claims(_provider_claims())
+        dataset = build_dataset(df.iloc[:2].reset_index(drop=True))
+        append_claims(dataset, df.iloc[2:])
+
+        assert dataset.tax_ids.claims('11-1', dataset.frame)['claimNumber'].tolist() == ['c1', 'c3', 'c5']
+        assert dataset.tax_ids.lookup('11-2')['claim_row'].tolist() == [3]
+
+    def test_extend_matches_full_build(self):
+        """Extending the index by appended lines should equal indexing all of them."""
+        from providers import ProviderTable, TaxIdIndex
+        df = _provider_claims()
+        table = ProviderTable(df.iloc[:2])
+        index = TaxIdIndex(table)
+        for start in range(2, len(df)):
+            table = table.extend(df.iloc[start:start + 1].reset_index(drop=True))
+            index = index.extend(table)
+        full = TaxIdIndex(ProviderTable(df))
+
+        for tax_id in ['11-1', '11-2', '22-1']:
+            assert index.lookup(tax_id)['claim_row'].tolist() == full.lookup(tax_id)['claim_row'].tolist()
+            assert index.lookup(tax_id)['payment'].tolist() == full.lookup(tax_id)['payment'].tolist()
+
+
+# =============================================================================
+# TEXT SEARCH TESTS
+# =============================================================================
+
+def _described_claims():
+    """Claims with free-text description columns."""
+    return _claims_frame().assign(
+        loss_description=['Airbag deployed in rain.', 'Deer on the highway',
+                          'Rear bumper, airbag fine', None, 'Skid on ice, deer'],
+        injury_description=['Neck sprain/strain', None, 'Minor cuts', 'Fracture', None],
+        location_of_loss=['12 Mill Road, Lakeville', '3 Orchard Lane', '9 Mill Road', '', '1 Deer Park'],
+    )
+
+
+class TestTextIndex:
+    """Tests for the inverted keyword index."""
+
+    def test_parse_query(self):
+        """Words are ANDed; OR (or |) separates alternatives."""
+        from text_index import normalize_query, parse_query
+        assert parse_query("Airbag rain OR fog | deer") == [['airbag', 'rain'], ['fog'], ['deer']]
+        assert normalize_query("rain  airbag") == normalize_query("Airbag, rain")
+
+    def test_search_and_or(self):
+        """AND and OR queries should return sorted matching rows."""
+        from text_index import TextIndex
+        index = TextIndex.build(_described_claims())
+
+        assert index.search("airbag").tolist() == [0, 2]
+        assert index.search("deer").tolist() == [1, 4]
+        assert index.search("mill airbag").tolist() == [0, 2]
+        assert index.search("rain OR fracture").tolist() == [0, 3]
+        assert index.search("airbag ice").tolist() == []
+        assert index.search("nothing").tolist() == []
+
+    def test_extend_matches_full_build(self):
+        """Appending claims should give the same postings as a rebuild."""
+        from text_index import TextIndex
+        df = _described_claims()
+        extended = TextIndex.build(df.iloc[:2]).extend(df.iloc[2:].reset_index(drop=True))
+        full = TextIndex.build(df)
+
+        for query in ["airbag", "deer", "mill OR fracture", "sprain neck"]:
+            assert extended.search(query).tolist() == full.search(query).tolist()
+
+    def test_repeated_extends_keep_postings_sorted(self):
+        """Every term's postings should stay sorted across many small appends."""
+        from text_index import TextIndex
+        df = _described_claims()
+        index = TextIndex.build(df.iloc[:1])
+        for start in range(1, len(df)):
+            index = index.extend(df.iloc[start:start + 1].reset_index(drop=True))
+        full = TextIndex.build(df)
+
+        assert sorted(index.terms) == sorted(full.terms)
+        for term in full.terms:
+            assert index.rows(term).tolist() == full.rows(term).tolist()
+
+    def test_index_saved_with_cache(self, tmp_path):
+        """The index should be reused until the CSV changes."""
+        from data_loader import read_claims
+        from text_index import load_text_index
+        csv_path = tmp_path / "claims.csv"
+        _described_claims().to_csv(csv_path, index=False)
+        df = read_claims(csv_path)
+
+        first = load_text_index(csv_path, df)
+        assert (tmp_path / ".cache" / "claims.text.npz").exists()
+        again = load_text_index(csv_path, df)
+        assert again.search("deer").tolist() == first.search("deer").tolist()
+
+        pd.concat([_described_claims()] * 2).to_csv(csv_path, index=False)
+        df = read_claims(csv_path)
+        assert load_text_index(csv_path, df).search("deer").tolist() == [1, 4, 6, 9]
+
+    def test_compute_view_combines_text_with_filters(self):
+        """A keyword query should narrow the sidebar selection."""
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from ingest import coerce_claims
+        dataset = build_dataset(coerce_claims(_described_claims()))
+
+        spec = FilterSpec.from_selection((), ['Geico'], [], [], "All", text="deer OR airbag")
+        view = compute_view(dataset, spec)
+
+        assert view.positions.tolist() == [0, 1, 4]
+        assert view.kpis.total_claims == 3
+
+
+# =============================================================================
+# RESULT CACHE TESTS
+# =============================================================================
+
+class TestResultCache:
+    """Tests for the cross-session result cache."""
+
+    def test_filter_spec_ignores_selection_order(self):
+        """The same selection in a different order should give an equal key."""
+        from filters import FilterSpec
+        dates = (date(2023, 1, 1), date(2023, 12, 31))
+        a = FilterSpec.from_selection(dates, ['StateFarm', 'Geico'], ['TX'], [], "All")
+        b = FilterSpec.from_selection(dates, ['Geico', 'StateFarm'], ['TX'], [], "All")
+
+        assert a == b
+        assert hash(a) == hash(b)
+
+    def test_cache_counts_hits_and_misses(self):
+        """Lookups should be counted and computed values reused."""
+        from result_cache import ResultCache
+        cache = ResultCache(max_bytes=10_000)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 42
+
+        assert cache.get_or_compute('a', compute) == 42
+        assert cache.get_or_compute('a', compute) == 42
+        assert len(calls) == 1
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_cache_evicts_least_recently_used(self):
+        """Going over budget should drop the oldest unused entry."""
+        import numpy as np
+        from result_cache import ResultCache
+        cache = ResultCache(max_bytes=2500)
+        cache.put('a', np.zeros(1000, dtype='int8'))
+        cache.put('b', np.zeros(1000, dtype='int8'))
+        cache.get('a')
+        cache.put('c', np.zeros(1000, dtype='int8'))
+
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.stats()['evictions'] == 1
+        assert cache.current_bytes <= cache.max_bytes
+
+    def test_compute_view_matches_filtered_rows(self):
+        """A cached view should hold the rows and KPIs of the selection."""
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec, apply_filters
+        from kpis import compute_kpis
+        df = _claims_frame()
+        spec = FilterSpec.from_selection(
+            (date(2023, 1, 10), date(2023, 2, 10)), ['Geico', 'StateFarm'], [], [], "All"
+        )
+        view = compute_view(build_dataset(df), spec)
+        rows = apply_filters(df, *spec.as_args())
+
+        assert view.positions.tolist() == [0, 1, 2]
+        assert view.kpis == compute_kpis(rows)
+
+
+# =============================================================================
+# SYNTHETIC DATA AND BENCHMARK TESTS
+# =============================================================================
+
+class TestSyntheticData:
+    """Tests for the synthetic claims generator and benchmark helpers."""
+
+    def test_generate_claims_matches_real_columns(self):
+        """Synthetic claims should have exactly the bundled CSV's columns."""
+        from data_loader import DATA_PATH
+        from synthetic import generate_claims
+        real = pd.read_csv(DATA_PATH, nrows=1)
+        assert list(generate_claims(100).columns) == list(real.columns)
+
+    def test_generate_claims_is_seeded(self):
+        """The same seed should give the same rows; another seed should not."""
+        from synthetic import generate_claims
+        pd.testing.assert_frame_equal(generate_claims(500, seed=7), generate_claims(500, seed=7))
+        assert not generate_claims(500, seed=7).equals(generate_claims(500, seed=8))
+
+    def test_synthetic_csv_loads_like_real_data(self, tmp_path):
+        """A written synthetic CSV should load with unique claim numbers."""
+        from data_loader import read_claims
+        from synthetic import write_synthetic_csv
+        csv_path = write_synthetic_csv(tmp_path / "synthetic.csv", 2_000, seed=1)
+        df = read_claims(csv_path, use_cache=False)
+
+        assert len(df) == 2_000
+        assert df['claimNumber'].is_unique
+        assert df['insuredpostalCode'].str.len().eq(5).all()
+        assert (df['total_insurance_payment'] <= df['total_claimed_losses']).all()
+
+    def test_find_regressions_flags_slower_stages(self):
+        """Only stages slower than baseline plus tolerance are flagged."""
+        sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+        from run_benchmarks import find_regressions
+        baseline = [
+            {'scale': 1000, 'stage': 'parse_csv', 'seconds': 1.0},
+            {'scale': 1000, 'stage': 'filter_index', 'seconds': 0.5},
+        ]
+        results = [
+            {'scale': 1000, 'stage': 'parse_csv', 'seconds': 1.1},
+            {'scale': 1000, 'stage': 'filter_index', 'seconds': 0.8},
+        ]
+        regressions = find_regressions(results, baseline, tolerance=0.25)
+
+        assert [record['stage'] for record, _ in regressions] == ['filter_index']
+
+
+# =============================================================================
+# BATCH REPORT TESTS
+# =============================================================================
+
+class TestBatchReports:
+    """Tests for headless batch reports."""
+
+    def test_report_spec_from_dict(self):
+        """JSON specs should become normalized FilterSpecs."""
+        from batch_reports import report_spec_from_dict
+        report = report_spec_from_dict({
+            'name': 'geico-2023', 'insurers': ['Geico'], 'date_range': ['2023-01-01', '2023-12-31'],
+        })
+        assert report.name == 'geico-2023'
+        assert report.spec.insurers == ('Geico',)
+        assert report.spec.date_range == (date(2023, 1, 1), date(2023, 12, 31))
+
+    def test_run_reports_in_worker_processes(self, tmp_path):
+        """Pooled reports should match the dashboard's view of each slice."""
+        import json
+        from batch_reports import load_report_dataset, reports_by, run_reports
+        from dataset import compute_view
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+        dataset = load_report_dataset(csv_path)
+        reports = reports_by(dataset, 'insurer')
+
+        summaries = run_reports(csv_path, reports, tmp_path / "out", formats=['json'], workers=2)
+
+        assert [summary['name'] for summary in summaries] == [
+            'insurer-Allstate', 'insurer-Geico', 'insurer-StateFarm'
+        ]
+        for report, summary in zip(reports, summaries):
+            assert summary['kpis'] == compute_view(dataset, report.spec).kpis.as_dict()
+        assert (tmp_path / "out" / "insurer-Geico" / "by_month.json").exists()
+        assert len(json.loads((tmp_path / "out" / "index.json").read_text())) == 3
+
+    def test_image_export_needs_kaleido(self, tmp_path):
+        """Asking for images without kaleido should fail before any work."""
+        from batch_reports import run_reports
+        try:
+            import kaleido  # noqa: F401
+            pytest.skip("kaleido is installed")
+        except ImportError:
+            pass
+        with pytest.raises(ValueError, match="kaleido"):
+            run_reports(tmp_path / "missing.csv", [], tmp_path, formats=['png'])
+
+
+# =============================================================================
+# INSTRUMENTATION TESTS
+# =============================================================================
+
+class TestInstrumentation:
+    """Tests for stage spans and metric exports."""
+
+    def test_span_records_latency_and_rows(self):
+        """A span should add a histogram observation and a rows counter."""
+        from instrumentation import MetricsRegistry, span
+        registry = MetricsRegistry()
+        with span('filter', registry=registry) as stage:
+            stage['rows'] = 1000
+
+        samples = {(kind, name): value for kind, name, _, value in registry.samples()}
+        assert samples[('histogram', 'stage_seconds')]['count'] == 1
+        assert samples[('counter', 'stage_rows_total')] == 1000
+
+    def test_prometheus_export(self):
+        """Histograms should export cumulative buckets, sum and count."""
+        from instrumentation import MetricsRegistry
+        registry = MetricsRegistry()
+        registry.observe('stage_seconds', 0.003, stage='kpis')
+        registry.observe('stage_seconds', 0.2, stage='kpis')
+        text = registry.to_prometheus()
+
+        assert '# TYPE dashboard_stage_seconds histogram' in text
+        assert 'dashboard_stage_seconds_bucket{le="0.005",stage="kpis"} 1' in text
+        assert 'dashboard_stage_seconds_bucket{le="+Inf",stage="kpis"} 2' in text
+        assert 'dashboard_stage_seconds_count{stage="kpis"} 2' in text
+
+    def test_run_collects_spans_and_writes_exports(self, tmp_path, monkeypatch):
+        """A finished rerun should list its spans and write both exports."""
+        import json
+        from instrumentation import MetricsRegistry, finish_run, span, start_run
+        monkeypatch.setenv('DASHBOARD_METRICS_FILE', str(tmp_path / 'metrics.prom'))
+        monkeypatch.setenv('DASHBOARD_METRICS_LOG', str(tmp_path / 'runs.jsonl'))
+        registry = MetricsRegistry()
+
+        start_run()
+        with span('load', registry=registry):
+            pass
+        with span('view', registry=registry):
+            pass
+        spans = finish_run(registry=registry)
+
+        assert [record['stage'] for record in spans] == ['load', 'view']
+        assert 'dashboard_rerun_seconds_count 1' in (tmp_path / 'metrics.prom').read_text()
+        run = json.loads((tmp_path / 'runs.jsonl').read_text())
+        assert [record['stage'] for record in run['stages']] == ['load', 'view']
+
+    def test_compute_view_is_instrumented(self):
+        """compute_view should record its filter, KPI and chart stages."""
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from instrumentation import current_run_spans, finish_run, start_run
+        dataset = build_dataset(_claims_frame())
+
+        start_run()
+        compute_view(dataset, FilterSpec())
+        stages = [record['stage'] for record in current_run_spans()]
+        finish_run()
+
+        assert stages == ['filter', 'cube_slice', 'kpis', 'chart_data', 'percentiles', 'providers']
+
+    def test_only_outermost_spans_measure_memory(self, monkeypatch):
+        """Nested spans must not reset the peak their enclosing span measures."""
+        import tracemalloc
+        from instrumentation import MetricsRegistry, span
+        monkeypatch.setenv('DASHBOARD_TRACE_MEMORY', '1')
+        registry = MetricsRegistry()
+        tracemalloc.start()
+        try:
+            with span('view', registry=registry) as outer:
+                with span('filter', registry=registry):
+                    block = bytearray(4_000_000)
+                    del block
+                with span('kpis', registry=registry) as inner:
+                    pass
+        finally:
+            tracemalloc.stop()
+
+        assert outer['peak_bytes'] >= 4_000_000
+        assert 'peak_bytes' not in inner
+
+    def test_cache_totals_export_as_counters(self):
+        """Metrics named *_total should be exported with the counter type."""
+        from instrumentation import MetricsRegistry, record_cache_stats
+        registry = MetricsRegistry()
+        record_cache_stats({'hits': 3, 'misses': 1, 'entries': 2, 'bytes': 100}, registry=registry)
+        text = registry.to_prometheus()
+
+        assert '# TYPE dashboard_cache_hits_total counter' in text
+        assert 'dashboard_cache_misses_total{cache="views"} 1' in text
+        assert '# TYPE dashboard_cache_bytes gauge' in text
+
+
+# =============================================================================
+# SQL BACKEND TESTS
+# =============================================================================
+
+def _sql_engines():
+    """Both engines: DuckDB is a requirement, SQLite the fallback without it."""
+    from sql_backend import ENGINE_DUCKDB, ENGINE_SQLITE
+    return [ENGINE_SQLITE, ENGINE_DUCKDB]
+
+
+class TestSQLBackend:
+    """Tests for the embedded SQL query backend."""
+
+    def test_kpis_and_chart_data_match_pandas(self):
+        """Pushed-down aggregates should equal the pandas ones."""
+        from datetime import date
+        from charts import chart_data_from_rows
+        from filters import FilterSpec
+        from ingest import coerce_claims
+        from kpis import compute_kpis
+        from sql_backend import SQLBackend
+        df = coerce_claims(_claims_frame())
+        spec = FilterSpec.from_selection((date(2023, 1, 20), date(2023, 3, 10)), [], [], [], "All")
+        rows = df.iloc[[1, 2, 3]]
+
+        for engine in _sql_engines():
+            backend = SQLBackend.from_frame(df, engine)
+            chart_data = backend.chart_data(spec)
+
+            assert backend.kpis(spec) == compute_kpis(rows), engine
+            for key, expected in chart_data_from_rows(rows).items():
+                got = chart_data[key]
+                assert got.iloc[:, 0].tolist() == expected.iloc[:, 0].tolist(), (engine, key)
+                assert got.iloc[:, 1:].to_numpy(dtype=float).ravel().tolist() == \
+                    pytest.approx(expected.iloc[:, 1:].to_numpy(dtype=float).ravel().tolist()), (engine, key)
+
+    def test_where_applies_every_filter(self):
+        """Insurer, state, incident and injury filters should all narrow the SQL."""
+        from filters import FilterSpec
+        from sql_backend import SQLBackend
+        spec = FilterSpec.from_selection((), ['Geico'], ['CA'], ['Collision'], "Yes")
+
+        for engine in _sql_engines():
+            assert SQLBackend.from_frame(_claims_frame(), engine).kpis(spec).total_claims == 1
+
+    def test_missing_injury_flags_match_neither_filter(self):
+        """Claims with no injury flag should be left out of both "Yes" and "No" everywhere."""
+        from cube import build_cube
+        from filters import FilterIndex, FilterSpec, apply_filters
+        from ingest import coerce_claims
+        from kpis import compute_kpis
+        from sql_backend import SQLBackend
+        df = coerce_claims(_claims_frame().assign(injuryinvolved=['Yes', 'No', None, 'No', '']))
+        cube = build_cube(df)
+
+        for injury, expected in (("Yes", [0]), ("No", [1, 3])):
+            args = ((), [], [], [], injury)
+            assert apply_filters(df, *args).index.tolist() == expected
+            assert FilterIndex(df).select(*args).tolist() == expected
+            assert FilterIndex(df.iloc[:2]).extend(df.iloc[2:]).select(*args).tolist() == expected
+            kpis = compute_kpis(df.iloc[expected])
+            assert cube.kpis(cube.slice(*args)) == kpis
+            for engine in _sql_engines():
+                assert SQLBackend.from_frame(df, engine).kpis(FilterSpec.from_selection(*args)) == kpis
+
+    def test_discard_removes_an_appended_version(self):
+        """Discarding a version should delete exactly the rows it appended."""
+        from filters import FilterSpec
+        from ingest import coerce_claims
+        from sql_backend import SQLBackend
+        df = coerce_claims(_claims_frame())
+
+        for engine in _sql_engines():
+            backend = SQLBackend.from_frame(df.iloc[:3], engine)
+            backend.append(df.iloc[3:4], version=1)
+            backend.append(df.iloc[4:], version=2)
+            backend.discard(2)
+            assert backend.kpis(FilterSpec()).total_claims == 4, engine
+
+    def test_compute_view_uses_sql_for_partial_months(self):
+        """Views the cube cannot answer should come from SQL, same as pandas."""
+        from datetime import date
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from instrumentation import current_run_spans, finish_run, start_run
+        spec = FilterSpec.from_selection((date(2023, 1, 20), date(2023, 3, 10)), [], [], [], "All")
+        expected = compute_view(build_dataset(_claims_frame()), spec)
+
+        start_run()
+        view = compute_view(build_dataset(_claims_frame(), sql=True), spec)
+        finish_run()
+
+        assert view.kpis == expected.kpis
+        assert view.positions.tolist() == expected.positions.tolist()
+
+    def test_streamed_dataset_answers_exact_days(self, tmp_path):
+        """With SQL, chunked mode should answer day ranges exactly and see appends."""
+        from datetime import date
+        from dataset import build_streamed_dataset, compute_view
+        from filters import FilterSpec
+        from incremental import append_claims
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().iloc[:4].to_csv(csv_path, index=False)
+        spec = FilterSpec.from_selection((date(2023, 1, 20), date(2023, 3, 10)), [], [], [], "All")
+
+        dataset = build_streamed_dataset(csv_path, chunk_rows=2, partition_dir=tmp_path / "parts", sql=True)
+        before = compute_view(dataset, spec).kpis.total_claims
+        append_claims(dataset, _claims_frame().iloc[[4]].assign(dateOfloss=pd.Timestamp('2023-02-14')))
+
+        assert before == 3
+        assert compute_view(dataset, spec).kpis.total_claims == 4
+
+    def test_snapshots_do_not_see_later_appends(self):
+        """Rows appended to the shared engine should be filtered out of older snapshots."""
+        from datetime import date
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from incremental import append_claims
+        from ingest import coerce_claims
+        spec = FilterSpec.from_selection((date(2023, 1, 20), date(2023, 3, 10)), [], [], [], "All")
+        df = coerce_claims(_claims_frame())
+        dataset = build_dataset(df.iloc[:4].reset_index(drop=True), sql=True)
+        before = dataset.snapshot()
+
+        append_claims(dataset, df.iloc[[4]].assign(dateOfloss=pd.Timestamp('2023-02-14')))
+
+        assert compute_view(before, spec).kpis.total_claims == 3
+        assert compute_view(dataset, spec).kpis.total_claims == 4
+
+    def test_duckdb_is_the_default_engine(self):
+        """With duckdb installed (it is a requirement), it should be picked over SQLite."""
+        from sql_backend import ENGINE_DUCKDB, SQLBackend
+        assert SQLBackend.from_frame(_claims_frame()).engine == ENGINE_DUCKDB
+
+    def test_memory_mode_without_duckdb_stays_on_pandas(self, tmp_path, monkeypatch):
+        """The SQLite fallback must not copy every claim into memory."""
+        import registry
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+        monkeypatch.setenv('DASHBOARD_QUERY_BACKEND', 'sql')
+        monkeypatch.setenv('DASHBOARD_LOAD_MODE', 'memory')
+        monkeypatch.setattr(registry, 'duckdb_available', lambda: False)
+
+        assert registry.load_dataset(csv_path).sql is None
+
+    def test_query_backend_defaults_to_pandas(self, monkeypatch):
+        """The pandas path should stay the default."""
+        from sql_backend import QUERY_BACKEND_PANDAS, get_query_backend
+        monkeypatch.delenv('DASHBOARD_QUERY_BACKEND', raising=False)
+
+        assert get_query_backend() == QUERY_BACKEND_PANDAS
+
+
+# =============================================================================
+# DATASET REGISTRY TESTS
+# =============================================================================
+
+class TestDatasetRegistry:
+    """Tests for the shared named-dataset registry."""
+
+    def _registry(self, loaded, **limits):
+        from dataset import build_dataset
+        from registry import DatasetRegistry
+
+        def loader(source):
+            loaded.append(source)
+            return build_dataset(_claims_frame())
+        return DatasetRegistry(loader, **limits)
+
+    def test_dataset_is_loaded_once_and_shared(self):
+        """Every reader should get the same object from a single load."""
+        loaded = []
+        registry = self._registry(loaded)
+        registry.register('auto', 'auto.csv')
+
+        with registry.acquire('auto') as first, registry.acquire('auto') as second:
+            assert first is second
+            assert registry.stats()['auto']['refs'] == 2
+
+        assert loaded == ['auto.csv']
+        assert registry.stats()['auto']['refs'] == 0
+
+    def test_least_recently_used_unheld_dataset_is_evicted(self):
+        """Over the dataset limit, only datasets nobody holds are unloaded."""
+        loaded = []
+        registry = self._registry(loaded, max_datasets=1)
+        for name in ['auto', 'home', 'life']:
+            registry.register(name, f"{name}.csv")
+
+        held = registry.acquire('auto')
+        registry.acquire('home').release()
+        registry.acquire('life').release()
+        stats = registry.stats()
+        held.release()
+
+        assert stats['auto']['loaded'] and not stats['home']['loaded']
+        assert registry.evictions == 2
+        assert registry.stats()['auto']['loaded']
+        assert loaded == ['auto.csv', 'home.csv', 'life.csv']
+
+    def test_reloaded_dataset_has_a_new_identity(self):
+        """Cache keys of a reloaded dataset must not collide with the evicted one's."""
+        registry = self._registry([])
+        registry.register('auto', 'auto.csv')
+
+        with registry.acquire('auto') as dataset:
+            first = dataset.identity
+        registry.evict('auto')
+        with registry.acquire('auto') as dataset:
+            second = dataset.identity
+
+        assert first[1] == second[1] == 0
+        assert first != second
+
+    def test_datasets_with_appends_are_not_evicted(self):
+        """Appended claims exist only in memory, so eviction must not drop them."""
+        from incremental import append_claims
+        registry = self._registry([], max_datasets=1)
+        registry.register('auto', 'auto.csv')
+        registry.register('home', 'home.csv')
+
+        with registry.acquire('auto') as dataset:
+            append_claims(dataset, _claims_frame().assign(claimNumber=['n1', 'n2', 'n3', 'n4', 'n5']))
+        registry.acquire('home').release()
+
+        assert not registry.evict('auto')
+        assert registry.stats()['auto']['loaded']
+        assert registry.stats()['auto']['bytes'] > 0
+
+    def test_private_bytes_counts_nested_indexes(self):
+        """Arrays held inside nested objects, such as cube sketches, should be counted."""
+        from dataclasses import replace
+        from cube import ClaimsCube
+        from dataset import build_dataset
+        from registry import private_bytes
+        dataset = build_dataset(_large_claims_frame(2_000))
+        cube = dataset.cube
+        sketches = cube.sketches
+        without = replace(dataset, cube=ClaimsCube(cube.cells, cube.min_date, cube.max_date))
+
+        assert private_bytes(dataset) - private_bytes(without) >= \
+            sketches.cell.nbytes + sketches.bucket.nbytes + sketches.count.nbytes
+
+    def test_unknown_dataset_raises(self):
+        """Acquiring an unregistered name should say what is registered."""
+        registry = self._registry([])
+
+        with pytest.raises(KeyError, match='auto'):
+            registry.acquire('auto')
+
+    def test_dataset_paths_from_environment(self, monkeypatch):
+        """DASHBOARD_DATASETS should list name=path pairs."""
+        from pathlib import Path
+        from registry import DEFAULT_DATASET, get_dataset_paths
+        monkeypatch.delenv('DASHBOARD_DATASETS', raising=False)
+        assert list(get_dataset_paths()) == [DEFAULT_DATASET]
+
+        monkeypatch.setenv('DASHBOARD_DATASETS', 'auto=data/auto.csv; home=data/home.csv')
+        assert get_dataset_paths() == {'auto': Path('data/auto.csv'), 'home': Path('data/home.csv')}
+
+        monkeypatch.setenv('DASHBOARD_DATASETS', 'auto')
+        with pytest.raises(ValueError):
+            get_dataset_paths()
+
+    def test_cached_numeric_columns_are_mapped(self, tmp_path):
+        """Numeric columns read from the cache should be read-only views, not copies."""
+        from data_loader import read_claims
+        from registry import private_bytes
+        from dataset import build_dataset
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+        read_claims(csv_path)
+
+        df = read_claims(csv_path)
+
+        assert not df['total_claimed_losses'].to_numpy().flags.writeable
+        assert df['total_claimed_losses'].tolist() == _claims_frame()['total_claimed_losses'].tolist()
+        assert private_bytes(build_dataset(df)) > 0
+
+
+# =============================================================================
+# WARM-UP TESTS
+# =============================================================================
+
+class TestWarmUp:
+    """Tests for cold-start warm-up and the default view snapshot."""
+
+    def _registry(self, tmp_path):
+        from registry import DatasetRegistry
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+        registry = DatasetRegistry()
+        registry.register('claims', csv_path)
+        return registry
+
+    def test_default_spec_selects_everything(self):
+        """The default spec should cover every option and the full date span."""
+        from dataset import build_dataset, compute_view
+        from warmup import dataset_default_spec
+        dataset = build_dataset(_claims_frame())
+
+        spec = dataset_default_spec(dataset)
+
+        assert spec.insurers == ('Allstate', 'Geico', 'StateFarm')
+        assert spec.injury == "All" and spec.text == ""
+        assert compute_view(dataset, spec).kpis.total_claims == 4
+
+    def test_warm_up_seeds_view_cache_and_writes_snapshot(self, tmp_path):
+        """Warm-up should leave the default view cached and snapshotted."""
+        from result_cache import ResultCache
+        from warmup import SNAPSHOT_SUFFIX, dataset_default_spec, warm_up
+        registry = self._registry(tmp_path)
+        cache = ResultCache()
+
+        timings = warm_up(registry, view_cache=cache, draw=False)
+
+        with registry.acquire('claims') as dataset:
+            view = cache.get(('claims', dataset.identity, dataset_default_spec(dataset)))
+        assert set(timings['claims']) == {'load', 'view'}
+        assert view is not None and view.kpis.total_claims == 4
+        assert (tmp_path / ".cache" / f"claims.{SNAPSHOT_SUFFIX}").exists()
+
+    def test_snapshot_round_trip(self, tmp_path):
+        """A loaded snapshot should match the view it was saved from."""
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        from warmup import dataset_default_spec, load_snapshot, save_snapshot
+        dataset = build_dataset(_claims_frame())
+        spec = dataset_default_spec(dataset)
+        view = compute_view(dataset, spec)
+        path = tmp_path / "claims.warm.npz"
+
+        save_snapshot(path, 'key', view)
+        loaded = load_snapshot(path, 'key', spec)
+
+        assert loaded.kpis == view.kpis
+        assert loaded.positions.tolist() == view.positions.tolist()
+        assert loaded.chart_data['by_month']['month'].tolist() == view.chart_data['by_month']['month'].tolist()
+        assert loaded.chart_data['by_insurer']['count'].tolist() == view.chart_data['by_insurer']['count'].tolist()
+        assert load_snapshot(path, 'other key', spec) is None
+        assert load_snapshot(path, 'key', FilterSpec()) is None
+
+
+# =============================================================================
+# EXPORT TESTS
+# =============================================================================
+
+class TestExport:
+    """Tests for streaming claim exports."""
+
+    def test_csv_export_streams_selected_rows(self):
+        """CSV chunks should add up to the selected rows, projected and in source format."""
+        import io
+        import numpy as np
+        from export import iter_export
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+
+        blocks = list(iter_export(df, np.array([0, 2, 3]), 'csv',
+                                  columns=['claimNumber', 'dateOfloss', 'injuryinvolved'], chunk_rows=2))
+        exported = pd.read_csv(io.BytesIO(b''.join(blocks)))
+
+        assert len(blocks) >= 2
+        assert exported.columns.tolist() == ['claimNumber', 'dateOfloss', 'injuryinvolved']
+        assert exported['claimNumber'].tolist() == ['c1', 'c3', 'c4']
+        assert exported['dateOfloss'].tolist() == ['2023-01-15', '2023-02-01', '2023-03-10']
+        assert exported['injuryinvolved'].tolist() == ['Yes', 'Yes', 'No']
+
+    def test_parquet_export_keeps_types(self, tmp_path):
+        """Parquet exports should read back with the typed columns."""
+        import numpy as np
+        from export import write_export
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+        path = tmp_path / "claims.parquet"
+
+        write_export(path, df, np.array([1, 4]), 'parquet', chunk_rows=1)
+        exported = pd.read_parquet(path)
+
+        assert exported['claimNumber'].tolist() == ['c2', 'c5']
+        assert exported['lawsuit_filed'].tolist() == [True, True]
+        assert exported['total_claimed_losses'].tolist() == [2000.0, 100.0]
+
+    def test_export_can_be_appended_back(self, tmp_path):
+        """A CSV export should be readable by the incremental append path."""
+        import numpy as np
+        from dataset import build_dataset
+        from export import write_export
+        from incremental import append_csv
+        from ingest import coerce_claims
+        df = coerce_claims(_claims_frame())
+        path = tmp_path / "claims.csv"
+        write_export(path, df, np.arange(len(df)), 'csv')
+
+        result = append_csv(build_dataset(df.iloc[:2].reset_index(drop=True)), path)
+
+        assert (result.added, result.duplicates) == (3, 2)
+
+    def test_unknown_column_or_format_raises(self):
+        """Bad projections and formats should fail before anything is written."""
+        from export import iter_export
+
+        with pytest.raises(KeyError):
+            iter_export(_claims_frame(), None, 'csv', columns=['nope'])
+        with pytest.raises(ValueError):
+            iter_export(_claims_frame(), None, 'xlsx')
+
+    def test_export_script_writes_the_selection(self, tmp_path):
+        """The command-line export should write just the filtered claims."""
+        sys.path.insert(0, str(Path(__file__).parent.parent / "reports"))
+        from export_claims import main
+        csv_path = tmp_path / "claims.csv"
+        _claims_frame().to_csv(csv_path, index=False)
+
+        main(['--data', str(csv_path), '--output', str(tmp_path / "geico.csv"),
+              '--filters', '{"insurers": ["Geico"]}', '--columns', 'claimNumber'])
+
+        assert pd.read_csv(tmp_path / "geico.csv")['claimNumber'].tolist() == ['c1', 'c2', 'c5']
+
+    def test_download_limit_from_environment(self, monkeypatch):
+        """Dashboard downloads should be capped unless the limit is set to 0."""
+        from export import DEFAULT_DOWNLOAD_MAX_ROWS, get_download_max_rows
+        monkeypatch.delenv('DASHBOARD_EXPORT_MAX_ROWS', raising=False)
+        assert get_download_max_rows() == DEFAULT_DOWNLOAD_MAX_ROWS
+
+        monkeypatch.setenv('DASHBOARD_EXPORT_MAX_ROWS', '0')
+        assert get_download_max_rows() is None
+
+
+# =============================================================================
+# CLAIM EXPLORER TESTS
+# =============================================================================
+
+class TestClaimExplorer:
+    """Tests for the paginated claim explorer."""
+
+    def test_sort_order_puts_missing_last(self):
+        """Sort permutations should order every claim, missing values last either way."""
+        from explorer import sort_order
+        df = _claims_frame()
+
+        assert sort_order(df, 'total_claimed_losses').tolist() == [4, 2, 3, 0, 1]
+        assert sort_order(df, 'total_claimed_losses', ascending=False).tolist() == [1, 0, 3, 2, 4]
+        assert sort_order(df, 'dateOfloss', ascending=False).tolist() == [3, 2, 1, 0, 4]
+
+    def test_sorted_selection_matches_sorting_the_selection(self):
+        """Filtering the full permutation should equal sorting the selected rows."""
+        import numpy as np
+        from explorer import sort_order, sorted_selection
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({'value': rng.integers(0, 50, 1000)})
+        positions = np.sort(rng.choice(1000, 300, replace=False))
+
+        selection = sorted_selection(sort_order(df, 'value'), positions, len(df))
+        expected = df.iloc[positions].sort_values('value', kind='stable').index.to_numpy()
+
+        np.testing.assert_array_equal(selection, expected)
+
+    def test_page_frame_slices_and_projects(self):
+        """Pages should hold only their rows and columns, with the last page clamped."""
+        import numpy as np
+        from explorer import page_count, page_frame
+        df = _claims_frame()
+        positions = np.array([4, 2, 0])
+
+        page = page_frame(df, positions, 2, page_size=2, columns=['claimNumber', 'insurer_name'])
+
+        assert page_count(len(positions), 2) == 2
+        assert page_count(0, 2) == 1
+        assert page.columns.tolist() == ['claimNumber', 'insurer_name']
+        assert page['claimNumber'].tolist() == ['c1']
+        assert page_frame(df, positions, 9, page_size=2)['claimNumber'].tolist() == ['c1']
+        assert page_frame(df, np.array([], dtype=int), 1).empty
+
+
+# =============================================================================
+# APPROXIMATE MODE TESTS
+# =============================================================================
+
+def _large_claims_frame(n_rows=20_000, seed=3):
+    """Synthetic typed claims for estimates that need more than a handful of rows."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    claimed = rng.gamma(2.0, 5000.0, n_rows)
+    return pd.DataFrame({
+        'dateOfloss': pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 730, n_rows), unit='D'),
+        'insurer_name': pd.Categorical(rng.choice(['Geico', 'StateFarm', 'Allstate'], n_rows, p=[.6, .3, .1])),
+        'insuredstate': pd.Categorical(rng.choice(['CA', 'TX', 'NY', 'WA'], n_rows)),
+        'natureOfincident': pd.Categorical(rng.choice(['Collision', 'Theft'], n_rows)),
+        'injuryinvolved': rng.random(n_rows) < 0.4,
+        'lawsuit_filed': rng.random(n_rows) < 0.2,
+        'total_claimed_losses': claimed,
+        'total_insurance_payment': claimed * rng.uniform(0.3, 1.0, n_rows),
+        'claimNumber': [f'c{i}' for i in range(n_rows)],
+    })
+
+
+class TestApproximateMode:
+    """Tests for sampled estimates and background refinement."""
+
+    def test_full_sample_is_exact(self):
+        """Sampling every claim should reproduce the exact view with zero-width intervals."""
+        import datetime as dt
+        from approximate import approximate_view, build_sample
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        dataset = build_dataset(_large_claims_frame(2_000))
+        spec = FilterSpec.from_selection((dt.date(2022, 3, 5), dt.date(2023, 6, 20)), ['Geico'], [], [], 'All', '')
+
+        estimate = approximate_view(dataset, spec, build_sample(dataset.frame, fraction=1.0))
+        exact = compute_view(dataset, spec)
+
+        assert estimate.approximate and not exact.approximate
+        for name, value in exact.kpis.as_dict().items():
+            assert getattr(estimate.kpis, name) == pytest.approx(value)
+        assert max(estimate.intervals.values()) == pytest.approx(0, abs=1e-6)
+        counts = estimate.chart_data['by_state'].set_index('insuredstate')['count']
+        expected = exact.chart_data['by_state'].set_index('insuredstate')['count']
+        assert counts.to_dict() == pytest.approx(expected.astype(float).to_dict())
+
+    def test_estimates_fall_within_intervals(self):
+        """Sampled KPIs should be close to the exact ones, within their 95% intervals."""
+        import datetime as dt
+        from approximate import approximate_view, build_sample
+        from dataset import build_dataset, compute_view
+        from filters import FilterSpec
+        dataset = build_dataset(_large_claims_frame())
+        spec = FilterSpec.from_selection((dt.date(2022, 2, 10), dt.date(2023, 9, 3)), [], [], [], 'All', '')
+
+        sample = build_sample(dataset.frame, fraction=0.1, seed=11)
+        estimate = approximate_view(dataset, spec, sample)
+        exact = compute_view(dataset, spec)
+
+        assert len(sample) < len(dataset.frame) / 5
+        assert estimate.kpis.total_claims == exact.kpis.total_claims
+        for name in ['total_claimed', 'total_paid', 'average_claim', 'injury_rate', 'payment_ratio']:
+            assert estimate.intervals[name] > 0
+            assert abs(getattr(estimate.kpis, name) - getattr(exact.kpis, name)) <= estimate.intervals[name]
+        assert 'count_error' in estimate.chart_data['by_insurer']
+
+    def test_refiner_caches_and_shares_work(self):
+        """Concurrent requests for a view should compute it once and cache the result."""
+        import threading
+        from approximate import Refiner
+        from result_cache import ResultCache
+        cache = ResultCache(max_bytes=1024 * 1024)
+        refiner = Refiner(cache)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'exact'
+
+        first = refiner.submit('key', compute)
+        started.wait(5)
+        second = refiner.submit('key', compute)
+        release.set()
+
+        assert first is second
+        assert first.result(5) == 'exact'
+        assert calls == [1]
+        assert cache.get('key') == 'exact'
+        assert refiner.pending() == 0
+
+    def test_estimated_charts_draw_error_bars(self):
+        """Figures built from estimates should carry their error bars."""
+        from approximate import approximate_view, build_sample
+        from charts import build_figures
+        from dataset import build_dataset
+        from filters import FilterSpec
+        dataset = build_dataset(_large_claims_frame(5_000))
+        spec = FilterSpec.from_selection((), [], [], [], 'All', '')
+
+        view = approximate_view(dataset, spec, build_sample(dataset.frame, fraction=0.1, seed=1))
+        figures = build_figures(view.chart_data)
+
+        assert figures['by_state'].data[0].error_y.array is not None
+        assert figures['payments'].data[0].error_y.array is not None
+
+
+# =============================================================================
+# QUANTILE SKETCH TESTS
+# =============================================================================
+
+class TestQuantileSketches:
+    """Tests for the mergeable severity sketches."""
+
+    def test_percentiles_within_relative_accuracy(self):
+        """Sketch percentiles should be within the relative accuracy of the true ones."""
+        import numpy as np
+        from sketches import RELATIVE_ACCURACY, percentile_table, sketch_rows
+        df = _large_claims_frame(5_000)
+
+        table = percentile_table(sketch_rows(df))
+        for metric, values in [('claimed', df['total_claimed_losses']), ('paid', df['total_insurance_payment'])]:
+            ordered = np.sort(values.to_numpy())
+            for q in [50, 90, 99]:
+                exact = ordered[int(q / 100 * (len(ordered) - 1))]
+                assert abs(table.at[metric, f'p{q}'] - exact) <= RELATIVE_ACCURACY * exact + 1e-9
+        assert table.at['loss_ratio', 'claims'] == len(df)
+
+    def test_cube_slices_merge_cell_sketches(self):
+        """Percentiles and histograms of a cube slice should match sketches of its rows."""
+        import datetime as dt
+        import numpy as np
+        from cube import build_cube
+        from filters import apply_filters
+        from sketches import percentile_table, rows_distribution, sketch_rows
+        df = _large_claims_frame(3_000)
+        selection = ((dt.date(2022, 4, 1), dt.date(2023, 3, 31)), ['Geico', 'Allstate'], [], [], 'All')
+
+        cube = build_cube(df)
+        cells = cube.slice(*selection)
+        rows = apply_filters(df, *selection)
+
+        pd.testing.assert_frame_equal(cube.percentiles(cells), percentile_table(sketch_rows(rows)))
+        histogram = cube.distribution(cells, 'claimed', 'insuredstate')
+        expected = rows_distribution(rows, 'claimed', 'insuredstate')
+        assert histogram['count'].sum() == len(rows)
+        np.testing.assert_allclose(histogram.groupby('insuredstate', observed=True)['count'].sum(),
+                                   expected.groupby('insuredstate', observed=True)['count'].sum())
+
+    def test_sketches_update_incrementally(self):
+        """Merged chunk cubes and appended claims should give the sketches of all the claims."""
+        from cube import build_cube, merge_cubes
+        from dataset import build_dataset
+        from incremental import append_claims
+        df = _large_claims_frame(2_000)
+
+        whole = build_cube(df).percentiles()
+        merged = merge_cubes([build_cube(df.iloc[:700]), build_cube(df.iloc[700:])])
+        dataset = build_dataset(df.iloc[:1500].reset_index(drop=True))
+        append_claims(dataset, df.iloc[1500:].reset_index(drop=True))
+
+        pd.testing.assert_frame_equal(merged.percentiles(), whole)
+        pd.testing.assert_frame_equal(dataset.cube.percentiles(), whole)
+
+
+# =============================================================================
+# HEAVY HITTER TESTS
+# =============================================================================
+
+def _skewed_claims_frame(n_rows=20_000, seed=5):
+    """Synthetic claims whose cities and insureds follow a long-tailed distribution."""
+    import numpy as np
+    from schema import apply_schema
+    rng = np.random.default_rng(seed)
+    df = _large_claims_frame(n_rows, seed)
+    df['insuredCity'] = [f'City {i}' for i in rng.zipf(1.5, n_rows) % 5_000]
+    df['insuredname'] = [f'Insured {i}' for i in rng.zipf(1.3, n_rows) % 20_000]
+    return apply_schema(df)
+
+
+class TestHeavyHitters:
+    """Tests for the count-min heavy-hitter trackers."""
+
+    def test_tracker_finds_the_top_keys(self):
+        """Tracker estimates should never undercount and rank the true top keys first."""
+        from heavy_hitters import HeavyHitters
+        df = _skewed_claims_frame()
+
+        tracker = HeavyHitters().update(df['insuredCity'], df['total_insurance_payment'])
+        exact = df['insuredCity'].value_counts()
+        top = tracker.top(10).set_index('key')
+
+        assert list(top.index[:5]) == list(exact.index[:5])
+        assert (top['claims'] >= exact.reindex(top.index)).all()
+
+    def test_top_keys_are_exact_for_filtered_selections(self, monkeypatch):
+        """Filtered top keys, counted in batches, should match a groupby of the selected claims."""
+        import numpy as np
+        import heavy_hitters
+        from dataset import build_dataset
+        from heavy_hitters import flag_repeat_claimants, top_keys
+        monkeypatch.setattr(heavy_hitters, 'BATCH_ROWS', 1_000)
+        df = _skewed_claims_frame()
+        dataset = build_dataset(df)
+        positions = np.flatnonzero((df['insurer_name'] == 'Allstate').to_numpy())
+
+        for by, column in [('claims', 'claimNumber'), ('payment', 'total_insurance_payment')]:
+            top = top_keys(dataset.heavy_hitters, df, dataset.providers, 'insuredname', positions, 5, by)
+            grouped = df.iloc[positions].groupby('insuredname')
+            expected = (grouped.size() if by == 'claims' else grouped[column].sum()).nlargest(5)
+            np.testing.assert_allclose(top[by], expected.to_numpy())
+            exact = grouped.size().reindex(top['key'])
+            assert top['claims'].tolist() == exact.tolist()
+            assert (top[['claims', 'payment']].to_numpy() > 0).all()
+
+        flagged = flag_repeat_claimants(top, min_claims=2)
+        assert flagged['repeat'].tolist() == (top['claims'] >= 2).tolist()
+
+    def test_unfiltered_top_keys_come_from_the_trackers(self):
+        """Sessions without filters, or with the default ones, should read the load-time trackers."""
+        from dataset import build_dataset
+        from filters import FilterSpec
+        from heavy_hitters import is_estimate, top_keys
+        from warmup import dataset_default_spec
+        df = _skewed_claims_frame()
+        dataset = build_dataset(df)
+        default = dataset_default_spec(dataset)
+
+        assert is_estimate(FilterSpec(), default)
+        assert is_estimate(default, default)
+        assert not is_estimate(FilterSpec(insurers=('Allstate',)), default)
+        top = top_keys(dataset.heavy_hitters, df, dataset.providers, 'insuredCity', None, 5)
+        pd.testing.assert_frame_equal(top, dataset.heavy_hitters['insuredCity'].top(5))
+
+    def test_trackers_update_on_append_and_chunks(self):
+        """Appended claims and chunked updates should give the tracker of all the claims."""
+        import numpy as np
+        from dataset import build_dataset
+        from heavy_hitters import build_heavy_hitters
+        from incremental import append_claims
+        df = _skewed_claims_frame(6_000)
+
+        whole = build_heavy_hitters(df)
+        chunked = build_heavy_hitters(df.iloc[:2_500], current=build_heavy_hitters(df.iloc[2_500:]))
+        dataset = build_dataset(df.iloc[:4_000].reset_index(drop=True))
+        before = dataset.heavy_hitters['insuredCity'].totals['claims']
+        append_claims(dataset, df.iloc[4_000:].reset_index(drop=True))
+
+        assert dataset.heavy_hitters['insuredCity'].totals['claims'] == len(df)
+        assert before == 4_000
+        for hitters in (chunked, dataset.heavy_hitters):
+            for key in ['insuredCity', 'insuredname']:
+                np.testing.assert_allclose(hitters[key].sketches['payment'].table,
+                                           whole[key].sketches['payment'].table)
+                pd.testing.assert_frame_equal(hitters[key].top(5), whole[key].top(5))
+
+
+# =============================================================================
+# FIGURE CACHE TESTS
+# =============================================================================
+
+class TestFigureCache:
+    """Tests for the pooled, cached figure builds."""
+
+    def test_figures_are_built_once_per_fingerprint(self):
+        """Cached figures should be reused until the fingerprint changes."""
+        from charts import claims_by_insurer_figure
+        from dataset import build_dataset, compute_view
+        from figures import build_figures_cached, dashboard_figure_jobs, filter_fingerprint
+        from filters import FilterSpec
+        from result_cache import ResultCache
+        dataset = build_dataset(_claims_frame())
+        view = compute_view(dataset, FilterSpec())
+        cache = ResultCache()
+        built = []
+
+        def counted(builder):
+            return lambda data: built.append(builder) or builder(data)
+
+        jobs = {chart: (counted(builder), data) for chart, (builder, data) in dashboard_figure_jobs(view).items()}
+        fingerprint = filter_fingerprint('claims', dataset, view)
+        figures = build_figures_cached(jobs, cache, fingerprint)
+        assert len(built) == len(jobs) == 7
+        again = build_figures_cached(jobs, cache, fingerprint)
+        assert all(again[chart] is figures[chart] for chart in jobs)
+        assert len(built) == len(jobs)
+        assert cache.stats()['bytes'] >= sum(len(figure.to_json()) for figure in figures.values())
+
+        build_figures_cached(jobs, cache, ('claims', (dataset.load_id, dataset.version + 1), view.spec, False))
+        assert len(built) == 2 * len(jobs)
+        expected = claims_by_insurer_figure(view.chart_data['by_insurer'])
+        assert figures['by_insurer'].to_dict() == expected.to_dict()
+
+    def test_worker_spans_join_the_callers_run(self):
+        """Figures built on pool threads should still be timed in the caller's rerun."""
+        from charts import CHART_DATA_KEYS
+        from dataset import build_dataset, compute_view
+        from figures import build_figures_cached, dashboard_figure_jobs
+        from filters import FilterSpec
+        from instrumentation import current_run_spans, finish_run, start_run
+        from result_cache import ResultCache
+        view = compute_view(build_dataset(_claims_frame()), FilterSpec())
+        jobs = {key: job for key, job in dashboard_figure_jobs(view).items() if key in CHART_DATA_KEYS}
+
+        start_run()
+        build_figures_cached(jobs, ResultCache(), 'fingerprint')
+        stages = sorted(record['stage'] for record in current_run_spans())
+        finish_run()
+
+        assert stages == sorted(f'figure_{key}' for key in CHART_DATA_KEYS)
+
+
 # =============================================================================
 # ENTRY POINT
 # =============================================================================